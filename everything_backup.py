@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Online backup and snapshots for SQLite Database Manager
+Copies live databases with the sqlite3 backup API in small page steps so writers
+are never blocked for long, stores incremental snapshots as page-level diffs
+against the previous snapshot, and restores any snapshot back into place
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+MANIFEST = "manifest.json"
+HASH_SIZE = 16
+
+
+def _mb_per_s(num_bytes, seconds):
+    return (num_bytes / (1024 * 1024)) / seconds if seconds > 0 else 0.0
+
+
+def backup_database(src_path, dest_path, pages_per_step=256, sleep=0.005, progress=None):
+    """Copy a live database with Connection.backup, yielding to writers between steps"""
+    started = time.perf_counter()
+
+    def _progress(status, remaining, total):
+        if progress:
+            progress(total - remaining, total)
+        # Give writers a window to take the lock between page steps
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    src = sqlite3.connect(src_path)
+    try:
+        dest = sqlite3.connect(dest_path)
+        try:
+            src.backup(dest, pages=pages_per_step, progress=_progress)
+        except BaseException:
+            # A half-copied file isn't a backup; don't leave one behind
+            dest.close()
+            os.remove(dest_path)
+            raise
+        dest.close()
+    finally:
+        src.close()
+
+    seconds = time.perf_counter() - started
+    size = os.path.getsize(dest_path)
+    return {
+        "source": src_path,
+        "destination": dest_path,
+        "bytes": size,
+        "seconds": seconds,
+        "mb_per_s": _mb_per_s(size, seconds),
+    }
+
+
+def _source_signature(db_path):
+    """mtime and size of the database and its WAL, used to skip unchanged files"""
+    signature = []
+    for path in (db_path, db_path + "-wal"):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            signature.append([stat.st_mtime_ns, stat.st_size])
+        else:
+            signature.append(None)
+    return signature
+
+
+def _page_hashes(path, page_size):
+    hashes = []
+    with open(path, "rb") as f:
+        while True:
+            page = f.read(page_size)
+            if not page:
+                break
+            hashes.append(hashlib.blake2b(page, digest_size=HASH_SIZE).digest())
+    return hashes
+
+
+def _read_hashes(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    return [data[i : i + HASH_SIZE] for i in range(0, len(data), HASH_SIZE)]
+
+
+def _write_hashes(path, hashes):
+    with open(path, "wb") as f:
+        f.write(b"".join(hashes))
+
+
+def _page_size(path):
+    conn = sqlite3.connect(path)
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    conn.close()
+    return page_size
+
+
+def default_backup_dir(db_path):
+    """data/backups/<database name>/ next to the database file"""
+    name = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(os.path.dirname(db_path) or ".", "backups", name)
+
+
+def load_manifest(backup_dir):
+    path = os.path.join(backup_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"snapshots": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(backup_dir, manifest):
+    path = os.path.join(backup_dir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def create_snapshot(
+    db_path,
+    backup_dir=None,
+    incremental=True,
+    pages_per_step=256,
+    sleep=0.005,
+):
+    """Snapshot a database; unchanged files are skipped and changes stored as page diffs"""
+    backup_dir = backup_dir or default_backup_dir(db_path)
+    os.makedirs(backup_dir, exist_ok=True)
+    manifest = load_manifest(backup_dir)
+    snapshots = manifest["snapshots"]
+    previous = snapshots[-1] if snapshots else None
+
+    signature = _source_signature(db_path)
+    if incremental and previous and previous["signature"] == signature:
+        return {"source": db_path, "skipped": True, "snapshot": previous["id"]}
+
+    snapshot_id = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    temp_path = os.path.join(backup_dir, f".tmp-{snapshot_id}.db")
+    report = backup_database(db_path, temp_path, pages_per_step, sleep)
+
+    page_size = _page_size(temp_path)
+    hashes = _page_hashes(temp_path, page_size)
+    entry = {
+        "id": snapshot_id,
+        "created": datetime.now().isoformat(),
+        "signature": signature,
+        "page_size": page_size,
+        "page_count": len(hashes),
+    }
+
+    previous_hashes = None
+    if incremental and previous and previous["page_size"] == page_size:
+        previous_hashes = _read_hashes(os.path.join(backup_dir, previous["hashes"]))
+
+    if previous_hashes is None:
+        entry["kind"] = "full"
+        entry["file"] = f"{snapshot_id}.db"
+        os.replace(temp_path, os.path.join(backup_dir, entry["file"]))
+        entry["changed_pages"] = len(hashes)
+        stored = report["bytes"]
+    else:
+        # Store only pages whose content differs from the previous snapshot
+        entry["kind"] = "diff"
+        entry["base"] = previous["id"]
+        entry["file"] = f"{snapshot_id}.diff"
+        changed = 0
+        with open(temp_path, "rb") as src, open(
+            os.path.join(backup_dir, entry["file"]), "wb"
+        ) as diff:
+            for page_no, digest in enumerate(hashes):
+                if page_no < len(previous_hashes) and previous_hashes[page_no] == digest:
+                    continue
+                src.seek(page_no * page_size)
+                diff.write(page_no.to_bytes(4, "big"))
+                diff.write(src.read(page_size))
+                changed += 1
+        os.remove(temp_path)
+        entry["changed_pages"] = changed
+        stored = os.path.getsize(os.path.join(backup_dir, entry["file"]))
+
+    entry["hashes"] = f"{snapshot_id}.hashes"
+    _write_hashes(os.path.join(backup_dir, entry["hashes"]), hashes)
+    snapshots.append(entry)
+    _save_manifest(backup_dir, manifest)
+
+    report.update(
+        {
+            "destination": os.path.join(backup_dir, entry["file"]),
+            "skipped": False,
+            "snapshot": snapshot_id,
+            "kind": entry["kind"],
+            "changed_pages": entry["changed_pages"],
+            "stored_bytes": stored,
+        }
+    )
+    return report
+
+
+def _materialize(backup_dir, manifest, snapshot_id, target_path):
+    """Rebuild a snapshot file by applying diffs on top of its full base"""
+    snapshots = manifest["snapshots"]
+    ids = [snapshot["id"] for snapshot in snapshots]
+    if snapshot_id not in ids:
+        raise ValueError(f"Snapshot '{snapshot_id}' not found in {backup_dir}")
+    index = ids.index(snapshot_id)
+
+    base_index = index
+    while snapshots[base_index]["kind"] != "full":
+        base_index -= 1
+
+    shutil.copyfile(os.path.join(backup_dir, snapshots[base_index]["file"]), target_path)
+    with open(target_path, "r+b") as target:
+        for snapshot in snapshots[base_index + 1 : index + 1]:
+            page_size = snapshot["page_size"]
+            with open(os.path.join(backup_dir, snapshot["file"]), "rb") as diff:
+                while True:
+                    header = diff.read(4)
+                    if not header:
+                        break
+                    page_no = int.from_bytes(header, "big")
+                    target.seek(page_no * page_size)
+                    target.write(diff.read(page_size))
+            target.truncate(snapshot["page_count"] * page_size)
+
+
+def restore_snapshot(db_path, backup_dir=None, snapshot_id=None, pages_per_step=256):
+    """Restore a snapshot (latest by default) into the live database file"""
+    backup_dir = backup_dir or default_backup_dir(db_path)
+    manifest = load_manifest(backup_dir)
+    if not manifest["snapshots"]:
+        raise ValueError(f"No snapshots found in {backup_dir}")
+    snapshot_id = snapshot_id or manifest["snapshots"][-1]["id"]
+
+    started = time.perf_counter()
+    temp_path = os.path.join(backup_dir, f".restore-{snapshot_id}.db")
+    _materialize(backup_dir, manifest, snapshot_id, temp_path)
+
+    check = sqlite3.connect(temp_path)
+    status = check.execute("PRAGMA quick_check").fetchone()[0]
+    check.close()
+    if status != "ok":
+        os.remove(temp_path)
+        raise sqlite3.DatabaseError(f"Snapshot '{snapshot_id}' failed quick_check: {status}")
+
+    # Copying through the backup API takes the proper locks on the live file
+    report = backup_database(temp_path, db_path, pages_per_step, sleep=0)
+    os.remove(temp_path)
+    report["source"] = backup_dir
+    report["snapshot"] = snapshot_id
+    report["seconds"] = time.perf_counter() - started
+    report["mb_per_s"] = _mb_per_s(report["bytes"], report["seconds"])
+    return report
+
+
+def backup_all_databases(data_dir="data", max_workers=4, incremental=True):
+    """Snapshot every database in data_dir in parallel"""
+    paths = [
+        os.path.join(data_dir, name)
+        for name in sorted(os.listdir(data_dir))
+        if name.endswith(".db")
+    ]
+    started = time.perf_counter()
+    # sqlite3 releases the GIL while copying pages, so threads run in parallel
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        reports = list(
+            pool.map(lambda path: create_snapshot(path, incremental=incremental), paths)
+        )
+    seconds = time.perf_counter() - started
+    copied = sum(report.get("bytes", 0) for report in reports)
+    return {
+        "databases": reports,
+        "bytes": copied,
+        "seconds": seconds,
+        "mb_per_s": _mb_per_s(copied, seconds),
+    }
+
+
+def _print_report(report):
+    if report.get("skipped"):
+        print(f"= {report['source']}: unchanged since snapshot {report['snapshot']}")
+        return
+    line = f"✓ {report['source']} -> {report['destination']}"
+    line += f" ({report['bytes'] / 1024:.1f} KB in {report['seconds']:.2f}s"
+    line += f", {report['mb_per_s']:.1f} MB/s)"
+    if report.get("kind") == "diff":
+        line += f" [{report['changed_pages']} changed pages]"
+    print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Back up and restore databases in data/")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backup_parser = subparsers.add_parser("backup", help="Snapshot databases")
+    backup_parser.add_argument("names", nargs="*", help="Database names (default: all)")
+    backup_parser.add_argument("--full", action="store_true", help="Force a full snapshot")
+    backup_parser.add_argument("--workers", type=int, default=4)
+
+    restore_parser = subparsers.add_parser("restore", help="Restore a snapshot")
+    restore_parser.add_argument("name", help="Database name")
+    restore_parser.add_argument("--snapshot", help="Snapshot id (default: latest)")
+
+    list_parser = subparsers.add_parser("list", help="List snapshots of a database")
+    list_parser.add_argument("name", help="Database name")
+
+    args = parser.parse_args(argv)
+    from everything_db import SQLiteDatabase
+
+    if args.command == "backup":
+        if args.names:
+            for name in args.names:
+                _print_report(SQLiteDatabase(name).create_snapshot(incremental=not args.full))
+        else:
+            summary = backup_all_databases(
+                max_workers=args.workers, incremental=not args.full
+            )
+            for report in summary["databases"]:
+                _print_report(report)
+            print(
+                f"Total: {summary['bytes'] / 1024:.1f} KB in {summary['seconds']:.2f}s "
+                f"({summary['mb_per_s']:.1f} MB/s)"
+            )
+    elif args.command == "restore":
+        report = SQLiteDatabase(args.name).restore_snapshot(args.snapshot)
+        print(
+            f"✓ Restored snapshot {report['snapshot']} into {report['destination']} "
+            f"({report['mb_per_s']:.1f} MB/s)"
+        )
+    elif args.command == "list":
+        for snapshot in SQLiteDatabase(args.name).list_snapshots():
+            print(
+                f"{snapshot['id']}  {snapshot['kind']:<4}  "
+                f"{snapshot['changed_pages']}/{snapshot['page_count']} pages  "
+                f"{snapshot['created']}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Change-data-capture for SQLite Database Manager
+Opt-in per table: generated triggers append every insert, update and delete to
+a compact _changelog table keyed by a monotonically increasing sequence.
+Downstream consumers read changes since their last position in batches and
+acknowledge what they have applied; the log is truncated up to the lowest
+acknowledged sequence, so it only holds changes someone still needs
+"""
+
+import json
+import sqlite3
+
+CHANGELOG_TABLE = "_changelog"
+CONSUMERS_TABLE = "_changelog_consumers"
+OPERATIONS = {"I": "insert", "U": "update", "D": "delete"}
+
+
+def _ensure_tables(cursor):
+    # AUTOINCREMENT: sequence numbers are never reused, even after truncation
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {CHANGELOG_TABLE} (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tbl TEXT NOT NULL,
+            op TEXT NOT NULL,
+            pk TEXT NOT NULL,
+            data TEXT,
+            changed_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {CONSUMERS_TABLE} (
+            name TEXT PRIMARY KEY,
+            acked_seq INTEGER NOT NULL,
+            updated TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+
+
+def _trigger_names(table_name):
+    return [f"_cdc_{table_name}_{kind}" for kind in ("insert", "update", "rekey", "delete")]
+
+
+def _value_sql(ref, column):
+    """JSON can't hold BLOBs, so they are logged as hex.
+
+    Any column can hold one whatever its declared type (compressed TEXT
+    columns store BLOBs), so every value is checked.
+    """
+    name = column[1]
+    return (
+        f"CASE WHEN typeof({ref}.{name}) = 'blob' "
+        f"THEN hex({ref}.{name}) ELSE {ref}.{name} END"
+    )
+
+
+def _trigger_sql(table_name, columns):
+    """CREATE TRIGGER statements that log every change to table_name"""
+    keys = [column[1] for column in sorted(columns, key=lambda c: c[5]) if column[5]]
+    key_refs = keys or ["rowid"]
+
+    def pk(ref):
+        return "json_array(" + ", ".join(f"{ref}.{key}" for key in key_refs) + ")"
+
+    def data(ref):
+        pairs = ", ".join(f"'{column[1]}', {_value_sql(ref, column)}" for column in columns)
+        return f"json_object({pairs})"
+
+    def log(op, ref, with_data=True):
+        row_data = data(ref) if with_data else "NULL"
+        return (
+            f"INSERT INTO {CHANGELOG_TABLE} (tbl, op, pk, data) "
+            f"VALUES ('{table_name}', '{op}', {pk(ref)}, {row_data});"
+        )
+
+    same_key = " AND ".join(f"OLD.{key} IS NEW.{key}" for key in key_refs)
+    insert, update, rekey, delete = _trigger_names(table_name)
+    return [
+        f"CREATE TRIGGER {insert} AFTER INSERT ON {table_name} "
+        f"BEGIN {log('I', 'NEW')} END",
+        f"CREATE TRIGGER {update} AFTER UPDATE ON {table_name} WHEN {same_key} "
+        f"BEGIN {log('U', 'NEW')} END",
+        # A key change is a delete of the old row plus an insert of the new one
+        f"CREATE TRIGGER {rekey} AFTER UPDATE ON {table_name} WHEN NOT ({same_key}) "
+        f"BEGIN {log('D', 'OLD', with_data=False)} {log('I', 'NEW')} END",
+        f"CREATE TRIGGER {delete} AFTER DELETE ON {table_name} "
+        f"BEGIN {log('D', 'OLD', with_data=False)} END",
+    ]
+
+
+def enable_cdc(db, table_name):
+    """Install (or regenerate after a schema change) the logging triggers"""
+    columns = db.get_column_info(table_name)
+    if not columns:
+        raise ValueError(f"Table '{table_name}' not found")
+
+    conn = db._connect()
+    cursor = conn.cursor()
+    try:
+        _ensure_tables(cursor)
+        for name in _trigger_names(table_name):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        for sql in _trigger_sql(table_name, columns):
+            cursor.execute(sql)
+        db._commit(conn)
+    finally:
+        db._release(conn)
+
+
+def disable_cdc(db, table_name):
+    """Stop logging a table; changes already in the log stay readable"""
+    conn = db._connect()
+    try:
+        for name in _trigger_names(table_name):
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        db._commit(conn)
+    finally:
+        db._release(conn)
+
+
+def cdc_tables(db):
+    """Tables that currently have logging triggers"""
+    conn = db._connect()
+    rows = conn.execute(
+        "SELECT tbl_name FROM sqlite_master "
+        "WHERE type='trigger' AND name LIKE '\\_cdc\\_%\\_insert' ESCAPE '\\'"
+    ).fetchall()
+    db._release(conn)
+    return sorted(row[0] for row in rows)
+
+
+def _decode(row):
+    seq, table_name, op, pk, data, changed_at = row
+    return {
+        "seq": seq,
+        "table": table_name,
+        "op": OPERATIONS[op],
+        "key": json.loads(pk),
+        "data": json.loads(data) if data is not None else None,
+        "changed_at": changed_at,
+    }
+
+
+def read_changes(db, since=0, batch_size=1000, tables=None):
+    """Yield lists of changes with seq > since, oldest first, batch_size at a time.
+
+    Each batch is its own short query, so a slow consumer never holds a
+    read transaction open against writers.
+    """
+    if not db.table_exists(CHANGELOG_TABLE):
+        return  # nothing has ever been logged
+    filter_sql = ""
+    params = []
+    if tables:
+        filter_sql = f" AND tbl IN ({', '.join('?' for _ in tables)})"
+        params = list(tables)
+
+    while True:
+        conn = db._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT seq, tbl, op, pk, data, changed_at FROM {CHANGELOG_TABLE} "
+                f"WHERE seq > ?{filter_sql} ORDER BY seq LIMIT ?",
+                [since, *params, batch_size],
+            ).fetchall()
+        finally:
+            db._release(conn)
+        if not rows:
+            return
+        yield [_decode(row) for row in rows]
+        since = rows[-1][0]
+
+
+def _latest_sequence(cursor):
+    try:
+        row = cursor.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = ?", (CHANGELOG_TABLE,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return 0  # sqlite_sequence appears with the first AUTOINCREMENT table
+    return row[0] if row else 0
+
+
+def latest_sequence(db):
+    """Highest sequence number ever assigned (0 if nothing has been logged)"""
+    conn = db._connect()
+    try:
+        return _latest_sequence(conn.cursor())
+    finally:
+        db._release(conn)
+
+
+def register_consumer(db, name, from_start=False):
+    """Register a consumer at the current end of the log (or at 0).
+
+    A consumer that starts at the current end should copy the tables it
+    replicates first; everything after that copy will be in the log.
+    Returns the consumer's starting sequence.
+    """
+    conn = db._connect()
+    cursor = conn.cursor()
+    try:
+        _ensure_tables(cursor)
+        start = 0 if from_start else _latest_sequence(cursor)
+        cursor.execute(
+            f"INSERT OR IGNORE INTO {CONSUMERS_TABLE} (name, acked_seq) VALUES (?, ?)",
+            (name, start),
+        )
+        db._commit(conn)
+        position = cursor.execute(
+            f"SELECT acked_seq FROM {CONSUMERS_TABLE} WHERE name = ?", (name,)
+        ).fetchone()[0]
+    finally:
+        db._release(conn)
+    return position
+
+
+def unregister_consumer(db, name):
+    """Forget a consumer; changes only it was waiting for can now be truncated"""
+    conn = db._connect()
+    try:
+        conn.execute(f"DELETE FROM {CONSUMERS_TABLE} WHERE name = ?", (name,))
+        _truncate(conn)
+        db._commit(conn)
+    finally:
+        db._release(conn)
+
+
+def get_consumers(db):
+    """{consumer name: last acknowledged sequence}"""
+    conn = db._connect()
+    try:
+        rows = conn.execute(f"SELECT name, acked_seq FROM {CONSUMERS_TABLE}").fetchall()
+    except sqlite3.OperationalError:
+        rows = []  # no consumer has registered yet
+    db._release(conn)
+    return dict(rows)
+
+
+def _truncate(conn):
+    """Delete log entries every registered consumer has acknowledged"""
+    low = conn.execute(f"SELECT MIN(acked_seq) FROM {CONSUMERS_TABLE}").fetchone()[0]
+    if low is None:
+        return 0  # no consumers: keep everything
+    return conn.execute(f"DELETE FROM {CHANGELOG_TABLE} WHERE seq <= ?", (low,)).rowcount
+
+
+def ack_changes(db, name, seq):
+    """Record that a consumer has applied everything up to ``seq``.
+
+    Positions only move forward. Returns the number of log entries that
+    became truncatable and were deleted.
+    """
+    conn = db._connect()
+    try:
+        updated = conn.execute(
+            f"UPDATE {CONSUMERS_TABLE} SET acked_seq = MAX(acked_seq, ?), "
+            "updated = CURRENT_TIMESTAMP WHERE name = ?",
+            (seq, name),
+        ).rowcount
+        if not updated:
+            raise ValueError(f"Unknown changelog consumer '{name}'")
+        deleted = _truncate(conn)
+        db._commit(conn)
+    finally:
+        db._release(conn)
+    return deleted
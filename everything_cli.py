@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Non-interactive command line for SQLite Database Manager
+Subcommands call SQLiteDatabase directly so scripts and cron jobs can query,
+import, export and inspect databases without driving the terminal UI; every
+command accepts several databases and streams its output as CSV or JSONL
+"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+from everything_db import SQLiteDatabase, split_sql_statements
+
+FORMATS = ("csv", "jsonl")
+
+
+class CommandError(Exception):
+    """A usage or input problem reported as a one-line error, without a traceback"""
+
+
+def _cell(value):
+    """BLOBs have no CSV/JSON form, so emit them as hex"""
+    return value.hex() if isinstance(value, (bytes, memoryview)) else value
+
+
+class RowWriter:
+    """Stream rows to a file as CSV (header per column set) or JSON lines"""
+
+    def __init__(self, out, fmt="csv", database_column=False):
+        self.out = out
+        self.fmt = fmt
+        # Prefix every row with its database when several are being processed
+        self.database_column = database_column
+        self._csv = csv.writer(out) if fmt == "csv" else None
+        self._header = None
+        self.rows = 0
+
+    def write_rows(self, database, columns, rows):
+        if self.database_column:
+            columns = ["database"] + list(columns)
+        if self._csv is not None and columns != self._header:
+            self._csv.writerow(columns)
+            self._header = columns
+        for row in rows:
+            values = [_cell(value) for value in row]
+            if self.database_column:
+                values.insert(0, database)
+            if self._csv is not None:
+                self._csv.writerow(values)
+            else:
+                self.out.write(json.dumps(dict(zip(columns, values)), default=str))
+                self.out.write("\n")
+            self.rows += 1
+
+
+def _read_sql(args):
+    """SQL from the positional argument, --file(s), or stdin ('-' or nothing)"""
+    parts = []
+    for path in args.file or []:
+        with open(path) as f:
+            parts.append(f.read())
+    if args.sql and args.sql != "-":
+        parts.append(args.sql)
+    elif args.sql == "-" or not parts:
+        parts.append(sys.stdin.read())
+    sql = "\n".join(parts).strip()
+    if not sql:
+        raise CommandError("No SQL given (pass it as an argument, --file or stdin)")
+    return sql
+
+
+def _open_databases(args, must_exist=True):
+    """One SQLiteDatabase per selected name, all with the same connection setup"""
+    names = list(args.db or [])
+    if args.all:
+        names += [info["name"] for info in SQLiteDatabase("temp").list_all_databases()]
+    if not names:
+        raise CommandError("No databases selected (use --db NAME or --all)")
+
+    databases = []
+    for name in dict.fromkeys(names):  # de-duplicate, keep order
+        db = SQLiteDatabase(name, read_only=args.read_only, mmap_size=args.mmap_size)
+        if must_exist and not os.path.exists(db.db_name):
+            raise CommandError(f"Database '{name}' not found in {db.data_dir}/")
+        databases.append((name, db))
+    return databases
+
+
+def _open_output(path):
+    if not path or path == "-":
+        return sys.stdout
+    return open(path, "w", newline="")
+
+
+def _print_timings(name, results):
+    for number, result in enumerate(results, 1):
+        lines = [line.strip() for line in result["sql"].splitlines()]
+        code = [line for line in lines if line and not line.startswith(("--", "/*"))]
+        first_line = (code or lines)[0][:60]
+        if result["columns"] is not None:
+            outcome = f"{len(result['rows'])} rows"
+        elif result["rowcount"] >= 0:
+            outcome = f"{result['rowcount']} changed"
+        else:
+            outcome = "ok"
+        print(
+            f"{name} #{number}: {result['seconds'] * 1000:8.2f} ms  {outcome:<12} {first_line}",
+            file=sys.stderr,
+        )
+
+
+def _decompressed(db, rows):
+    """Compressed column values (see everything_compress) back to their text.
+
+    Done by value: which columns of an arbitrary query came from a
+    compressed column isn't known, and only compressed BLOBs change.
+    """
+    if not db.get_compressed_columns():
+        return rows
+    from everything_compress import decompress_value
+
+    return (tuple(decompress_value(value) for value in row) for row in rows)
+
+
+def cmd_query(args):
+    sql = _read_sql(args)
+    # A single statement streams straight from the cursor; scripts run
+    # statement by statement in one transaction via execute_script
+    single = not args.executescript and len(split_sql_statements(sql)) == 1
+    databases = _open_databases(args)
+    out = _open_output(args.output)
+    writer = RowWriter(out, args.format, database_column=len(databases) > 1)
+    try:
+        for name, db in databases:
+            if single:
+                started = time.perf_counter()
+                columns, rows = db.stream_query(sql)
+                if columns is not None:
+                    writer.write_rows(name, columns, _decompressed(db, rows))
+                if args.timing:
+                    seconds = time.perf_counter() - started
+                    print(f"{name}: {seconds * 1000:.2f} ms", file=sys.stderr)
+            else:
+                results = db.execute_script(sql, use_executescript=args.executescript)
+                for result in results:
+                    if result["columns"] is not None:
+                        writer.write_rows(
+                            name, result["columns"], _decompressed(db, result["rows"])
+                        )
+                if args.timing:
+                    _print_timings(name, results)
+            db.close()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return writer.rows
+
+
+def _read_rows(path, fmt, batch_size):
+    """Yield lists of row dicts from a CSV (header row) or JSONL file"""
+    f = sys.stdin if path == "-" else open(path, newline="")
+    try:
+        if fmt == "csv":
+            source = csv.DictReader(f)
+        else:
+            source = (json.loads(line) for line in f if line.strip())
+        batch = []
+        for row in source:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _guess_format(path, fmt):
+    if fmt:
+        return fmt
+    return "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def cmd_import(args):
+    databases = _open_databases(args)
+    if args.input == "-" and len(databases) > 1:
+        raise CommandError("stdin can only be imported into one database per run")
+    fmt = _guess_format(args.input, args.format)
+
+    total = 0
+    for name, db in databases:
+        if not db.table_exists(args.table):
+            raise CommandError(f"Table '{args.table}' not found in '{name}'")
+        started = time.perf_counter()
+        written = 0
+        rejected = 0
+        offset = 0
+        # One write transaction per database: a SQLite error rolls the file back
+        with db.transaction("IMMEDIATE"):
+            for batch in _read_rows(args.input, fmt, args.batch_size):
+                if not args.no_coerce:
+                    # Rows failing a type/NOT NULL check are reported, not written
+                    good, errors = db.coerce_rows(args.table, batch)
+                    for error in errors:
+                        if rejected < args.max_errors:
+                            print(
+                                f"  {name} row {offset + error['row'] + 1}: {error['error']}",
+                                file=sys.stderr,
+                            )
+                    rejected += len({error["row"] for error in errors})
+                    batch = good
+                offset += args.batch_size
+                written += db.insert_many(args.table, batch)
+        seconds = time.perf_counter() - started
+        line = f"✓ {name}: imported {written} rows into {args.table} in {seconds:.2f}s"
+        if rejected:
+            line += f", rejected {rejected}"
+        print(line, file=sys.stderr)
+        total += written
+    return total
+
+
+def cmd_export(args):
+    databases = _open_databases(args)
+    out = _open_output(args.output)
+    writer = RowWriter(out, args.format, database_column=len(databases) > 1)
+    try:
+        for name, db in databases:
+            if not db.table_exists(args.table):
+                raise CommandError(f"Table '{args.table}' not found in '{name}'")
+            # Compressed columns are exported as their original text
+            columns, rows = db.stream_table_data(
+                args.table, args.limit, args.batch_size, condition=args.where
+            )
+            writer.write_rows(name, columns, rows)
+            db.close()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return writer.rows
+
+
+def cmd_list(args):
+    writer = RowWriter(sys.stdout, args.format)
+    columns = ["name", "file", "bytes", "description", "tags"]
+    rows = []
+    for info in SQLiteDatabase("temp").list_all_databases():
+        metadata = info.get("metadata") or {}
+        rows.append(
+            [
+                info["name"],
+                info["file"],
+                os.path.getsize(info["path"]),
+                metadata.get("description", ""),
+                ",".join(metadata.get("tags", [])),
+            ]
+        )
+    writer.write_rows(None, columns, rows)
+    return writer.rows
+
+
+def cmd_info(args):
+    databases = _open_databases(args)
+    writer = RowWriter(sys.stdout, args.format)
+    columns = ["database", "table", "rows", "columns", "bytes", "description"]
+    for name, db in databases:
+        metadata = db.get_metadata() or {}
+        size = os.path.getsize(db.db_name)
+        rows = []
+        for table in db.get_tables():
+            rows.append(
+                [
+                    name,
+                    table,
+                    db.select_count_from_sqlite_table(table, "1=1"),
+                    len(db.get_column_info(table)),
+                    size,
+                    metadata.get("description", ""),
+                ]
+            )
+        writer.write_rows(name, columns, rows)
+        db.close()
+    return writer.rows
+
+
+def cmd_create_table(args):
+    databases = _open_databases(args, must_exist=False)
+    created = 0
+    for name, db in databases:
+        if args.if_not_exists and db.table_exists(args.table):
+            print(f"= {name}: table '{args.table}' already exists", file=sys.stderr)
+            continue
+        try:
+            db.create_table_safe(args.table, args.columns)
+        except ValueError as e:
+            raise CommandError(f"{name}: {e}")
+        print(f"✓ {name}: created table '{args.table}'", file=sys.stderr)
+        created += 1
+    return created
+
+
+def cmd_bench(args):
+    sql = _read_sql(args)
+    databases = _open_databases(args)
+    writer = RowWriter(sys.stdout, args.format)
+    columns = ["database", "runs", "rows", "min_ms", "median_ms", "p95_ms", "max_ms"]
+    for name, db in databases:
+        timings = []
+        row_count = 0
+        for _ in range(args.warmup + args.runs):
+            started = time.perf_counter()
+            _, rows = db.stream_query(sql)
+            row_count = sum(1 for _ in rows)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings = sorted(timings[args.warmup :])
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        writer.write_rows(
+            name,
+            columns,
+            [
+                [
+                    name,
+                    len(timings),
+                    row_count,
+                    round(timings[0], 3),
+                    round(statistics.median(timings), 3),
+                    round(p95, 3),
+                    round(timings[-1], 3),
+                ]
+            ],
+        )
+        db.close()
+    return writer.rows
+
+
+def _at_least(minimum):
+    """argparse type for an integer option with a lower bound"""
+
+    def parse(text):
+        try:
+            value = int(text)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid integer: {text!r}") from None
+        if value < minimum:
+            raise argparse.ArgumentTypeError(f"must be at least {minimum}, got {value}")
+        return value
+
+    return parse
+
+
+def build_parser():
+    # Database selection and connection setup shared by every subcommand
+    databases = argparse.ArgumentParser(add_help=False)
+    databases.add_argument(
+        "-d", "--db", action="append", metavar="NAME", help="Database name (repeatable)"
+    )
+    databases.add_argument("--all", action="store_true", help="Every database in data/")
+    databases.add_argument(
+        "--read-only", action="store_true", help="Open databases as read-only replicas"
+    )
+    databases.add_argument("--mmap-size", type=int, help="PRAGMA mmap_size in bytes")
+
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--format", choices=FORMATS, default="csv")
+
+    sql_input = argparse.ArgumentParser(add_help=False)
+    sql_input.add_argument("sql", nargs="?", help="SQL text, or '-' for stdin")
+    sql_input.add_argument(
+        "-f", "--file", action="append", help="Read SQL from a file (repeatable)"
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="everything", description="Scriptable access to the databases in data/"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    query = subparsers.add_parser(
+        "query",
+        parents=[databases, output, sql_input],
+        help="Run a query",
+        description="Run a query. Values of compressed columns are output decompressed.",
+    )
+    query.add_argument("-o", "--output", help="Write results to a file (default: stdout)")
+    query.add_argument(
+        "--timing", action="store_true", help="Report per-statement timings on stderr"
+    )
+    query.add_argument(
+        "--executescript",
+        action="store_true",
+        help="Run the whole script in one executescript call (no results returned)",
+    )
+    query.set_defaults(handler=cmd_query)
+
+    import_ = subparsers.add_parser(
+        "import", parents=[databases], help="Load rows from CSV or JSONL"
+    )
+    import_.add_argument("table")
+    import_.add_argument("input", help="CSV/JSONL file, or '-' for stdin")
+    import_.add_argument("--format", choices=FORMATS, help="Default: from extension")
+    import_.add_argument("--batch-size", type=int, default=5000)
+    import_.add_argument(
+        "--no-coerce", action="store_true", help="Insert values as read, without type checks"
+    )
+    import_.add_argument(
+        "--max-errors", type=int, default=20, help="Rejected rows to print (default: 20)"
+    )
+    import_.set_defaults(handler=cmd_import)
+
+    export = subparsers.add_parser(
+        "export", parents=[databases, output], help="Stream a table as CSV or JSONL"
+    )
+    export.add_argument("table")
+    export.add_argument("-o", "--output", help="Output file (default: stdout)")
+    export.add_argument("--where", help="SQL condition to filter rows")
+    export.add_argument("--limit", type=int)
+    export.add_argument("--batch-size", type=int, default=5000)
+    export.set_defaults(handler=cmd_export)
+
+    list_ = subparsers.add_parser("list", parents=[output], help="List databases")
+    list_.set_defaults(handler=cmd_list)
+
+    info = subparsers.add_parser(
+        "info", parents=[databases, output], help="Tables, row counts and metadata"
+    )
+    info.set_defaults(handler=cmd_info)
+
+    create = subparsers.add_parser(
+        "create-table", parents=[databases], help="Create a table in each database"
+    )
+    create.add_argument("table")
+    create.add_argument("columns", help='Column definitions, e.g. "id INTEGER PRIMARY KEY, name TEXT"')
+    create.add_argument("--if-not-exists", action="store_true")
+    create.set_defaults(handler=cmd_create_table)
+
+    bench = subparsers.add_parser(
+        "bench", parents=[databases, output, sql_input], help="Time a query"
+    )
+    bench.add_argument("--runs", type=_at_least(1), default=10)
+    bench.add_argument("--warmup", type=_at_least(0), default=1)
+    bench.set_defaults(handler=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.handler(args)
+    except BrokenPipeError:
+        # Output piped into head/less that exited early
+        return 0
+    except (CommandError, ValueError, sqlite3.Error, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
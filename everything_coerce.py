@@ -0,0 +1,223 @@
+"""
+Type coercion for SQLite Database Manager
+Converts user-entered and imported values to each column's type before they
+reach SQLite, so INTEGER/REAL columns store numbers rather than text. Each
+table gets one converter per column, chosen once from its declared type and
+cached until the schema changes; batches are converted column by column
+instead of branching on the type of every cell
+"""
+
+import os
+import threading
+
+# Coercers per (database path, table), invalidated by PRAGMA schema_version
+_coercers = {}
+_coercers_lock = threading.Lock()
+
+_TRUE = {"1", "true", "t", "yes", "y", "on"}
+_FALSE = {"0", "false", "f", "no", "n", "off"}
+
+
+def column_affinity(declared_type):
+    """SQLite's type affinity for a declared column type (section 3.1 rules)"""
+    declared = (declared_type or "").upper()
+    if "INT" in declared:
+        return "INTEGER"
+    if "CHAR" in declared or "CLOB" in declared or "TEXT" in declared:
+        return "TEXT"
+    if not declared or "BLOB" in declared:
+        return "BLOB"
+    if "REAL" in declared or "FLOA" in declared or "DOUB" in declared:
+        return "REAL"
+    return "NUMERIC"
+
+
+def _blank(value):
+    """Empty input for a non-text column means NULL"""
+    return isinstance(value, str) and not value.strip()
+
+
+def to_integer(value):
+    if value is None or isinstance(value, int):
+        return value
+    if _blank(value):
+        return None
+    if isinstance(value, float):
+        number = value
+    else:
+        text = str(value).strip()
+        try:
+            return int(text)
+        except ValueError:
+            number = float(text)
+    if not number.is_integer():
+        raise ValueError("not a whole number")
+    return int(number)
+
+
+def to_real(value):
+    if value is None or isinstance(value, float):
+        return value
+    if _blank(value):
+        return None
+    return float(value)
+
+
+def to_numeric(value):
+    """NUMERIC keeps text that isn't a number, exactly as SQLite would"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if _blank(value):
+        return None
+    text = str(value).strip()
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return value
+
+
+def to_boolean(value):
+    if value is None or isinstance(value, bool):
+        return None if value is None else int(value)
+    if isinstance(value, int) and value in (0, 1):
+        return value
+    if _blank(value):
+        return None
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return 1
+    if text in _FALSE:
+        return 0
+    raise ValueError("not a boolean")
+
+
+def to_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (bytes, memoryview)):
+        raise ValueError("binary data in a TEXT column")
+    return str(value)
+
+
+def passthrough(value):
+    return value
+
+
+CONVERTERS = {
+    "INTEGER": to_integer,
+    "REAL": to_real,
+    "NUMERIC": to_numeric,
+    "BOOLEAN": to_boolean,
+    "TEXT": to_text,
+    "BLOB": passthrough,
+}
+
+
+def _error(row, column, value, message):
+    return {"row": row, "column": column, "value": value, "error": message}
+
+
+class TableCoercer:
+    """Column converters and NOT NULL rules for one table, built from PRAGMA table_info"""
+
+    def __init__(self, column_info):
+        self.columns = {}
+        self.required = []
+        for cid, name, declared, not_null, default, is_pk in column_info:
+            kind = column_affinity(declared)
+            if "BOOL" in (declared or "").upper():
+                kind = "BOOLEAN"
+            # INTEGER PRIMARY KEY aliases the rowid: NULL means "assign one"
+            rowid_alias = bool(is_pk) and (declared or "").upper() == "INTEGER"
+            nullable = not not_null or rowid_alias
+            self.columns[name] = (kind, CONVERTERS[kind], nullable)
+            if not nullable and default is None:
+                self.required.append(name)
+
+    def convert(self, column, value):
+        """Convert one value (raises ValueError with a readable message)"""
+        kind, converter, nullable = self.columns[column]
+        try:
+            converted = converter(value)
+        except (ValueError, TypeError, OverflowError):
+            raise ValueError(f"{column}: expected {kind}, got {value!r}")
+        if converted is None and not nullable:
+            raise ValueError(f"{column}: NOT NULL column can't be empty")
+        return converted
+
+    def coerce(self, rows):
+        """Convert a batch of row dicts; returns ``(good_rows, errors)``.
+
+        Rows with any problem are left out of ``good_rows`` and each problem
+        is reported as ``{"row", "column", "value", "error"}`` (row is the
+        index in ``rows``), so one bad row never sinks the rest.
+        """
+        rows = list(rows)
+        converted = [dict(row) for row in rows]
+        errors = []
+
+        names = dict.fromkeys(name for row in rows for name in row)
+        for name in names:
+            indices = [i for i, row in enumerate(rows) if name in row]
+            if name not in self.columns:
+                errors.extend(
+                    _error(i, name, rows[i][name], f"no such column: {name}")
+                    for i in indices
+                )
+                continue
+
+            kind, converter, nullable = self.columns[name]
+            values = [rows[i][name] for i in indices]
+            try:
+                # Fast path: one converter applied down the whole column
+                results = list(map(converter, values))
+            except (ValueError, TypeError, OverflowError):
+                results = None
+            if results is None or (not nullable and None in results):
+                # Slow path only for columns that have a bad cell
+                results = []
+                for i, value in zip(indices, values):
+                    try:
+                        results.append(self.convert(name, value))
+                    except ValueError as e:
+                        errors.append(_error(i, name, value, str(e)))
+                        results.append(value)
+            for i, value in zip(indices, results):
+                converted[i][name] = value
+
+        for name in self.required:
+            errors.extend(
+                _error(i, name, None, f"{name}: required (NOT NULL)")
+                for i, row in enumerate(rows)
+                if name not in row
+            )
+
+        bad = {error["row"] for error in errors}
+        good = [row for i, row in enumerate(converted) if i not in bad]
+        errors.sort(key=lambda error: error["row"])
+        return good, errors
+
+
+def get_coercer(db, table_name):
+    """Cached TableCoercer for a table; rebuilt only when the schema changes"""
+    conn = db._connect()
+    schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    db._release(conn)
+
+    key = (os.path.abspath(db.db_name), table_name)
+    with _coercers_lock:
+        cached = _coercers.get(key)
+    if cached and cached[0] == schema_version:
+        return cached[1]
+
+    column_info = db.get_column_info(table_name)
+    if not column_info:
+        raise ValueError(f"Table '{table_name}' not found")
+    coercer = TableCoercer(column_info)
+    with _coercers_lock:
+        _coercers[key] = (schema_version, coercer)
+    return coercer
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Column compression for SQLite Database Manager
+Opt-in per column: large TEXT values (JSON documents, logs, ...) are stored as
+zlib- or lzma-compressed BLOBs and decompressed again by the select helpers.
+Fewer bytes per row means more rows per page and a better page cache hit
+rate. Compressed columns are listed in _compressed_columns; SQL can read them
+with the registered decompress() function, e.g.
+``SELECT decompress(payload) FROM events WHERE decompress(payload) LIKE ?``
+"""
+
+import os
+import sqlite3
+import sys
+import time
+import zlib
+
+COMPRESSED_COLUMNS_TABLE = "_compressed_columns"
+
+# Stored values are MAGIC + codec tag + compressed UTF-8. Plain TEXT values
+# (short ones, or rows written before compression was enabled) stay as they
+# are, so a column can hold both and is readable throughout a migration.
+MAGIC = b"\x00c"
+CODECS = {"zlib": b"z", "lzma": b"x"}
+_CODEC_BY_TAG = {tag: codec for codec, tag in CODECS.items()}
+
+# Values shorter than this aren't worth the header and CPU
+MIN_COMPRESS_BYTES = 256
+
+
+def _codec_module(codec):
+    if codec == "lzma":
+        import lzma  # noticeably slower to import than zlib, so only on demand
+
+        return lzma
+    return zlib
+
+
+def compress_value(value, codec="zlib", min_size=MIN_COMPRESS_BYTES):
+    """Compressed BLOB for a text value, or the value unchanged.
+
+    Non-text values, short text and text that doesn't shrink are returned
+    as they are.
+    """
+    if not isinstance(value, str):
+        return value
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}'. Choose from: {', '.join(CODECS)}")
+    raw = value.encode("utf-8")
+    if len(raw) < min_size:
+        return value
+    packed = MAGIC + CODECS[codec] + _codec_module(codec).compress(raw)
+    return packed if len(packed) < len(raw) else value
+
+
+def is_compressed(value):
+    return (
+        isinstance(value, bytes)
+        and value[:2] == MAGIC
+        and value[2:3] in _CODEC_BY_TAG
+    )
+
+
+def decompress_value(value):
+    """Original text for a compressed BLOB; anything else is returned unchanged"""
+    if not is_compressed(value):
+        return value
+    codec = _CODEC_BY_TAG[value[2:3]]
+    return _codec_module(codec).decompress(value[3:]).decode("utf-8")
+
+
+def _sql_compress(value, codec="zlib"):
+    return compress_value(value, codec)
+
+
+def register_functions(conn):
+    """Make compress(text[, codec]) and decompress(value) available in SQL.
+
+    Both are deterministic, so they can be used in expression indexes and
+    generated columns.
+    """
+    conn.create_function("decompress", 1, decompress_value, deterministic=True)
+    conn.create_function("compress", 1, _sql_compress, deterministic=True)
+    conn.create_function("compress", 2, _sql_compress, deterministic=True)
+
+
+def get_compressed_columns(conn, table_name):
+    """{column: codec} for a table's compressed columns"""
+    return get_all_compressed_columns(conn).get(table_name, {})
+
+
+def get_all_compressed_columns(conn):
+    """{table: {column: codec}} for every compressed column in the database"""
+    try:
+        rows = conn.execute(
+            f"SELECT tbl, col, codec FROM {COMPRESSED_COLUMNS_TABLE}"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return {}  # compression has never been enabled in this database
+    tables = {}
+    for table_name, column, codec in rows:
+        tables.setdefault(table_name, {})[column] = codec
+    return tables
+
+
+def _bump_version(conn):
+    """Tell every SQLiteDatabase on this file to reread the compressed columns"""
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS _database_metadata (key TEXT PRIMARY KEY, value TEXT)"
+    )
+    conn.execute(
+        "INSERT INTO _database_metadata (key, value) VALUES ('compression:version', 1) "
+        "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+    )
+
+
+def compress_rows(compressed, columns, values):
+    """Compress the configured columns of value tuples listed in ``columns`` order"""
+    positions = [
+        (i, compressed[column])
+        for i, column in enumerate(columns)
+        if column in compressed
+    ]
+    if not positions:
+        return values
+    result = []
+    for row in values:
+        row = list(row)
+        for i, codec in positions:
+            row[i] = compress_value(row[i], codec)
+        result.append(tuple(row))
+    return result
+
+
+def decompress_rows(compressed, description, rows):
+    """Decompress result columns whose names are compressed columns"""
+    positions = [
+        i for i, column in enumerate(description or ()) if column[0] in compressed
+    ]
+    if not positions:
+        return rows
+    result = []
+    for row in rows:
+        row = list(row)
+        for i in positions:
+            row[i] = decompress_value(row[i])
+        result.append(tuple(row))
+    return result
+
+
+def _column_bytes(conn, table_name, column):
+    """(values, stored bytes, compressed values) for one column"""
+    return conn.execute(
+        f"SELECT COUNT({column}), COALESCE(SUM(length(CAST({column} AS BLOB))), 0), "
+        f"COALESCE(SUM(substr({column}, 1, 2) = ? AND typeof({column}) = 'blob'), 0) "
+        f"FROM {table_name}",
+        (MAGIC,),
+    ).fetchone()
+
+
+def _file_bytes(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+    return page_size * pages, page_size * free
+
+
+def _rewrite_column(db, table_name, column, expression, condition, params, batch_size):
+    """UPDATE a column in rowid batches, one short write transaction each"""
+    conn = db._connect()
+    try:
+        bounds = conn.execute(
+            f"SELECT MIN(rowid), MAX(rowid) FROM {table_name}"
+        ).fetchone()
+    finally:
+        db._release(conn)
+    if bounds[0] is None:
+        return 0
+
+    changed = 0
+    for start in range(bounds[0], bounds[1] + 1, batch_size):
+        with db.transaction("IMMEDIATE"):
+            conn = db._connect()
+            register_functions(conn)  # the connection may predate enable_compression
+            changed += conn.execute(
+                f"UPDATE {table_name} SET {column} = {expression} "
+                f"WHERE rowid >= ? AND rowid < ? AND ({condition})",
+                (start, start + batch_size, *params),
+            ).rowcount
+    return changed
+
+
+def enable_compression(
+    db, table_name, column, codec="zlib", migrate=True, batch_size=5000
+):
+    """Compress a column from now on and, with ``migrate``, its existing values.
+
+    Existing rows are rewritten in rowid batches so writers are never
+    blocked for long. Returns a space report. The file itself only shrinks
+    after VACUUM: ``reclaimable_bytes`` counts pages that became free, but
+    space left inside partly-emptied pages is only recovered by VACUUM.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}'. Choose from: {', '.join(CODECS)}")
+    if column not in [info[1] for info in db.get_column_info(table_name)]:
+        raise ValueError(f"Column '{column}' not found in table '{table_name}'")
+    if db.in_transaction():
+        raise ValueError("enable_compression() manages its own transactions")
+
+    conn = db._connect()
+    try:
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {COMPRESSED_COLUMNS_TABLE} (
+                tbl TEXT NOT NULL,
+                col TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                PRIMARY KEY (tbl, col)
+            )
+        """
+        )
+        conn.execute(
+            f"INSERT INTO {COMPRESSED_COLUMNS_TABLE} (tbl, col, codec) VALUES (?, ?, ?) "
+            "ON CONFLICT(tbl, col) DO UPDATE SET codec = excluded.codec",
+            (table_name, column, codec),
+        )
+        _bump_version(conn)
+        db._commit(conn)
+    finally:
+        db._release(conn)
+
+    from everything_cdc import cdc_tables, enable_cdc
+
+    if table_name in cdc_tables(db):
+        # Triggers from before the BLOB guard covered every column would
+        # hand json_object() a compressed BLOB; regenerate them
+        enable_cdc(db, table_name)
+
+    if not migrate:
+        return None
+    # Long plain text, plus values compressed with a different codec
+    condition = (
+        f"(typeof({column}) = 'text' AND length(CAST({column} AS BLOB)) >= ?) "
+        f"OR (substr({column}, 1, 2) = ? AND substr({column}, 3, 1) != ?)"
+    )
+    return _migrate(
+        db,
+        table_name,
+        column,
+        f"compress(decompress({column}), '{codec}')",
+        condition,
+        (MIN_COMPRESS_BYTES, MAGIC, CODECS[codec]),
+        batch_size,
+    )
+
+
+def disable_compression(db, table_name, column, batch_size=5000):
+    """Store a column's values as plain text again and stop compressing it"""
+    if db.in_transaction():
+        raise ValueError("disable_compression() manages its own transactions")
+    report = _migrate(
+        db,
+        table_name,
+        column,
+        f"decompress({column})",
+        f"typeof({column}) = 'blob' AND substr({column}, 1, 2) = ?",
+        (MAGIC,),
+        batch_size,
+    )
+    conn = db._connect()
+    try:
+        conn.execute(
+            f"DELETE FROM {COMPRESSED_COLUMNS_TABLE} WHERE tbl = ? AND col = ?",
+            (table_name, column),
+        )
+        _bump_version(conn)
+        db._commit(conn)
+    except sqlite3.OperationalError:
+        pass  # never enabled: nothing to forget
+    finally:
+        db._release(conn)
+    return report
+
+
+def _migrate(db, table_name, column, expression, condition, params, batch_size):
+    started = time.perf_counter()
+    conn = db._connect()
+    try:
+        _, bytes_before, _ = _column_bytes(conn, table_name, column)
+    finally:
+        db._release(conn)
+
+    rewritten = _rewrite_column(
+        db, table_name, column, expression, condition, params, batch_size
+    )
+
+    conn = db._connect()
+    try:
+        values, bytes_after, compressed = _column_bytes(conn, table_name, column)
+    finally:
+        db._release(conn)
+    file_bytes, free_bytes = _file_bytes(db.db_name)
+    return {
+        "table": table_name,
+        "column": column,
+        "rows_rewritten": rewritten,
+        "values": values,
+        "compressed_values": compressed,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "saved_bytes": bytes_before - bytes_after,
+        "ratio": bytes_after / bytes_before if bytes_before else 1.0,
+        "file_bytes": file_bytes,
+        "reclaimable_bytes": free_bytes,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def compression_report(db):
+    """Stored vs. uncompressed size of every compressed column"""
+    conn = db._connect()
+    try:
+        try:
+            configured = conn.execute(
+                f"SELECT tbl, col, codec FROM {COMPRESSED_COLUMNS_TABLE} ORDER BY tbl, col"
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return []
+        register_functions(conn)
+        report = []
+        for table_name, column, codec in configured:
+            values, stored, compressed = _column_bytes(conn, table_name, column)
+            original = conn.execute(
+                f"SELECT COALESCE(SUM(length(CAST(decompress({column}) AS BLOB))), 0) "
+                f"FROM {table_name}"
+            ).fetchone()[0]
+            report.append(
+                {
+                    "table": table_name,
+                    "column": column,
+                    "codec": codec,
+                    "values": values,
+                    "compressed_values": compressed,
+                    "original_bytes": original,
+                    "stored_bytes": stored,
+                    "saved_bytes": original - stored,
+                    "ratio": stored / original if original else 1.0,
+                }
+            )
+        return report
+    finally:
+        db._release(conn)
+
+
+def _size(num_bytes):
+    if abs(num_bytes) < 1024:
+        return f"{num_bytes} B"
+    for unit in ("KB", "MB", "GB"):
+        num_bytes /= 1024
+        if abs(num_bytes) < 1024 or unit == "GB":
+            return f"{num_bytes:.1f} {unit}"
+
+
+def main(argv=None):
+    # Every connection imports this module, so keep argparse off that path
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compress large TEXT columns in place")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enable_parser = subparsers.add_parser("enable", help="Compress a column")
+    disable_parser = subparsers.add_parser("disable", help="Decompress a column")
+    for sub in (enable_parser, disable_parser):
+        sub.add_argument("database")
+        sub.add_argument("table")
+        sub.add_argument("column")
+        sub.add_argument("--batch-size", type=int, default=5000)
+    enable_parser.add_argument("--codec", choices=tuple(CODECS), default="zlib")
+    enable_parser.add_argument(
+        "--vacuum", action="store_true", help="VACUUM afterwards to shrink the file"
+    )
+    report_parser = subparsers.add_parser("report", help="Show space savings")
+    report_parser.add_argument("database")
+    args = parser.parse_args(argv)
+
+    from everything_db import SQLiteDatabase
+
+    db = SQLiteDatabase(args.database)
+    if not os.path.exists(db.db_name):
+        print(f"Database '{args.database}' not found", file=sys.stderr)
+        return 1
+
+    if args.command == "report":
+        for entry in db.compression_report():
+            print(
+                f"{entry['table']}.{entry['column']} ({entry['codec']}): "
+                f"{_size(entry['original_bytes'])} -> {_size(entry['stored_bytes'])} "
+                f"({entry['ratio']:.0%}), {entry['compressed_values']}/"
+                f"{entry['values']} values compressed"
+            )
+        return 0
+
+    try:
+        if args.command == "enable":
+            report = db.enable_compression(
+                args.table, args.column, args.codec, batch_size=args.batch_size
+            )
+        else:
+            report = db.disable_compression(
+                args.table, args.column, batch_size=args.batch_size
+            )
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(
+        f"{args.table}.{args.column}: {report['rows_rewritten']} rows rewritten, "
+        f"{_size(report['bytes_before'])} -> {_size(report['bytes_after'])} "
+        f"in {report['seconds']:.2f}s"
+    )
+    if args.command == "enable" and args.vacuum:
+        before = report["file_bytes"]
+        db.execute_query("VACUUM")
+        print(f"VACUUM: file {_size(before)} -> {_size(os.path.getsize(db.db_name))}")
+    elif report["saved_bytes"] > 0:
+        # Rows that shrank leave space inside their pages; only VACUUM repacks them
+        print(
+            f"{_size(report['reclaimable_bytes'])} of pages are free; "
+            "run with --vacuum (or VACUUM) to shrink the file"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
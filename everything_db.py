@@ -1,10 +1,183 @@
+import functools
+import itertools
 import sqlite3
 import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
+# SQL templates for the aggregates supported by SQLiteDatabase.aggregate
+AGGREGATE_FUNCTIONS = {
+    "count": "COUNT({column})",
+    "sum": "SUM({column})",
+    "avg": "AVG({column})",
+    "min": "MIN({column})",
+    "max": "MAX({column})",
+    "count_distinct": "COUNT(DISTINCT {column})",
+    "total": "TOTAL({column})",
+}
+
+# Locking modes accepted by SQLiteDatabase.transaction
+TRANSACTION_MODES = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+
+# Statements execute_script runs without its wrapping transaction
+NO_TRANSACTION_STATEMENTS = ("VACUUM", "ATTACH", "DETACH", "BEGIN", "COMMIT", "END", "ROLLBACK")
+
+# Default mmap_size for read-only replicas: page reads come straight from
+# the OS page cache instead of being copied into SQLite's own cache
+READ_ONLY_MMAP_SIZE = 256 * 1024 * 1024
+
+# Chunk size used when streaming BLOBs with Connection.blobopen
+BLOB_CHUNK_SIZE = 1024 * 1024
+
+# Write volume per database file from this process, read by the maintenance scheduler
+_write_stats = {}
+_write_stats_lock = threading.Lock()
+
+
+def record_write(db_path, rows=1):
+    """Count rows written to a database file by the library's write paths"""
+    path = os.path.abspath(db_path)
+    with _write_stats_lock:
+        stats = _write_stats.setdefault(path, {"rows": 0, "last_write": None})
+        stats["rows"] += max(rows, 1)
+        stats["last_write"] = time.time()
+
+
+def get_write_stats():
+    """Snapshot of rows written and last write time per database file"""
+    with _write_stats_lock:
+        return {path: dict(stats) for path, stats in _write_stats.items()}
+
+
+def reset_write_stats(db_path, rows):
+    """Subtract rows already handled by a maintenance run"""
+    path = os.path.abspath(db_path)
+    with _write_stats_lock:
+        if path in _write_stats:
+            _write_stats[path]["rows"] = max(_write_stats[path]["rows"] - rows, 0)
+
+
+class ReadOnlyDatabaseError(sqlite3.OperationalError):
+    """Raised when a write is attempted on a database opened with read_only=True"""
+
+
+def _writes(method):
+    """Mark a SQLiteDatabase method as writing; refused in read-only mode"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.read_only:
+            raise ReadOnlyDatabaseError(
+                f"'{self.db_name}' is open read-only; {method.__name__}() is not allowed"
+            )
+        return method(self, *args, **kwargs)
+
+    wrapper.writes = True  # lets callers such as the server route and lock writes
+    return wrapper
+
+
+def _key_columns(key):
+    """Normalise a key column name or list of names to a list"""
+    keys = [key] if isinstance(key, str) else list(key)
+    if not keys:
+        raise ValueError("At least one key column is required")
+    return keys
+
+
+def _group_by_shape(rows):
+    """Group row dicts by their column tuple so each shape is one executemany"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row.keys()), []).append(tuple(row.values()))
+    return groups
+
+
+def _open_binary(source, mode="rb"):
+    """Return (file object, owned) for a path or an already-open binary file"""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, mode), True
+    return source, False
+
+
+def _stream_size(f):
+    """Bytes remaining from the current position of a seekable file object"""
+    position = f.tell()
+    end = f.seek(0, os.SEEK_END)
+    f.seek(position)
+    return end - position
+
+
+def _copy_stream(src, blob, chunk_size):
+    written = 0
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        blob.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def _strip_comments(sql):
+    text = sql
+    while "/*" in text:
+        start = text.index("/*")
+        end = text.find("*/", start + 2)
+        text = text[:start] + (text[end + 2 :] if end != -1 else "")
+    return "\n".join(line.split("--", 1)[0] for line in text.splitlines())
+
+
+def _is_blank_sql(sql):
+    """True if a statement is only comments, whitespace and semicolons"""
+    return not _strip_comments(sql).replace("\n", "").strip(" \t;")
+
+
+def runs_outside_transaction(sql):
+    """True for a statement that must not be wrapped in a transaction.
+
+    VACUUM, ATTACH/DETACH and journal_mode changes fail inside one, and
+    BEGIN/COMMIT/END/ROLLBACK manage their own.
+    """
+    words = _strip_comments(sql).replace(";", " ").split()
+    if not words:
+        return False
+    keyword = words[0].upper()
+    if keyword in NO_TRANSACTION_STATEMENTS:
+        return True
+    return keyword == "PRAGMA" and "journal_mode" in sql.lower()
+
+
+def split_sql_statements(script):
+    """Split a SQL script into complete statements.
+
+    A ';' only ends a statement when sqlite3.complete_statement agrees, so
+    semicolons inside string literals, comments and CREATE TRIGGER bodies
+    are left alone. Comment-only fragments are dropped.
+    """
+    statements = []
+    pieces = script.split(";")
+    buffer = ""
+    for i, piece in enumerate(pieces):
+        buffer += piece
+        if i == len(pieces) - 1:
+            break
+        buffer += ";"
+        if sqlite3.complete_statement(buffer):
+            if not _is_blank_sql(buffer):
+                statements.append(buffer.strip())
+            buffer = ""
+    # A final statement may omit its semicolon
+    if not _is_blank_sql(buffer):
+        statements.append(buffer.strip())
+    return statements
+
 
 class SQLiteDatabase:
-    def __init__(self, db_name):
+    def __init__(
+        self, db_name, read_only=False, immutable=False, mmap_size=None, keep_connections=False
+    ):
         # Ensure data directory exists
         self.data_dir = "data"
         if not os.path.exists(self.data_dir):
@@ -15,13 +188,203 @@ class SQLiteDatabase:
             db_name += ".db"
         self.db_name = os.path.join(self.data_dir, db_name)
 
+        # Read-only replica mode: mode=ro URI, mmap'd pages, writes refused.
+        # immutable=True additionally skips all locking and change detection,
+        # so only use it for files no process is writing to.
+        self.read_only = read_only or immutable
+        self.immutable = immutable
+        if mmap_size is None and self.read_only:
+            mmap_size = READ_ONLY_MMAP_SIZE
+        self.mmap_size = mmap_size
+
+        # Keep one connection per thread open between calls instead of
+        # connecting per operation (always the case for read-only replicas);
+        # for long-lived processes such as everything_server
+        self.keep_connections = keep_connections or self.read_only
+
+        # Per-thread transaction state (see transaction()) and, in read-only
+        # mode, each thread's long-lived reader connection
+        self._local = threading.local()
+
+        # {table: {column: codec}} of compressed columns and the
+        # compression:version marker it was read at (see _compression_map)
+        self._compressed = None
+        self._compressed_version = None
+
+    def _open_connection(self, isolation_level=""):
+        """Open a new connection configured for this database's mode"""
+        if not self.read_only:
+            conn = sqlite3.connect(self.db_name, isolation_level=isolation_level)
+        else:
+            if not os.path.exists(self.db_name):
+                raise sqlite3.OperationalError(f"Database '{self.db_name}' not found")
+            # pathlib pulls in re/fnmatch/urllib, so only replicas pay for it
+            import pathlib
+
+            params = "immutable=1" if self._immutable_is_safe() else "mode=ro"
+            uri = f"{pathlib.Path(os.path.abspath(self.db_name)).as_uri()}?{params}"
+            conn = sqlite3.connect(uri, uri=True, isolation_level=isolation_level)
+            conn.execute("PRAGMA query_only = ON")
+        if self.mmap_size:
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        # Registers compress()/decompress() if the database has compressed columns
+        self._compression_map(conn)
+        return conn
+
+    def _immutable_is_safe(self):
+        """immutable=1 ignores the WAL, so only honour it when there is none"""
+        wal = self.db_name + "-wal"
+        return self.immutable and not (os.path.exists(wal) and os.path.getsize(wal))
+
+    def _connect(self):
+        """Connection for one operation: the open transaction's, or a fresh one"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        if self.keep_connections:
+            # Keep one connection per thread so the page cache and mmap
+            # survive between calls; threads never share a connection
+            reader = getattr(self._local, "reader", None)
+            if reader is None:
+                reader = self._open_connection()
+                self._local.reader = reader
+            elif reader.in_transaction:
+                reader.rollback()  # left open by an earlier operation that raised
+            return reader
+        return self._open_connection()
+
+    def _is_shared(self, conn):
+        return conn is getattr(self._local, "conn", None) or conn is getattr(
+            self._local, "reader", None
+        )
+
+    def _commit(self, conn):
+        """Commit, unless the connection belongs to an open transaction"""
+        if conn is not getattr(self._local, "conn", None):
+            conn.commit()
+
+    def _release(self, conn):
+        """Close, unless the connection is a transaction's or a thread's reader"""
+        if not self._is_shared(conn):
+            conn.close()
+
+    def _compression_map(self, conn):
+        """Compressed columns, reread whenever enable/disable_compression ran.
+
+        Those bump a marker in _database_metadata, from any instance or
+        process, so each call costs one primary key lookup. Connections
+        used with compressed columns get compress()/decompress() registered.
+        """
+        try:
+            version = conn.execute(
+                "SELECT value FROM _database_metadata WHERE key = 'compression:version'"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            version = None  # no metadata table yet
+        if self._compressed is None or version != self._compressed_version:
+            from everything_compress import get_all_compressed_columns
+
+            self._compressed = get_all_compressed_columns(conn)
+            self._compressed_version = version
+        if self._compressed:
+            from everything_compress import register_functions
+
+            register_functions(conn)
+        return self._compressed
+
+    def _compressed_columns(self, conn, table_name):
+        return self._compression_map(conn).get(table_name, {})
+
+    def _decompress(self, conn, table_name, cursor, rows):
+        """Decompress any compressed columns in a select helper's result"""
+        compressed = self._compressed_columns(conn, table_name)
+        if not compressed:
+            return rows
+        from everything_compress import decompress_rows
+
+        return decompress_rows(compressed, cursor.description, rows)
+
+    def _compress(self, conn, table_name, columns, values):
+        """Compress value tuples for the table's compressed columns before writing"""
+        compressed = self._compressed_columns(conn, table_name)
+        if not compressed:
+            return values
+        from everything_compress import compress_rows
+
+        return compress_rows(compressed, columns, values)
+
+    def in_transaction(self):
+        """True while this thread is inside transaction()"""
+        return getattr(self._local, "conn", None) is not None
+
+    @contextmanager
+    def transaction(self, mode="DEFERRED"):
+        """Run several operations on one connection and commit them once.
+
+        Every SQLiteDatabase method called inside the block reuses the same
+        connection and skips its own commit, so the whole block is atomic
+        and costs a single fsync. ``mode`` is DEFERRED, IMMEDIATE (take the
+        write lock up front) or EXCLUSIVE. Nested blocks become savepoints
+        that roll back on their own without aborting the outer transaction.
+        """
+        mode = mode.upper()
+        if mode not in TRANSACTION_MODES:
+            raise ValueError(
+                f"Invalid transaction mode '{mode}'. "
+                f"Choose from: {', '.join(TRANSACTION_MODES)}"
+            )
+        if self.read_only and mode != "DEFERRED":
+            raise ReadOnlyDatabaseError(
+                f"'{self.db_name}' is open read-only; only DEFERRED "
+                "(consistent snapshot read) transactions are allowed"
+            )
+
+        state = self._local
+        if getattr(state, "conn", None) is not None:
+            state.depth += 1
+            savepoint = f"sp_{state.depth}"
+            state.conn.execute(f"SAVEPOINT {savepoint}")
+            try:
+                yield self
+            except BaseException:
+                state.conn.execute(f"ROLLBACK TO {savepoint}")
+                state.conn.execute(f"RELEASE {savepoint}")
+                raise
+            else:
+                state.conn.execute(f"RELEASE {savepoint}")
+            finally:
+                state.depth -= 1
+            return
+
+        # Autocommit mode so BEGIN/COMMIT are issued explicitly, not by sqlite3
+        conn = self._open_connection(isolation_level=None)
+        conn.execute(f"BEGIN {mode}")
+        state.conn = conn
+        state.depth = 0
+        try:
+            yield self
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            state.conn = None
+            conn.close()
+
+    @_writes
     def create_sqlite_db(self, metadata=None):
         """Create database and store metadata"""
         is_new_db = not os.path.exists(self.db_name)
 
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
 
+        # Must be set before the first table exists; lets maintenance reclaim
+        # free pages with incremental_vacuum instead of a full VACUUM
+        if is_new_db:
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
         # Create metadata table if it doesn't exist
         cursor.execute(
             """
@@ -32,8 +395,8 @@ class SQLiteDatabase:
         """
         )
 
-        conn.commit()
-        conn.close()
+        self._commit(conn)
+        self._release(conn)
 
         # If it's a new database and metadata is provided, save it
         if is_new_db and metadata:
@@ -41,106 +404,497 @@ class SQLiteDatabase:
 
         return True
 
+    @_writes
     def create_sqlite_table(self, table_name, columns):
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute(f"CREATE TABLE {table_name} ({columns})")
-        conn.commit()
-        conn.close()
+        self._commit(conn)
+        record_write(self.db_name)
+        self._release(conn)
         return True
 
+    @_writes
     def insert_into_sqlite_table(self, table_name, values):
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute(f"INSERT INTO {table_name} VALUES ({values})")
-        conn.commit()
-        conn.close()
+        self._commit(conn)
+        record_write(self.db_name, cursor.rowcount)
+        self._release(conn)
         return True
 
+    @_writes
     def delete_from_sqlite_table(self, table_name, condition):
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute(f"DELETE FROM {table_name} WHERE {condition}")
-        conn.commit()
-        conn.close()
+        self._commit(conn)
+        record_write(self.db_name, cursor.rowcount)
+        self._release(conn)
         return True
 
+    @_writes
     def update_sqlite_table(self, table_name, set_clause, condition):
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute(f"UPDATE {table_name} SET {set_clause} WHERE {condition}")
-        conn.commit()
-        conn.close()
+        self._commit(conn)
+        record_write(self.db_name, cursor.rowcount)
+        self._release(conn)
         return True
 
     def select_from_sqlite_table(self, table_name, columns, condition):
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute(f"SELECT {columns} FROM {table_name} WHERE {condition}")
-        rows = cursor.fetchall()
-        conn.close()
+        rows = self._decompress(conn, table_name, cursor, cursor.fetchall())
+        self._release(conn)
         return rows
 
     def select_all_from_sqlite_table(self, table_name):
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute(f"SELECT * FROM {table_name}")
-        rows = cursor.fetchall()
-        conn.close()
+        rows = self._decompress(conn, table_name, cursor, cursor.fetchall())
+        self._release(conn)
         return rows
 
     def select_distinct_from_sqlite_table(self, table_name, columns, condition):
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute(f"SELECT DISTINCT {columns} FROM {table_name} WHERE {condition}")
-        rows = cursor.fetchall()
-        conn.close()
+        rows = self._decompress(conn, table_name, cursor, cursor.fetchall())
+        self._release(conn)
         return rows
 
     def select_count_from_sqlite_table(self, table_name, condition):
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute(f"SELECT COUNT(*) FROM {table_name} WHERE {condition}")
         count = cursor.fetchone()[0]
-        conn.close()
+        self._release(conn)
         return count
 
     def select_sum_from_sqlite_table(self, table_name, column, condition):
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute(f"SELECT SUM({column}) FROM {table_name} WHERE {condition}")
         total = cursor.fetchone()[0]
-        conn.close()
+        self._release(conn)
         return total
 
+    def build_aggregate_query(
+        self,
+        table_name,
+        aggregates,
+        group_by=None,
+        condition="1=1",
+        having=None,
+        order_by=None,
+    ):
+        """Build a single SELECT computing every aggregate, returning (sql, aliases)"""
+        if not aggregates:
+            raise ValueError("At least one aggregate is required")
+
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        group_by = list(group_by or [])
+
+        select_parts = list(group_by)
+        aliases = list(group_by)
+        for spec in aggregates:
+            if len(spec) == 2:
+                func, column = spec
+                alias = None
+            elif len(spec) == 3:
+                func, column, alias = spec
+            else:
+                raise ValueError(f"Invalid aggregate specification: {spec!r}")
+
+            func = func.lower()
+            if func not in AGGREGATE_FUNCTIONS:
+                raise ValueError(
+                    f"Unsupported aggregate '{func}'. "
+                    f"Choose from: {', '.join(AGGREGATE_FUNCTIONS)}"
+                )
+            if column == "*" and func != "count":
+                raise ValueError(f"'{func}' requires a column, not '*'")
+
+            if alias is None:
+                if column == "*":
+                    alias = func
+                else:
+                    safe_column = "".join(
+                        ch if ch.isalnum() else "_" for ch in column
+                    ).strip("_")
+                    alias = f"{func}_{safe_column}"
+
+            select_parts.append(
+                f'{AGGREGATE_FUNCTIONS[func].format(column=column)} AS "{alias}"'
+            )
+            aliases.append(alias)
+
+        query = f"SELECT {', '.join(select_parts)} FROM {table_name} WHERE {condition}"
+        if group_by:
+            query += f" GROUP BY {', '.join(group_by)}"
+        if having:
+            query += f" HAVING {having}"
+        if order_by:
+            query += f" ORDER BY {order_by}"
+        return query, aliases
+
+    def aggregate(
+        self,
+        table_name,
+        aggregates,
+        group_by=None,
+        condition="1=1",
+        having=None,
+        order_by=None,
+    ):
+        """Compute several aggregates in one SQL statement.
+
+        ``aggregates`` is a list of ``(function, column)`` or
+        ``(function, column, alias)`` tuples, e.g. ``("avg", "price")`` or
+        ``("count_distinct", "category", "categories")``. Returns a list of
+        dictionaries keyed by the group-by columns and aggregate aliases.
+        """
+        query, aliases = self.build_aggregate_query(
+            table_name, aggregates, group_by, condition, having, order_by
+        )
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute(query)
+        rows = cursor.fetchall()
+        self._release(conn)
+        return [dict(zip(aliases, row)) for row in rows]
+
+    def get_column_stats(self, table_name):
+        """Get row count and per-column stats for a table in a single scan"""
+        columns = self.get_column_info(table_name)
+        if not columns:
+            return None
+
+        aggregates = [("count", "*", "row_count")]
+        for column in columns:
+            name, data_type = column[1], (column[2] or "").upper()
+            quoted = f'"{name}"'
+            aggregates.append(("count", quoted, f"{name}:non_null"))
+            aggregates.append(("count_distinct", quoted, f"{name}:distinct"))
+            if data_type != "BLOB":
+                aggregates.append(("min", quoted, f"{name}:min"))
+                aggregates.append(("max", quoted, f"{name}:max"))
+            if data_type in ("INTEGER", "REAL"):
+                aggregates.append(("avg", quoted, f"{name}:avg"))
+
+        row = self.aggregate(table_name, aggregates)[0]
+
+        stats = {"row_count": row["row_count"], "columns": {}}
+        for column in columns:
+            name = column[1]
+            non_null = row[f"{name}:non_null"]
+            stats["columns"][name] = {
+                "type": column[2],
+                "non_null": non_null,
+                "nulls": row["row_count"] - non_null,
+                "distinct": row[f"{name}:distinct"],
+                "min": row.get(f"{name}:min"),
+                "max": row.get(f"{name}:max"),
+                "avg": row.get(f"{name}:avg"),
+            }
+        return stats
+
+    def profile_table(
+        self,
+        table_name,
+        sample_threshold=100000,
+        sample_size=20000,
+        top_k=5,
+        bins=10,
+        refresh=False,
+    ):
+        """Profile columns (nulls, distinct, range, top values, histogram) with caching"""
+        from everything_stats import profile_table
+
+        return profile_table(
+            self, table_name, sample_threshold, sample_size, top_k, bins, refresh
+        )
+
     def get_tables(self):
-        """Get list of all tables in the database (excluding metadata table)"""
-        conn = sqlite3.connect(self.db_name)
+        """Get list of all tables in the database (excluding system tables)"""
+        conn = self._connect()
         cursor = conn.cursor()
+        # Underscore-prefixed tables (metadata, stats cache, ...) are reserved
         cursor.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name != '_database_metadata'"
+            "SELECT name FROM sqlite_master WHERE type='table' "
+            "AND name NOT LIKE '\\_%' ESCAPE '\\' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\'"
         )
         tables = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return tables
+        # Partitions are read through their table's view (see everything_partition)
+        from everything_partition import PARTITIONS
+
+        try:
+            cursor.execute(f"SELECT partition FROM {PARTITIONS}")
+            children = {row[0] for row in cursor.fetchall()}
+        except sqlite3.OperationalError:
+            children = set()  # no partitioned tables
+        self._release(conn)
+        return [name for name in tables if name not in children]
 
-    def execute_query(self, query):
+    def execute_query(self, query, params=()):
         """Execute a raw SQL query and return results"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
-        cursor.execute(query)
-        if query.strip().upper().startswith("SELECT"):
-            results = cursor.fetchall()
-            conn.close()
-            return results
+        cursor.execute(query, params)
+        # description is set for anything that yields rows: SELECT, WITH,
+        # PRAGMA, EXPLAIN and INSERT/UPDATE/DELETE ... RETURNING
+        results = cursor.fetchall() if cursor.description is not None else None
+        self._commit(conn)
+        if cursor.rowcount > 0:
+            record_write(self.db_name, cursor.rowcount)
+        self._release(conn)
+        return results
+
+    def execute_script(self, script, use_executescript=False):
+        """Run a multi-statement SQL script and report on every statement.
+
+        By default statements run one by one in a single transaction (a
+        savepoint inside an open one), so the script is all-or-nothing and
+        each row-producing statement returns its rows. A single statement,
+        or a script containing one that can't run in a transaction (VACUUM,
+        BEGIN/COMMIT, ATTACH, journal_mode; see runs_outside_transaction),
+        runs statement by statement in autocommit mode instead. With
+        ``use_executescript=True`` the script is handed to sqlite3's
+        executescript in one call: fastest, and free to issue its own
+        BEGIN/COMMIT or VACUUM, but no rows or per-statement timings.
+
+        Returns a list of dicts with ``sql``, ``columns`` (None if the
+        statement produced no rows), ``rows``, ``rowcount`` and ``seconds``.
+        """
+        if use_executescript:
+            if self.in_transaction():
+                raise ValueError(
+                    "executescript commits on its own; it can't run inside transaction()"
+                )
+            conn = self._connect()
+            started = time.perf_counter()
+            try:
+                conn.executescript(script)
+            finally:
+                self._release(conn)
+            record_write(self.db_name)
+            return [
+                {
+                    "sql": script,
+                    "columns": None,
+                    "rows": None,
+                    "rowcount": -1,
+                    "seconds": time.perf_counter() - started,
+                }
+            ]
+
+        statements = split_sql_statements(script)
+        autocommit = any(runs_outside_transaction(sql) for sql in statements)
+        if autocommit and self.in_transaction():
+            raise ValueError(
+                "VACUUM, BEGIN/COMMIT, ATTACH and journal_mode changes can't "
+                "run inside transaction()"
+            )
+        if autocommit or (len(statements) == 1 and not self.in_transaction()):
+            # Autocommit: each statement takes effect as it runs, and the
+            # script's own BEGIN/COMMIT (if any) control the transaction
+            conn = self._open_connection(isolation_level=None)
+            try:
+                results = self._run_statements(conn.cursor(), statements)
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()  # a BEGIN the script never committed
+                conn.close()
         else:
-            conn.commit()
-            conn.close()
-            return None
+            with self.transaction():
+                results = self._run_statements(self._connect().cursor(), statements)
+
+        written = sum(result["rowcount"] for result in results if result["rowcount"] > 0)
+        if written:
+            record_write(self.db_name, written)
+        return results
+
+    def _run_statements(self, cursor, statements):
+        results = []
+        for number, sql in enumerate(statements, 1):
+            started = time.perf_counter()
+            try:
+                cursor.execute(sql)
+            except sqlite3.Error as e:
+                raise type(e)(f"Statement {number} failed: {e}\n{sql}") from e
+            columns = None
+            rows = None
+            if cursor.description is not None:
+                columns = [column[0] for column in cursor.description]
+                rows = cursor.fetchall()
+            results.append(
+                {
+                    "sql": sql,
+                    "columns": columns,
+                    "rows": rows,
+                    "rowcount": cursor.rowcount,
+                    "seconds": time.perf_counter() - started,
+                }
+            )
+        return results
+
+    def stream_query(self, query, params=(), batch_size=1000):
+        """Execute a query and return ``(column_names, row_iterator)``.
+
+        Rows are fetched ``batch_size`` at a time so large results never sit
+        in memory; the connection is released once the iterator is exhausted
+        or closed. Statements that produce no rows are committed and return
+        ``(None, empty iterator)``.
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+        except sqlite3.Error:
+            self._release(conn)
+            raise
+
+        if cursor.description is None:
+            self._commit(conn)
+            record_write(self.db_name, max(cursor.rowcount, 0))
+            self._release(conn)
+            return None, iter(())
+
+        columns = [column[0] for column in cursor.description]
+
+        def rows():
+            try:
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    yield from batch
+            finally:
+                # Commits INSERT/UPDATE/DELETE ... RETURNING once drained
+                if conn.in_transaction:
+                    self._commit(conn)
+                self._release(conn)
+
+        return columns, rows()
+
+    @_writes
+    def create_expression_index(self, table_name, expression, index_name=None, unique=False):
+        """Index an expression such as ``lower(name)``; returns the index name"""
+        from everything_search import index_name_for
+
+        index_name = index_name or index_name_for(table_name, expression)
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS "
+                f"{index_name} ON {table_name} ({expression})"
+            )
+            self._commit(conn)
+        finally:
+            self._release(conn)
+        return index_name
+
+    @_writes
+    def add_generated_column(
+        self, table_name, column, expression, column_type="", index=True
+    ):
+        """Add a VIRTUAL generated column computed from ``expression``.
+
+        Virtual columns take no space in the table; with ``index=True`` the
+        values are materialized only in an index, which search helpers use
+        for predicates on the same expression. Returns the index name or None.
+        """
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"ALTER TABLE {table_name} ADD COLUMN {column} {column_type} "
+                f"GENERATED ALWAYS AS ({expression}) VIRTUAL"
+            )
+            index_name = None
+            if index:
+                index_name = f"idx_{table_name}_{column}"
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({column})"
+                )
+            self._commit(conn)
+        finally:
+            self._release(conn)
+        return index_name
+
+    def build_search_query(
+        self,
+        table_name,
+        column,
+        value,
+        mode="contains",
+        case_sensitive=False,
+        limit=None,
+        columns="*",
+    ):
+        """``(sql, params)`` for a search, rewritten onto a lower() index when one exists"""
+        from everything_search import build_search_query
+
+        conn = self._connect()
+        try:
+            return build_search_query(
+                conn, table_name, column, value, mode, case_sensitive, limit, columns
+            )
+        finally:
+            self._release(conn)
+
+    def search_table(
+        self,
+        table_name,
+        column,
+        value,
+        mode="contains",
+        case_sensitive=False,
+        limit=None,
+        columns="*",
+    ):
+        """Rows where ``column`` matches ``value`` (contains, prefix or exact)"""
+        conn = self._connect()
+        compressed = self._compressed_columns(conn, table_name)
+        self._release(conn)
+        if column in compressed:
+            column = f"decompress({column})"  # match on the original text
+        sql, params = self.build_search_query(
+            table_name, column, value, mode, case_sensitive, limit, columns
+        )
+        if not compressed:
+            return self.execute_query(sql, params)
+        from everything_compress import decompress_value
+
+        # Which result columns are compressed isn't known for columns="*"
+        # et al., so decompress by value (only compressed BLOBs change)
+        return [
+            tuple(decompress_value(value) for value in row)
+            for row in self.execute_query(sql, params)
+        ]
+
+    def search_uses_index(self, table_name, column, value, mode="contains", case_sensitive=False):
+        """True if the search would be an index seek rather than a full scan"""
+        from everything_search import uses_index
+
+        sql, params = self.build_search_query(
+            table_name, column, value, mode, case_sensitive
+        )
+        conn = self._connect()
+        try:
+            return uses_index(conn, sql, params)
+        finally:
+            self._release(conn)
 
     def get_table_schema(self, table_name):
         """Get schema information for a table"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
         try:
             # Check if table exists first
@@ -149,17 +903,18 @@ class SQLiteDatabase:
                 (table_name,),
             )
             if not cursor.fetchone():
-                conn.close()
+                self._release(conn)
                 return None
 
             cursor.execute(f"PRAGMA table_info({table_name})")
             schema = cursor.fetchall()
-            conn.close()
+            self._release(conn)
             return schema
         except sqlite3.OperationalError:
-            conn.close()
+            self._release(conn)
             return None
 
+    @_writes
     def insert_data(self, table_name, data):
         """Insert data into a table using a dictionary"""
         if not data:
@@ -167,54 +922,756 @@ class SQLiteDatabase:
 
         columns = ", ".join(data.keys())
         placeholders = ", ".join(["?" for _ in data])
-        values = list(data.values())
 
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
+        values = self._compress(conn, table_name, list(data), [tuple(data.values())])[0]
         cursor = conn.cursor()
         cursor.execute(
             f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})", values
         )
-        conn.commit()
-        conn.close()
+        self._commit(conn)
+        record_write(self.db_name)
+        self._release(conn)
         return True
 
     def get_table_data(self, table_name, limit=10):
         """Get data from a table with optional limit"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute(f"SELECT * FROM {table_name} LIMIT {limit}")
-        data = cursor.fetchall()
-        conn.close()
+        data = self._decompress(conn, table_name, cursor, cursor.fetchall())
+        self._release(conn)
         return data
 
+    def stream_table_data(
+        self, table_name, limit=None, batch_size=1000, condition=None, params=()
+    ):
+        """get_table_data() as stream_query's ``(column_names, row_iterator)``"""
+        conn = self._connect()
+        compressed = self._compressed_columns(conn, table_name)
+        self._release(conn)
+        query = f"SELECT * FROM {table_name}"
+        if condition:
+            query += f" WHERE {condition}"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        columns, rows = self.stream_query(query, params, batch_size=batch_size)
+        if not compressed:
+            return columns, rows
+        from everything_compress import decompress_rows
+
+        description = [(name,) for name in columns]
+
+        def decompressed():
+            try:
+                while True:
+                    batch = list(itertools.islice(rows, batch_size))
+                    if not batch:
+                        break
+                    yield from decompress_rows(compressed, description, batch)
+            finally:
+                rows.close()
+
+        return columns, decompressed()
+
+    def get_coercer(self, table_name):
+        """Per-column type converters for a table, cached until the schema changes"""
+        from everything_coerce import get_coercer
+
+        return get_coercer(self, table_name)
+
+    def coerce_rows(self, table_name, rows):
+        """Convert row dicts to the table's column types before writing.
+
+        Returns ``(good_rows, errors)``: rows that failed a type or NOT NULL
+        check are held back and described in ``errors`` instead of aborting
+        the batch. Converters are cached per table until the schema changes.
+        """
+        return self.get_coercer(table_name).coerce(rows)
+
+    @_writes
+    def insert_many(self, table_name, rows):
+        """Insert many row dicts with one executemany per row shape.
+
+        All rows are written in a single transaction (or the caller's open
+        one). Returns rows written.
+        """
+        groups = _group_by_shape(rows)
+        conn = self._connect()
+        cursor = conn.cursor()
+        written = 0
+        try:
+            for columns, values in groups.items():
+                values = self._compress(conn, table_name, columns, values)
+                cursor.executemany(
+                    f"INSERT INTO {table_name} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)})",
+                    values,
+                )
+                written += len(values)
+            self._commit(conn)
+        except sqlite3.Error:
+            if not self.in_transaction():
+                conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+        record_write(self.db_name, written)
+        return written
+
+    @_writes
+    def upsert_many(self, table_name, rows, key="id"):
+        """Insert or update many row dicts in one transaction, keyed on ``key``.
+
+        Uses ``INSERT ... ON CONFLICT(key) DO UPDATE`` so each row is a single
+        statement; ``key`` is a column name or a list of columns and must be
+        covered by a PRIMARY KEY or UNIQUE constraint. Returns rows written.
+        """
+        keys = _key_columns(key)
+        groups = _group_by_shape(rows)
+        for columns in groups:
+            missing = [k for k in keys if k not in columns]
+            if missing:
+                raise ValueError(
+                    f"Rows are missing key column(s): {', '.join(missing)}"
+                )
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        written = 0
+        try:
+            for columns, values in groups.items():
+                values = self._compress(conn, table_name, columns, values)
+                updates = [c for c in columns if c not in keys]
+                if updates:
+                    action = "DO UPDATE SET " + ", ".join(
+                        f"{c} = excluded.{c}" for c in updates
+                    )
+                else:
+                    action = "DO NOTHING"
+                cursor.executemany(
+                    f"INSERT INTO {table_name} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)}) "
+                    f"ON CONFLICT({', '.join(keys)}) {action}",
+                    values,
+                )
+                written += len(values)
+            self._commit(conn)
+        except sqlite3.Error:
+            if not self.in_transaction():
+                conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+        record_write(self.db_name, written)
+        return written
+
+    @_writes
+    def update_many(self, table_name, changes, key="id"):
+        """Apply many ``(key_value, {column: value})`` updates in one transaction.
+
+        Updates that touch the same columns are sent together through
+        executemany. For a composite ``key`` pass tuples as key values.
+        Returns the number of rows changed.
+        """
+        keys = _key_columns(key)
+        where = " AND ".join(f"{k} = ?" for k in keys)
+
+        groups = {}
+        for key_value, values in changes:
+            if not values:
+                continue
+            if isinstance(key_value, (tuple, list)):
+                key_values = tuple(key_value)
+            else:
+                key_values = (key_value,)
+            if len(key_values) != len(keys):
+                raise ValueError(f"Expected {len(keys)} key value(s), got {key_value!r}")
+            groups.setdefault(tuple(values.keys()), []).append(
+                tuple(values.values()) + tuple(key_values)
+            )
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        changed = 0
+        try:
+            for columns, params in groups.items():
+                set_clause = ", ".join(f"{c} = ?" for c in columns)
+                cursor.executemany(
+                    f"UPDATE {table_name} SET {set_clause} WHERE {where}", params
+                )
+                changed += cursor.rowcount
+            self._commit(conn)
+        except sqlite3.Error:
+            if not self.in_transaction():
+                conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+        record_write(self.db_name, changed)
+        return changed
+
+    @_writes
+    def delete_many(self, table_name, key_values, key="id", join_threshold=500):
+        """Delete rows by a list of key values in one transaction.
+
+        Small lists use executemany; above ``join_threshold`` keys the values
+        are loaded into a temp table and removed with one ``DELETE ... IN
+        (SELECT ...)`` so SQLite can walk the key index once. Returns the
+        number of rows deleted.
+        """
+        keys = _key_columns(key)
+        params = [
+            tuple(value) if isinstance(value, (tuple, list)) else (value,)
+            for value in key_values
+        ]
+        if not params:
+            return 0
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            if len(params) <= join_threshold:
+                where = " AND ".join(f"{k} = ?" for k in keys)
+                cursor.executemany(f"DELETE FROM {table_name} WHERE {where}", params)
+                deleted = cursor.rowcount
+            else:
+                temp = "_delete_keys"
+                cursor.execute(f"DROP TABLE IF EXISTS temp.{temp}")
+                cursor.execute(f"CREATE TEMP TABLE {temp} ({', '.join(keys)})")
+                cursor.executemany(
+                    f"INSERT INTO temp.{temp} VALUES ({', '.join('?' for _ in keys)})",
+                    params,
+                )
+                target = keys[0] if len(keys) == 1 else f"({', '.join(keys)})"
+                cursor.execute(
+                    f"DELETE FROM {table_name} WHERE {target} IN "
+                    f"(SELECT {', '.join(keys)} FROM temp.{temp})"
+                )
+                deleted = cursor.rowcount
+                cursor.execute(f"DROP TABLE temp.{temp}")
+            self._commit(conn)
+        except sqlite3.Error:
+            if not self.in_transaction():
+                conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+        record_write(self.db_name, deleted)
+        return deleted
+
+    @_writes
+    def insert_with_blob_files(
+        self, table_name, data, blob_files, chunk_size=BLOB_CHUNK_SIZE
+    ):
+        """Insert a row whose BLOB columns are streamed from files; returns the rowid.
+
+        ``blob_files`` maps column names to paths or binary file objects. Each
+        BLOB is allocated with zeroblob() and filled chunk by chunk, so the
+        file is never held in memory as a whole.
+        """
+        sources = {column: _open_binary(source) for column, source in blob_files.items()}
+        try:
+            sizes = {column: _stream_size(f) for column, (f, _) in sources.items()}
+
+            columns = list(data.keys()) + list(sizes.keys())
+            placeholders = ["?" for _ in data] + ["zeroblob(?)" for _ in sizes]
+            values = list(data.values()) + list(sizes.values())
+
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"INSERT INTO {table_name} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join(placeholders)})",
+                    values,
+                )
+                rowid = cursor.lastrowid
+                for column, (f, _) in sources.items():
+                    with conn.blobopen(table_name, column, rowid) as blob:
+                        _copy_stream(f, blob, chunk_size)
+                self._commit(conn)
+            finally:
+                # Closing an uncommitted connection rolls the row back
+                self._release(conn)
+        finally:
+            for f, owned in sources.values():
+                if owned:
+                    f.close()
+
+        record_write(self.db_name)
+        return rowid
+
+    @_writes
+    def write_blob_from_file(
+        self, table_name, column, rowid, source, chunk_size=BLOB_CHUNK_SIZE
+    ):
+        """Replace one BLOB cell with a file's contents, streamed in chunks"""
+        f, owned = _open_binary(source)
+        try:
+            size = _stream_size(f)
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"UPDATE {table_name} SET {column} = zeroblob(?) WHERE rowid = ?",
+                    (size, rowid),
+                )
+                if cursor.rowcount == 0:
+                    raise ValueError(f"No row with rowid {rowid} in '{table_name}'")
+                with conn.blobopen(table_name, column, rowid) as blob:
+                    written = _copy_stream(f, blob, chunk_size)
+                self._commit(conn)
+            finally:
+                self._release(conn)
+        finally:
+            if owned:
+                f.close()
+
+        record_write(self.db_name)
+        return written
+
+    def get_blob_size(self, table_name, column, rowid):
+        """Size in bytes of one BLOB cell, without reading it"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT length({column}) FROM {table_name} WHERE rowid = ?", (rowid,)
+        )
+        row = cursor.fetchone()
+        self._release(conn)
+        return row[0] if row else None
+
+    def iter_blob_chunks(self, table_name, column, rowid, chunk_size=BLOB_CHUNK_SIZE):
+        """Yield a BLOB cell's contents chunk by chunk"""
+        conn = self._connect()
+        try:
+            with conn.blobopen(table_name, column, rowid, readonly=True) as blob:
+                while True:
+                    chunk = blob.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        finally:
+            self._release(conn)
+
+    def read_blob_to_file(
+        self, table_name, column, rowid, dest, chunk_size=BLOB_CHUNK_SIZE
+    ):
+        """Stream a BLOB cell into a path or binary file object; returns bytes written"""
+        f, owned = _open_binary(dest, "wb")
+        written = 0
+        try:
+            for chunk in self.iter_blob_chunks(table_name, column, rowid, chunk_size):
+                f.write(chunk)
+                written += len(chunk)
+        finally:
+            if owned:
+                f.close()
+        return written
+
+    def read_blob_into(
+        self, table_name, column, rowid, buffer, offset=0, chunk_size=BLOB_CHUNK_SIZE
+    ):
+        """Fill a caller-owned writable buffer from a BLOB cell via memoryview slices.
+
+        Reads ``len(buffer)`` bytes starting at ``offset``; no intermediate
+        object larger than ``chunk_size`` is created, so the buffer can be
+        reused across calls. Returns the number of bytes read.
+        """
+        view = memoryview(buffer).cast("B")
+        conn = self._connect()
+        filled = 0
+        try:
+            with conn.blobopen(table_name, column, rowid, readonly=True) as blob:
+                blob.seek(offset)
+                while filled < len(view):
+                    chunk = blob.read(min(chunk_size, len(view) - filled))
+                    if not chunk:
+                        break
+                    view[filled : filled + len(chunk)] = chunk
+                    filled += len(chunk)
+        finally:
+            self._release(conn)
+        return filled
+
+    @_writes
+    def ingest_queue(self, batch_size=1000, max_delay=0.5, max_queue=100000):
+        """Start a write-behind queue that group-commits rows from many threads"""
+        from everything_ingest import IngestQueue
+
+        return IngestQueue(self, batch_size, max_delay, max_queue).start()
+
+    @_writes
+    def run_maintenance(self, analysis_limit=400, vacuum_pages=None, checkpoint=True):
+        """Run PRAGMA optimize/ANALYZE, incremental vacuum and a WAL checkpoint"""
+        from everything_maintenance import run_maintenance
+
+        return run_maintenance(self.db_name, analysis_limit, vacuum_pages, checkpoint)
+
+    @_writes
+    @_writes
+    def enable_incremental_vacuum(self):
+        """Switch an existing database to auto_vacuum=INCREMENTAL (rewrites the file)"""
+        if self.in_transaction():
+            raise sqlite3.OperationalError("Cannot VACUUM inside a transaction")
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        finally:
+            self._release(conn)
+        return True
+
+    def backup(self, dest_path, pages_per_step=256, sleep=0.005, progress=None):
+        """Copy the live database to dest_path without blocking writers for long"""
+        from everything_backup import backup_database
+
+        return backup_database(self.db_name, dest_path, pages_per_step, sleep, progress)
+
+    def create_snapshot(self, incremental=True, backup_dir=None):
+        """Snapshot into data/backups/<name>/, storing only changed pages when possible"""
+        from everything_backup import create_snapshot
+
+        return create_snapshot(self.db_name, backup_dir, incremental)
+
+    @_writes
+    def restore_snapshot(self, snapshot_id=None, backup_dir=None):
+        """Restore a snapshot (latest by default) into this database"""
+        from everything_backup import restore_snapshot
+
+        return restore_snapshot(self.db_name, backup_dir, snapshot_id)
+
+    def list_snapshots(self, backup_dir=None):
+        """List snapshots taken of this database, oldest first"""
+        from everything_backup import default_backup_dir, load_manifest
+
+        return load_manifest(backup_dir or default_backup_dir(self.db_name))["snapshots"]
+
+    @_writes
+    def enable_cdc(self, table_name):
+        """Log this table's inserts/updates/deletes to _changelog via triggers.
+
+        Call again after changing the table's columns to regenerate the
+        triggers.
+        """
+        from everything_cdc import enable_cdc
+
+        enable_cdc(self, table_name)
+
+    @_writes
+    def disable_cdc(self, table_name):
+        """Drop a table's change-logging triggers"""
+        from everything_cdc import disable_cdc
+
+        disable_cdc(self, table_name)
+
+    def cdc_tables(self):
+        """Tables with change-data-capture enabled"""
+        from everything_cdc import cdc_tables
+
+        return cdc_tables(self)
+
+    def read_changes(self, since=0, batch_size=1000, tables=None):
+        """Iterate over batches of changes logged after sequence ``since``"""
+        from everything_cdc import read_changes
+
+        return read_changes(self, since, batch_size, tables)
+
+    @_writes
+    def register_consumer(self, name, from_start=False):
+        """Register a changelog consumer; returns its starting sequence"""
+        from everything_cdc import register_consumer
+
+        return register_consumer(self, name, from_start)
+
+    @_writes
+    def unregister_consumer(self, name):
+        from everything_cdc import unregister_consumer
+
+        unregister_consumer(self, name)
+
+    @_writes
+    def ack_changes(self, name, seq):
+        """Acknowledge changes up to ``seq``; truncates what every consumer has seen"""
+        from everything_cdc import ack_changes
+
+        return ack_changes(self, name, seq)
+
+    def get_consumers(self):
+        """{consumer name: last acknowledged sequence}"""
+        from everything_cdc import get_consumers
+
+        return get_consumers(self)
+
+    @_writes
+    def create_partitioned_table(
+        self, table_name, columns, time_column, interval="day", retention=None
+    ):
+        """Create a table split into day/week/month partitions behind a UNION ALL view"""
+        from everything_partition import create_partitioned_table
+
+        create_partitioned_table(self, table_name, columns, time_column, interval, retention)
+
+    @_writes
+    def insert_partitioned(self, table_name, rows):
+        """Insert row dicts into their time partitions, creating partitions as needed.
+
+        Returns ``{"rows": written, "expired": skipped as past the retention}``.
+        """
+        from everything_partition import insert_partitioned
+
+        return insert_partitioned(self, table_name, rows)
+
+    def query_partitioned(
+        self,
+        table_name,
+        start=None,
+        end=None,
+        condition="1=1",
+        params=(),
+        columns="*",
+        order_by=None,
+        limit=None,
+    ):
+        """Rows in [start, end), reading only the partitions that overlap it"""
+        from everything_partition import query_partitioned
+
+        return query_partitioned(
+            self, table_name, start, end, condition, params, columns, order_by, limit
+        )
+
+    def list_partitions(self, table_name, counts=False):
+        from everything_partition import list_partitions
+
+        return list_partitions(self, table_name, counts)
+
+    @_writes
+    def apply_retention(self, table_name, keep=None, before=None, archive_dir=None):
+        """Drop (optionally archiving first) partitions outside the retention window"""
+        from everything_partition import apply_retention
+
+        return apply_retention(self, table_name, keep, before, archive_dir)
+
+    @_writes
+    def create_materialized_view(
+        self,
+        name,
+        source,
+        aggregates,
+        group_by=None,
+        condition=None,
+        refresh_interval=None,
+        incremental=True,
+    ):
+        """Store an aggregate query's result as an indexed table, kept up to date.
+
+        COUNT/SUM/TOTAL/AVG views are maintained row by row by triggers;
+        others are rebuilt by refresh_materialized_view() or, every
+        ``refresh_interval`` seconds while stale, by run_maintenance().
+        Returns the maintenance mode, "incremental" or "refresh".
+        """
+        from everything_matview import create_materialized_view
+
+        with self.transaction("IMMEDIATE"):
+            return create_materialized_view(
+                self._connect(),
+                name,
+                source,
+                aggregates,
+                group_by,
+                condition,
+                refresh_interval,
+                incremental,
+            )
+
+    @_writes
+    def refresh_materialized_view(self, name):
+        """Rebuild a materialized view from its source table"""
+        from everything_matview import refresh_materialized_view
+
+        with self.transaction("IMMEDIATE"):
+            refresh_materialized_view(self._connect(), name)
+
+    @_writes
+    def drop_materialized_view(self, name):
+        from everything_matview import drop_materialized_view
+
+        with self.transaction("IMMEDIATE"):
+            drop_materialized_view(self._connect(), name)
+
+    def materialized_view_status(self):
+        """Mode, last refresh and staleness of every materialized view"""
+        from everything_matview import materialized_view_status
+
+        conn = self._connect()
+        try:
+            return materialized_view_status(conn)
+        finally:
+            self._release(conn)
+
+    def get_schema_version(self):
+        """Schema version recorded by migrations (0 if never migrated)"""
+        from everything_migrate import get_schema_version
+
+        conn = self._connect()
+        version = get_schema_version(conn)
+        self._release(conn)
+        return version
+
+    @_writes
+    def migrate(self, migrations_dir="migrations", target=None):
+        """Apply pending migration files in order, one transaction each"""
+        from everything_migrate import migrate_database
+
+        if self.in_transaction():
+            raise ValueError("migrate() manages its own transactions")
+        return migrate_database(self.db_name, migrations_dir, target)
+
+    def migration_status(self, migrations_dir="migrations"):
+        """Current schema version and the names of pending migration files"""
+        from everything_migrate import migration_status
+
+        return migration_status(self.db_name, migrations_dir)
+
+    @_writes
+    def rebuild_table(self, table_name, columns, column_map=None):
+        """Recreate a table with a new definition, copying rows across in one pass"""
+        from everything_migrate import rebuild_table
+
+        with self.transaction("IMMEDIATE"):
+            result = rebuild_table(self._connect(), table_name, columns, column_map)
+        record_write(self.db_name, result["rows"])
+        return result
+
+    @_writes
+    def enable_compression(
+        self, table_name, column, codec="zlib", migrate=True, batch_size=5000
+    ):
+        """Store a TEXT column compressed (zlib or lzma) from now on.
+
+        With ``migrate`` the existing values are compressed in place, in
+        batches; returns a space-savings report.
+        """
+        from everything_compress import enable_compression
+
+        return enable_compression(self, table_name, column, codec, migrate, batch_size)
+
+    @_writes
+    def disable_compression(self, table_name, column, batch_size=5000):
+        """Decompress a column's values in place and stop compressing it"""
+        from everything_compress import disable_compression
+
+        return disable_compression(self, table_name, column, batch_size)
+
+    def get_compressed_columns(self, table_name=None):
+        """{column: codec} for a table, or {table: {column: codec}} for all of them"""
+        conn = self._connect()
+        try:
+            if table_name is None:
+                tables = self._compression_map(conn)
+                return {name: dict(columns) for name, columns in tables.items()}
+            return dict(self._compressed_columns(conn, table_name))
+        finally:
+            self._release(conn)
+
+    def compression_report(self):
+        """Original vs. stored bytes for every compressed column"""
+        from everything_compress import compression_report
+
+        return compression_report(self)
+
+    def check_health(self, full=False, budget_seconds=30.0):
+        """quick_check (or integrity_check), foreign keys, freelist and WAL size"""
+        from everything_health import check_database
+
+        return check_database(self.db_name, full=full, budget_seconds=budget_seconds)
+
+    def sync_to(self, target, tables=None, leaf_size=1000, branching=16, dry_run=False):
+        """Make ``target`` (a name or SQLiteDatabase) match this database's tables.
+
+        Only key ranges whose hashes differ are read row by row; returns a
+        per-table report of ranges hashed and rows upserted/deleted.
+        """
+        from everything_sync import sync_databases
+
+        if not isinstance(target, SQLiteDatabase):
+            target = SQLiteDatabase(target)
+        if target.read_only:
+            raise ReadOnlyDatabaseError(
+                f"'{target.db_name}' is open read-only; sync_to() is not allowed"
+            )
+        if self.in_transaction() or target.in_transaction():
+            raise ValueError("sync_to() manages its own transactions")
+        return sync_databases(
+            self.db_name,
+            target.db_name,
+            tables,
+            leaf_size=leaf_size,
+            branching=branching,
+            dry_run=dry_run,
+        )
+
+    def parallel_aggregate(
+        self,
+        table_name,
+        aggregates,
+        group_by=None,
+        condition="1=1",
+        params=(),
+        workers=None,
+        ranges=None,
+    ):
+        """aggregate() split into rowid ranges computed on every core, then merged"""
+        from everything_parallel import parallel_aggregate
+
+        return parallel_aggregate(
+            self, table_name, aggregates, group_by, condition, params, workers, ranges
+        )
+
+    def parallel_scan(
+        self, table_name, columns="*", condition="1=1", params=(), workers=None, ranges=None
+    ):
+        """Iterate rows matching ``condition`` in rowid order, filtered on every core"""
+        from everything_parallel import parallel_scan
+
+        return parallel_scan(self, table_name, columns, condition, params, workers, ranges)
+
     def close(self):
-        """Close database connection (placeholder for compatibility)"""
-        # SQLite connections are closed after each operation in this implementation
-        pass
+        """Close this thread's kept connection (read-only or keep_connections mode)"""
+        # Otherwise connections are closed after each operation
+        reader = getattr(self._local, "reader", None)
+        if reader is not None:
+            self._local.reader = None
+            reader.close()
 
     def table_exists(self, table_name):
         """Check if a table exists in the database"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute(
             "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
             (table_name,),
         )
         exists = cursor.fetchone() is not None
-        conn.close()
+        self._release(conn)
         return exists
 
     def get_column_info(self, table_name):
         """Get detailed column information for a table"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
         try:
             cursor.execute(f"PRAGMA table_info({table_name})")
             columns = cursor.fetchall()
-            conn.close()
+            self._release(conn)
             return columns
         except sqlite3.OperationalError:
-            conn.close()
+            self._release(conn)
             return []
 
     def validate_table_name(self, table_name):
@@ -270,6 +1727,7 @@ class SQLiteDatabase:
 
         return True, "Valid table name"
 
+    @_writes
     def create_table_safe(self, table_name, columns):
         """Create table with validation and better error handling"""
         # Validate table name
@@ -288,9 +1746,10 @@ class SQLiteDatabase:
         except sqlite3.Error as e:
             raise sqlite3.Error(f"Failed to create table: {str(e)}")
 
+    @_writes
     def save_metadata(self, metadata):
         """Save database metadata to database table"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
 
         # Ensure metadata table exists
@@ -320,12 +1779,12 @@ class SQLiteDatabase:
                 (key, str(value)),
             )
 
-        conn.commit()
-        conn.close()
+        self._commit(conn)
+        self._release(conn)
 
     def get_metadata(self):
         """Get database metadata from database table"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
 
         try:
@@ -333,7 +1792,7 @@ class SQLiteDatabase:
             rows = cursor.fetchall()
 
             if not rows:
-                conn.close()
+                self._release(conn)
                 return None
 
             metadata = {}
@@ -346,17 +1805,18 @@ class SQLiteDatabase:
                 else:
                     metadata[key] = value
 
-            conn.close()
+            self._release(conn)
             return metadata
 
         except sqlite3.OperationalError:
             # Metadata table doesn't exist
-            conn.close()
+            self._release(conn)
             return None
 
+    @_writes
     def update_metadata(self, new_metadata):
         """Update existing metadata"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect()
         cursor = conn.cursor()
 
         # Ensure metadata table exists
@@ -381,10 +1841,10 @@ class SQLiteDatabase:
                 (key, str(value)),
             )
 
-        conn.commit()
-        conn.close()
+        self._commit(conn)
+        self._release(conn)
 
-    def list_all_databases(self):
+    def list_all_databases(self, max_workers=8):
         """List all databases in the data directory with their metadata"""
         databases = []
         if not os.path.exists(self.data_dir):
@@ -394,17 +1854,31 @@ class SQLiteDatabase:
             if file.endswith(".db"):
                 db_name = os.path.splitext(file)[0]
                 db_path = os.path.join(self.data_dir, file)
+                databases.append({"name": db_name, "file": file, "path": db_path})
 
-                db_info = {"name": db_name, "file": file, "path": db_path}
+        if len(databases) > 1 and max_workers > 1:
+            # Metadata reads are I/O bound (sqlite3 releases the GIL), which
+            # matters with hundreds of files on a network filesystem
+            from concurrent.futures import ThreadPoolExecutor
 
-                # Get metadata from the database itself
-                try:
-                    temp_db = SQLiteDatabase(db_name)
-                    metadata = temp_db.get_metadata()
-                    db_info["metadata"] = metadata
-                except Exception:
-                    db_info["metadata"] = None
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                metadata = list(pool.map(_read_metadata, databases))
+        else:
+            metadata = [_read_metadata(db_info) for db_info in databases]
 
-                databases.append(db_info)
+        for db_info, db_metadata in zip(databases, metadata):
+            db_info["metadata"] = db_metadata
 
         return databases
+
+
+def _read_metadata(db_info):
+    """Get metadata from the database itself, or None if it can't be read"""
+    try:
+        temp_db = SQLiteDatabase(db_info["name"], read_only=True)
+        try:
+            return temp_db.get_metadata()
+        finally:
+            temp_db.close()
+    except Exception:
+        return None
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Health checks for SQLite Database Manager
+Runs PRAGMA quick_check (or the full integrity_check), foreign_key_check, a
+freelist ratio and WAL size check on every database in data/, one process per
+file in a pool, each under its own time budget. The report is a list of
+per-database results ordered by severity, worst first, ready for JSON output
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Severity levels, worst first; a database's severity is its worst issue's
+SEVERITIES = ("critical", "error", "warning", "ok")
+
+# Defaults for the space checks
+FREELIST_WARNING_RATIO = 0.25
+WAL_WARNING_BYTES = 64 * 1024 * 1024
+
+# Integrity messages reported per file before the check stops collecting
+MAX_INTEGRITY_ERRORS = 100
+
+
+class _Budget:
+    """Progress handler that interrupts a statement once the deadline passes"""
+
+    def __init__(self, seconds):
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self.expired = False
+
+    def __call__(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.expired = True
+            return 1
+        return 0
+
+
+def _issue(severity, check, message):
+    return {"severity": severity, "check": check, "message": message}
+
+
+def _open(db_path, budget_seconds):
+    # mode=ro: a health check must never create, migrate or write to a file
+    uri = "file:" + os.path.abspath(db_path).replace("?", "%3f") + "?mode=ro"
+    return sqlite3.connect(uri, uri=True, timeout=min(budget_seconds or 5, 5))
+
+
+def check_database(
+    db_path,
+    full=False,
+    budget_seconds=30.0,
+    freelist_ratio=FREELIST_WARNING_RATIO,
+    wal_bytes=WAL_WARNING_BYTES,
+):
+    """Check one database file and return its report dict.
+
+    quick_check skips index/table content cross-checks and is O(N) rather
+    than O(N log N); ``full=True`` runs integrity_check instead. Checks that
+    don't finish within the budget are reported as a warning, not a pass.
+    """
+    started = time.perf_counter()
+    report = {
+        "database": os.path.splitext(os.path.basename(db_path))[0],
+        "path": db_path,
+        "issues": [],
+        "checks": {},
+    }
+    issues = report["issues"]
+
+    wal_path = db_path + "-wal"
+    wal_size = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+    report["checks"]["wal_bytes"] = wal_size
+    if wal_size > wal_bytes:
+        issues.append(
+            _issue(
+                "warning",
+                "wal_size",
+                f"WAL is {wal_size / (1024 * 1024):.1f} MB; "
+                "checkpoints may be blocked by a long-running reader",
+            )
+        )
+
+    budget = _Budget(budget_seconds)
+    conn = None
+    check = "open"
+    try:
+        conn = _open(db_path, budget_seconds)
+        conn.set_progress_handler(budget, 1000)
+
+        check = "page_count"
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        ratio = freelist / page_count if page_count else 0.0
+        report["checks"].update(
+            {"page_count": page_count, "freelist_count": freelist, "freelist_ratio": ratio}
+        )
+        if ratio > freelist_ratio:
+            issues.append(
+                _issue(
+                    "warning",
+                    "freelist",
+                    f"{ratio:.0%} of pages are free; VACUUM or incremental_vacuum "
+                    "would shrink the file",
+                )
+            )
+
+        check = "integrity_check" if full else "quick_check"
+        messages = [
+            row[0]
+            for row in conn.execute(f"PRAGMA {check}({MAX_INTEGRITY_ERRORS})")
+        ]
+        report["checks"][check] = messages == ["ok"]
+        if messages != ["ok"]:
+            issues.extend(_issue("critical", check, message) for message in messages)
+
+        check = "foreign_key_check"
+        violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+        report["checks"][check] = len(violations)
+        by_table = {}
+        for table, _rowid, parent, _fkid in violations:
+            by_table[(table, parent)] = by_table.get((table, parent), 0) + 1
+        for (table, parent), count in sorted(by_table.items()):
+            issues.append(
+                _issue(
+                    "error",
+                    check,
+                    f"{count} row(s) in '{table}' reference missing rows in '{parent}'",
+                )
+            )
+    except sqlite3.DatabaseError as e:
+        if budget.expired:
+            issues.append(
+                _issue(
+                    "warning",
+                    check,
+                    f"Stopped after the {budget_seconds:g}s budget; "
+                    "remaining checks did not run",
+                )
+            )
+            report["timed_out"] = True
+        elif isinstance(e, sqlite3.OperationalError) and "locked" in str(e):
+            issues.append(_issue("warning", check, f"Skipped: {e}"))
+        else:
+            # "file is not a database", "database disk image is malformed", ...
+            issues.append(_issue("critical", check, str(e)))
+    finally:
+        if conn is not None:
+            conn.close()
+
+    report["severity"] = min(
+        (issue["severity"] for issue in issues),
+        key=SEVERITIES.index,
+        default="ok",
+    )
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+def _check_path(args):
+    """Pool entry point: never let one file's failure lose the whole report"""
+    path, options = args
+    try:
+        return check_database(path, **options)
+    except Exception as e:
+        return {
+            "database": os.path.splitext(os.path.basename(path))[0],
+            "path": path,
+            "issues": [_issue("critical", "check", f"{type(e).__name__}: {e}")],
+            "checks": {},
+            "severity": "critical",
+            "seconds": 0.0,
+        }
+
+
+def sort_reports(reports):
+    """Worst severity first, then most issues, then by name"""
+    return sorted(
+        reports,
+        key=lambda r: (SEVERITIES.index(r["severity"]), -len(r["issues"]), r["database"]),
+    )
+
+
+def check_all_databases(data_dir="data", names=None, max_workers=None, **options):
+    """Check every database in data_dir (or just ``names``) in a process pool.
+
+    integrity_check is CPU-bound in SQLite's btree code, so separate
+    processes keep every core busy. Returns reports ordered by severity.
+    """
+    if names:
+        paths = [
+            os.path.join(data_dir, name if name.endswith(".db") else name + ".db")
+            for name in names
+        ]
+    else:
+        paths = [
+            os.path.join(data_dir, name)
+            for name in sorted(os.listdir(data_dir))
+            if name.endswith(".db")
+        ]
+    if not paths:
+        return []
+    jobs = [(path, options) for path in paths]
+    if len(paths) == 1:
+        return [_check_path(jobs[0])]  # not worth starting a pool
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return sort_reports(pool.map(_check_path, jobs))
+
+
+def summarize(reports):
+    """{severity: number of databases}"""
+    counts = dict.fromkeys(SEVERITIES, 0)
+    for report in reports:
+        counts[report["severity"]] += 1
+    return counts
+
+
+def _print_text(reports):
+    symbols = {"critical": "✗", "error": "✗", "warning": "!", "ok": "✓"}
+    for report in reports:
+        print(
+            f"{symbols[report['severity']]} {report['database']}: "
+            f"{report['severity']} ({report['seconds']:.2f}s)"
+        )
+        for issue in report["issues"]:
+            print(f"    [{issue['severity']}] {issue['check']}: {issue['message']}")
+    counts = summarize(reports)
+    print(", ".join(f"{count} {severity}" for severity, count in counts.items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check the health of databases in data/ in parallel"
+    )
+    parser.add_argument("names", nargs="*", help="Database names (default: all)")
+    parser.add_argument(
+        "--full", action="store_true", help="Run integrity_check instead of quick_check"
+    )
+    parser.add_argument(
+        "--budget", type=float, default=30.0, help="Seconds allowed per database"
+    )
+    parser.add_argument("--workers", type=int, help="Processes (default: CPU count)")
+    parser.add_argument("--freelist-ratio", type=float, default=FREELIST_WARNING_RATIO)
+    parser.add_argument(
+        "--wal-mb", type=float, default=WAL_WARNING_BYTES / (1024 * 1024)
+    )
+    parser.add_argument("--format", choices=("json", "text"), default="json")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir("data"):
+        reports = []
+    else:
+        reports = check_all_databases(
+            names=args.names,
+            max_workers=args.workers,
+            full=args.full,
+            budget_seconds=args.budget,
+            freelist_ratio=args.freelist_ratio,
+            wal_bytes=int(args.wal_mb * 1024 * 1024),
+        )
+    if args.format == "json":
+        json.dump({"summary": summarize(reports), "databases": reports}, sys.stdout, indent=2)
+        print()
+    else:
+        _print_text(reports)
+    # Non-zero when something needs fixing, so cron/CI can alert on it
+    return 1 if any(r["severity"] in ("critical", "error") for r in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
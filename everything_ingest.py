@@ -0,0 +1,262 @@
+"""
+Write-behind ingestion queue for SQLite Database Manager
+Producers enqueue rows without touching SQLite; one writer thread drains the
+queue and group-commits batches when they reach a size or age threshold, so
+many producer threads never fight over the database write lock
+"""
+
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+
+from everything_db import record_write
+
+# Sentinel telling the writer thread to flush and exit
+_STOP = object()
+
+# A batch that hits a locked/busy database is retried this many times,
+# waiting RETRY_DELAY seconds and doubling it after each attempt
+RETRIES = 6
+RETRY_DELAY = 0.05
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue stays full past the caller's timeout"""
+
+
+class IngestQueue:
+    """Bounded queue of (table, row) pairs written by a single group-commit thread"""
+
+    def __init__(
+        self,
+        db,
+        batch_size=1000,
+        max_delay=0.5,
+        max_queue=100000,
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._error = None
+        self.metrics = {
+            "enqueued": 0,
+            "written": 0,
+            "failed": 0,
+            "batches": 0,
+            "max_depth": 0,
+            "commit_seconds_total": 0.0,
+            "commit_seconds_max": 0.0,
+        }
+
+    def start(self):
+        """Start the writer thread (no-op if already running)"""
+        if self._thread and self._thread.is_alive():
+            return self
+        self._thread = threading.Thread(
+            target=self._writer, name="everything-ingest", daemon=True
+        )
+        self._thread.start()
+        # Rows still queued at interpreter exit are flushed, not dropped
+        atexit.register(self.close)
+        return self
+
+    def put(self, table_name, row, block=True, timeout=None):
+        """Enqueue one row dict; blocks (backpressure) while the queue is full.
+
+        Raises QueueFullError if the queue is still full after ``timeout``
+        seconds, or immediately when ``block`` is False.
+        """
+        if self._error:
+            raise self._error
+        try:
+            self._queue.put((table_name, row), block=block, timeout=timeout)
+        except queue.Full:
+            raise QueueFullError(
+                f"Ingestion queue full ({self._queue.maxsize} rows pending)"
+            )
+        with self._lock:
+            self.metrics["enqueued"] += 1
+            depth = self._queue.qsize()
+            if depth > self.metrics["max_depth"]:
+                self.metrics["max_depth"] = depth
+
+    def put_many(self, table_name, rows, block=True, timeout=None):
+        for row in rows:
+            self.put(table_name, row, block, timeout)
+
+    def depth(self):
+        """Rows waiting to be written"""
+        return self._queue.qsize()
+
+    def flush(self, timeout=None):
+        """Block until every row enqueued so far is committed"""
+        if not self._thread:
+            raise RuntimeError("Ingestion queue is not running; call start() first")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Queue.join() has no timeout, so poll the unfinished-task count instead
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        if self._error:
+            raise self._error
+        return True
+
+    def close(self, timeout=None):
+        """Durably flush everything still queued, then stop the writer thread"""
+        if not self._thread:
+            return
+        atexit.unregister(self.close)
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+        if self._error:
+            raise self._error
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def stats(self):
+        """Snapshot of queue depth, throughput and commit latency"""
+        with self._lock:
+            metrics = dict(self.metrics)
+        metrics["depth"] = self._queue.qsize()
+        metrics["commit_seconds_avg"] = (
+            metrics["commit_seconds_total"] / metrics["batches"]
+            if metrics["batches"]
+            else 0.0
+        )
+        return metrics
+
+    def _writer(self):
+        conn = None
+        try:
+            # Configured like every other connection to this database
+            conn = self.db._connect()
+            self._drain(conn)
+        except Exception as e:
+            # Surface the failure to producers and release anyone in flush()
+            self._error = e
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._queue.task_done()
+        finally:
+            if conn is not None:
+                self.db._release(conn)
+
+    def _drain(self, conn):
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.max_delay)
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.max_delay
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self._commit_batch(conn, batch)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+
+    def _commit_batch(self, conn, batch):
+        """Write a batch in one transaction, grouping rows with the same shape"""
+        groups = {}
+        for table_name, row in batch:
+            groups.setdefault((table_name, tuple(row.keys())), []).append(
+                tuple(row.values())
+            )
+        # Compressed columns are stored compressed, as by every other write path
+        groups = {
+            (table_name, columns): self.db._compress(conn, table_name, columns, values)
+            for (table_name, columns), values in groups.items()
+        }
+
+        started = time.perf_counter()
+        failures = 0
+        try:
+            _retry(lambda: self._write_groups(conn, groups))
+        except sqlite3.IntegrityError as e:
+            # Some row broke a constraint: write the others one by one.
+            # Any other error stops the writer and is raised to producers.
+            failures = _retry(lambda: self._write_individually(conn, groups))
+            with self._lock:
+                self.metrics["last_error"] = str(e)
+        elapsed = time.perf_counter() - started
+
+        record_write(self.db.db_name, len(batch) - failures)
+        with self._lock:
+            self.metrics["batches"] += 1
+            self.metrics["written"] += len(batch) - failures
+            self.metrics["failed"] += failures
+            self.metrics["commit_seconds_total"] += elapsed
+            if elapsed > self.metrics["commit_seconds_max"]:
+                self.metrics["commit_seconds_max"] = elapsed
+
+    def _write_groups(self, conn, groups):
+        with conn:
+            for (table_name, columns), values in groups.items():
+                conn.executemany(_insert_sql(table_name, columns), values)
+
+    def _write_individually(self, conn, groups):
+        """Retry a failed batch row by row, dropping only the rows that break a constraint"""
+        failures = 0
+        with conn:
+            for (table_name, columns), values in groups.items():
+                sql = _insert_sql(table_name, columns)
+                for row in values:
+                    try:
+                        conn.execute(sql, row)
+                    except sqlite3.IntegrityError:
+                        failures += 1
+        return failures
+
+
+def _retry(write):
+    """Call ``write``, retrying while another connection holds the database lock"""
+    delay = RETRY_DELAY
+    for attempt in range(RETRIES):
+        try:
+            return write()
+        except sqlite3.OperationalError as e:
+            message = str(e)
+            transient = "locked" in message or "busy" in message
+            if not transient or attempt == RETRIES - 1:
+                raise
+        time.sleep(delay)
+        delay *= 2
+
+
+def _insert_sql(table_name, columns):
+    placeholders = ", ".join("?" for _ in columns)
+    return f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
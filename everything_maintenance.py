@@ -0,0 +1,187 @@
+"""
+Background maintenance for SQLite Database Manager
+Keeps query plans fresh and files compact: runs PRAGMA optimize/ANALYZE with an
+analysis_limit, incremental vacuum and WAL checkpoints on databases that the
+library has written to, once they have been idle for a while
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from everything_db import get_write_stats, reset_write_stats
+
+logger = logging.getLogger(__name__)
+
+
+def _file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _total_size(db_path):
+    """Database file plus its WAL, which a checkpoint can shrink"""
+    return _file_size(db_path) + _file_size(db_path + "-wal")
+
+
+def run_maintenance(db_path, analysis_limit=400, vacuum_pages=None, checkpoint=True):
+    """Run one maintenance pass over a database file and report what it did"""
+    started = time.perf_counter()
+    bytes_before = _total_size(db_path)
+
+    conn = sqlite3.connect(db_path, timeout=5)
+    try:
+        cursor = conn.cursor()
+        report = {"path": db_path, "actions": []}
+
+        # Refresh planner statistics; analysis_limit bounds the rows examined per index
+        cursor.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='sqlite_stat1'"
+        )
+        if cursor.fetchone():
+            cursor.execute("PRAGMA optimize")
+            report["actions"].append("optimize")
+        else:
+            cursor.execute("ANALYZE")
+            report["actions"].append("analyze")
+        conn.commit()
+
+        cursor.execute("PRAGMA freelist_count")
+        report["freelist_before"] = cursor.fetchone()[0]
+        cursor.execute("PRAGMA auto_vacuum")
+        auto_vacuum = cursor.fetchone()[0]
+        if auto_vacuum == 2 and report["freelist_before"]:
+            # sqlite3's execute() steps this pragma only once (freeing one page);
+            # executescript runs it to completion
+            pages = f"({int(vacuum_pages)})" if vacuum_pages else ""
+            cursor.executescript(f"PRAGMA incremental_vacuum{pages};")
+            report["actions"].append("incremental_vacuum")
+        cursor.execute("PRAGMA freelist_count")
+        report["freelist_after"] = cursor.fetchone()[0]
+
+        # Rebuild refresh-mode materialized views that are stale and due
+        from everything_matview import refresh_due
+
+        refreshed = refresh_due(conn)
+        conn.commit()
+        if refreshed:
+            report["refreshed_views"] = refreshed
+            report["actions"].append("refresh_views")
+
+        cursor.execute("PRAGMA journal_mode")
+        if checkpoint and cursor.fetchone()[0] == "wal":
+            cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            busy, log_frames, checkpointed = cursor.fetchone()
+            report["checkpoint"] = {
+                "busy": bool(busy),
+                "log_frames": log_frames,
+                "checkpointed": checkpointed,
+            }
+            report["actions"].append("wal_checkpoint")
+    finally:
+        conn.close()
+
+    bytes_after = _total_size(db_path)
+    report["bytes_before"] = bytes_before
+    report["bytes_after"] = bytes_after
+    report["reclaimed_bytes"] = max(bytes_before - bytes_after, 0)
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+class MaintenanceScheduler:
+    """Background thread that maintains databases after enough writes and idle time"""
+
+    def __init__(
+        self,
+        interval=30,
+        idle_seconds=10,
+        write_threshold=1000,
+        analysis_limit=400,
+        vacuum_pages=None,
+        checkpoint=True,
+    ):
+        self.interval = interval
+        self.idle_seconds = idle_seconds
+        self.write_threshold = write_threshold
+        self.analysis_limit = analysis_limit
+        self.vacuum_pages = vacuum_pages
+        self.checkpoint = checkpoint
+        self.history = []
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the background maintenance thread (no-op if already running)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="everything-maintenance", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Signal the thread to stop and wait for the current pass to finish"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            for path, _ in self.due_databases():
+                # One failing database mustn't stop the others or the thread;
+                # it stays due and is retried on the next pass
+                try:
+                    self.run_once([path])
+                except Exception:
+                    logger.exception("Maintenance of %s failed", path)
+
+    def due_databases(self, now=None):
+        """Databases with enough pending writes that have been idle long enough"""
+        now = time.time() if now is None else now
+        due = []
+        for path, stats in get_write_stats().items():
+            if stats["rows"] < self.write_threshold:
+                continue
+            if stats["last_write"] and now - stats["last_write"] < self.idle_seconds:
+                continue
+            if os.path.exists(path):
+                due.append((path, stats["rows"]))
+        return due
+
+    def run_once(self, paths=None):
+        """Maintain due databases now (or exactly ``paths`` if given)"""
+        if paths is None:
+            targets = self.due_databases()
+        else:
+            pending = get_write_stats()
+            targets = []
+            for path in paths:
+                path = os.path.abspath(path)
+                targets.append((path, pending.get(path, {}).get("rows", 0)))
+
+        reports = []
+        with self._lock:
+            for path, rows in targets:
+                report = run_maintenance(
+                    path, self.analysis_limit, self.vacuum_pages, self.checkpoint
+                )
+                report["writes"] = rows
+                reset_write_stats(path, rows)
+                self.history.append(report)
+                reports.append(report)
+        return reports
+
+    def summary(self):
+        """Totals across every maintenance run so far"""
+        return {
+            "runs": len(self.history),
+            "databases": len({report["path"] for report in self.history}),
+            "reclaimed_bytes": sum(r["reclaimed_bytes"] for r in self.history),
+            "seconds": sum(r["seconds"] for r in self.history),
+        }
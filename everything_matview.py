@@ -0,0 +1,427 @@
+"""
+Materialized views for SQLite Database Manager
+Stores the result of a GROUP BY aggregate in a real, indexed table so
+dashboards read a handful of rows instead of re-aggregating the source.
+Views made only of COUNT/SUM/TOTAL/AVG are kept current by generated triggers
+that add or subtract each changed row's contribution to its group; views
+with MIN/MAX/COUNT DISTINCT are rebuilt by refresh (manually or by the
+maintenance scheduler) and marked stale in _database_metadata as soon as
+their source changes
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+
+VIEWS_TABLE = "_materialized_views"
+
+# Aggregates that can be maintained from one row's contribution at a time
+INCREMENTAL_FUNCTIONS = ("count", "sum", "total", "avg")
+
+
+def _storage(name):
+    """Hidden table holding the view's groups plus the running state columns"""
+    return f"_mv_{name}"
+
+
+def _trigger_names(name):
+    return [f"_mv_{name}_{kind}" for kind in ("insert", "update", "delete")]
+
+
+def _metadata_key(name, field):
+    return f"matview:{name}:{field}"
+
+
+def _ensure_table(conn):
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {VIEWS_TABLE} (
+            name TEXT PRIMARY KEY,
+            source TEXT NOT NULL,
+            definition TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            refresh_interval REAL
+        )
+    """
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS _database_metadata (key TEXT PRIMARY KEY, value TEXT)"
+    )
+
+
+def _set_metadata(conn, name, field, value):
+    key = _metadata_key(name, field)
+    if value is None:
+        conn.execute("DELETE FROM _database_metadata WHERE key = ?", (key,))
+    else:
+        conn.execute(
+            "INSERT OR REPLACE INTO _database_metadata (key, value) VALUES (?, ?)",
+            (key, value),
+        )
+
+
+def _parse_aggregates(aggregates):
+    """[(func, column, alias)] with the same default aliases as aggregate()"""
+    parsed = []
+    for spec in aggregates:
+        if len(spec) not in (2, 3):
+            raise ValueError(f"Invalid aggregate specification: {spec!r}")
+        func, column = spec[0].lower(), spec[1]
+        if func not in ("count", "sum", "total", "avg", "min", "max", "count_distinct"):
+            raise ValueError(f"Unsupported aggregate '{func}'")
+        if column == "*" and func != "count":
+            raise ValueError(f"'{func}' requires a column, not '*'")
+        if len(spec) == 3:
+            alias = spec[2]
+        elif column == "*":
+            alias = func
+        else:
+            safe_column = "".join(ch if ch.isalnum() else "_" for ch in column)
+            alias = f"{func}_{safe_column.strip('_')}"
+        parsed.append((func, column, alias))
+    return parsed
+
+
+def _state_columns(func, column, alias, incremental):
+    """[(state column, full-rebuild SQL)] stored for one aggregate"""
+    if not incremental:
+        sql = {
+            "count": "COUNT({c})",
+            "sum": "SUM({c})",
+            "total": "TOTAL({c})",
+            "avg": "AVG({c})",
+            "min": "MIN({c})",
+            "max": "MAX({c})",
+            "count_distinct": "COUNT(DISTINCT {c})",
+        }[func]
+        return [(alias, sql.format(c=column))]
+    if func == "count":
+        return [(alias, f"COUNT({column})")]
+    if func == "total":
+        return [(alias, f"TOTAL({column})")]
+    # SUM is NULL when every value is NULL, so track how many aren't
+    prefix = alias if func == "sum" else f"{alias}__sum"
+    return [(prefix, f"SUM({column})"), (f"{alias}__n", f"COUNT({column})")]
+
+
+def _definition(conn, name):
+    row = conn.execute(
+        f"SELECT source, definition, mode, refresh_interval FROM {VIEWS_TABLE} "
+        "WHERE name = ?",
+        (name,),
+    ).fetchone()
+    if row is None:
+        raise ValueError(f"Materialized view '{name}' not found")
+    definition = json.loads(row[1])
+    definition.update(source=row[0], mode=row[2], refresh_interval=row[3])
+    definition["aggregates"] = [tuple(spec) for spec in definition["aggregates"]]
+    return definition
+
+
+def _populate_sql(name, definition):
+    incremental = definition["mode"] == "incremental"
+    group_by = definition["group_by"]
+    columns, selects = list(group_by), list(group_by)
+    columns.append("_rows")
+    selects.append("COUNT(*)")
+    for func, column, alias in definition["aggregates"]:
+        for state, sql in _state_columns(func, column, alias, incremental):
+            columns.append(state)
+            selects.append(sql)
+    sql = (
+        f"INSERT INTO {_storage(name)} ({', '.join(columns)}) "
+        f"SELECT {', '.join(selects)} FROM {definition['source']} "
+        f"WHERE {definition['condition'] or '1=1'}"
+    )
+    if group_by:
+        sql += f" GROUP BY {', '.join(group_by)}"
+    return sql
+
+
+def _trigger_sql(name, definition, source_columns):
+    """Triggers applying each inserted/updated/deleted row to its group"""
+    storage = _storage(name)
+    group_by = definition["group_by"]
+    condition = definition["condition"] or "1=1"
+
+    def delta(ref):
+        # Aliasing OLD/NEW columns lets group_by, aggregate columns and the
+        # condition be written exactly as in a plain SELECT on the source
+        row = ", ".join(f"{ref}.{column} AS {column}" for column in source_columns)
+        values = list(group_by) + ["1 AS _rows"]
+        for func, column, alias in definition["aggregates"]:
+            if func == "count":
+                value = "1" if column == "*" else f"({column} IS NOT NULL)"
+                values.append(f"{value} AS {alias}")
+            elif func == "total":
+                values.append(f"COALESCE({column}, 0.0) AS {alias}")
+            else:
+                total = alias if func == "sum" else f"{alias}__sum"
+                values.append(f"{column} AS {total}")
+                values.append(f"({column} IS NOT NULL) AS {alias}__n")
+        return (
+            f"(SELECT {', '.join(values)} FROM (SELECT {row}) "
+            f"WHERE {condition}) AS d"
+        )
+
+    match = " AND ".join(f"{storage}.{column} IS d.{column}" for column in group_by)
+    match = match or "1=1"
+
+    def apply(ref, sign):
+        # Current values are qualified: d has columns of the same names
+        cur = storage
+        sets = [f"_rows = {cur}._rows {sign} d._rows"]
+        for func, column, alias in definition["aggregates"]:
+            if func in ("count", "total"):
+                sets.append(f"{alias} = {cur}.{alias} {sign} d.{alias}")
+                continue
+            total = alias if func == "sum" else f"{alias}__sum"
+            count = f"{alias}__n"
+            if sign == "+":
+                sets.append(
+                    f"{total} = CASE WHEN d.{total} IS NULL THEN {cur}.{total} "
+                    f"ELSE COALESCE({cur}.{total}, 0) + d.{total} END"
+                )
+            else:
+                sets.append(
+                    f"{total} = CASE WHEN {cur}.{count} - d.{count} = 0 THEN NULL "
+                    f"ELSE {cur}.{total} - COALESCE(d.{total}, 0) END"
+                )
+            sets.append(f"{count} = {cur}.{count} {sign} d.{count}")
+        statements = [
+            f"UPDATE {storage} SET {', '.join(sets)} FROM {delta(ref)} WHERE {match};"
+        ]
+        if sign == "+":
+            state = [column for column, _ in _storage_columns(definition)]
+            statements.append(
+                f"INSERT INTO {storage} ({', '.join(state)}) "
+                f"SELECT {', '.join('d.' + column for column in state)} "
+                f"FROM {delta(ref)} "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {storage} WHERE {match});"
+            )
+        elif group_by:
+            statements.append(f"DELETE FROM {storage} WHERE _rows = 0;")
+        return " ".join(statements)
+
+    source = definition["source"]
+    insert, update, delete = _trigger_names(name)
+    return [
+        f"CREATE TRIGGER {insert} AFTER INSERT ON {source} "
+        f"BEGIN {apply('NEW', '+')} END",
+        f"CREATE TRIGGER {update} AFTER UPDATE ON {source} "
+        f"BEGIN {apply('OLD', '-')} {apply('NEW', '+')} END",
+        f"CREATE TRIGGER {delete} AFTER DELETE ON {source} "
+        f"BEGIN {apply('OLD', '-')} END",
+    ]
+
+
+def _stale_trigger_sql(name, source):
+    """Refresh-mode views: record when the source first changed since a refresh"""
+    mark = (
+        "INSERT OR IGNORE INTO _database_metadata (key, value) VALUES "
+        f"('{_metadata_key(name, 'stale_since')}', "
+        "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'));"
+    )
+    return [
+        f"CREATE TRIGGER {trigger} AFTER {event} ON {source} BEGIN {mark} END"
+        for trigger, event in zip(_trigger_names(name), ("INSERT", "UPDATE", "DELETE"))
+    ]
+
+
+def _storage_columns(definition):
+    """[(column, declared type)] of the storage table, group columns first"""
+    incremental = definition["mode"] == "incremental"
+    columns = [(column, "") for column in definition["group_by"]]
+    columns.append(("_rows", "INTEGER NOT NULL"))
+    for func, column, alias in definition["aggregates"]:
+        for state, _ in _state_columns(func, column, alias, incremental):
+            columns.append((state, ""))
+    return columns
+
+
+def create_materialized_view(
+    conn,
+    name,
+    source,
+    aggregates,
+    group_by=None,
+    condition=None,
+    refresh_interval=None,
+    incremental=True,
+):
+    """Create, populate and start maintaining a materialized view.
+
+    ``aggregates`` and ``group_by`` (column names) are as for
+    SQLiteDatabase.aggregate. COUNT/SUM/TOTAL/AVG views are maintained by
+    triggers unless ``incremental=False``; others are refreshed, by the
+    maintenance scheduler every ``refresh_interval`` seconds once stale.
+    Run inside a write transaction.
+    """
+    if isinstance(group_by, str):
+        group_by = [group_by]
+    group_by = list(group_by or [])
+    parsed = _parse_aggregates(aggregates)
+    if not parsed:
+        raise ValueError("At least one aggregate is required")
+    source_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({source})")]
+    if not source_columns:
+        raise ValueError(f"Table '{source}' not found")
+    missing = [column for column in group_by if column not in source_columns]
+    if missing:
+        raise ValueError(f"Unknown group_by column(s): {', '.join(missing)}")
+
+    mode = "refresh"
+    if incremental and all(func in INCREMENTAL_FUNCTIONS for func, _, _ in parsed):
+        mode = "incremental"
+    definition = {
+        "aggregates": parsed,
+        "group_by": group_by,
+        "condition": condition,
+        "source": source,
+        "mode": mode,
+    }
+
+    _ensure_table(conn)
+    if conn.execute(f"SELECT 1 FROM {VIEWS_TABLE} WHERE name = ?", (name,)).fetchone():
+        raise ValueError(f"Materialized view '{name}' already exists")
+    conn.execute(
+        f"INSERT INTO {VIEWS_TABLE} (name, source, definition, mode, refresh_interval) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (
+            name,
+            source,
+            json.dumps(
+                {"aggregates": parsed, "group_by": group_by, "condition": condition}
+            ),
+            mode,
+            refresh_interval,
+        ),
+    )
+
+    storage = _storage(name)
+    columns = ", ".join(
+        f"{column} {kind}".strip() for column, kind in _storage_columns(definition)
+    )
+    conn.execute(f"CREATE TABLE {storage} ({columns})")
+    if group_by:
+        # Trigger updates and dashboard reads both look groups up by key
+        conn.execute(
+            f"CREATE INDEX idx{storage}_groups ON {storage} ({', '.join(group_by)})"
+        )
+
+    # The public view hides the running state; avg is computed from it
+    exposed = list(group_by)
+    for func, column, alias in parsed:
+        if mode == "incremental" and func == "avg":
+            exposed.append(
+                f"CASE WHEN {alias}__n > 0 THEN CAST({alias}__sum AS REAL) / {alias}__n "
+                f"END AS {alias}"
+            )
+        else:
+            exposed.append(alias)
+    conn.execute(f"CREATE VIEW {name} AS SELECT {', '.join(exposed)} FROM {storage}")
+
+    triggers = (
+        _trigger_sql(name, definition, source_columns)
+        if mode == "incremental"
+        else _stale_trigger_sql(name, source)
+    )
+    for sql in triggers:
+        conn.execute(sql)
+    _refresh(conn, name, definition)
+    return mode
+
+
+def _refresh(conn, name, definition):
+    started = datetime.now()
+    conn.execute(f"DELETE FROM {_storage(name)}")
+    conn.execute(_populate_sql(name, definition))
+    if not definition["group_by"] and definition["mode"] == "incremental":
+        # A global view keeps its single row even when the source is empty
+        conn.execute(
+            f"INSERT INTO {_storage(name)} (_rows) SELECT 0 "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {_storage(name)})"
+        )
+        counters = [
+            f"{alias} = COALESCE({alias}, 0)"
+            for func, _, alias in definition["aggregates"]
+            if func in ("count", "total")
+        ]
+        if counters:
+            conn.execute(f"UPDATE {_storage(name)} SET {', '.join(counters)}")
+    _set_metadata(conn, name, "refreshed_at", started.isoformat())
+    _set_metadata(conn, name, "stale_since", None)
+
+
+def refresh_materialized_view(conn, name):
+    """Rebuild a view from its source (run inside a write transaction)"""
+    _refresh(conn, name, _definition(conn, name))
+
+
+def drop_materialized_view(conn, name):
+    _definition(conn, name)
+    for trigger in _trigger_names(name):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute(f"DROP VIEW IF EXISTS {name}")
+    conn.execute(f"DROP TABLE IF EXISTS {_storage(name)}")
+    conn.execute(f"DELETE FROM {VIEWS_TABLE} WHERE name = ?", (name,))
+    for field in ("refreshed_at", "stale_since"):
+        _set_metadata(conn, name, field, None)
+
+
+def _age(timestamp, now):
+    """Seconds since an isoformat timestamp (0 for none)"""
+    if not timestamp:
+        return 0.0
+    return (now - datetime.fromisoformat(timestamp)).total_seconds()
+
+
+def materialized_view_status(conn, now=None):
+    """Every view with its mode, last refresh and how long it has been stale"""
+    now = now or datetime.now()
+    try:
+        views = conn.execute(
+            f"SELECT name, source, mode, refresh_interval FROM {VIEWS_TABLE} "
+            "ORDER BY name"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []  # no materialized view has been created
+    metadata = dict(
+        conn.execute(
+            "SELECT key, value FROM _database_metadata WHERE key LIKE 'matview:%'"
+        ).fetchall()
+    )
+    status = []
+    for name, source, mode, interval in views:
+        stale_since = metadata.get(_metadata_key(name, "stale_since"))
+        status.append(
+            {
+                "name": name,
+                "source": source,
+                "mode": mode,
+                "refresh_interval": interval,
+                "refreshed_at": metadata.get(_metadata_key(name, "refreshed_at")),
+                "stale_since": stale_since,
+                "stale_seconds": _age(stale_since, now),
+            }
+        )
+    return status
+
+
+def refresh_due(conn, now=None):
+    """Refresh stale views whose refresh_interval has passed; returns their names.
+
+    Used by run_maintenance; commits nothing itself.
+    """
+    now = now or datetime.now()
+    refreshed = []
+    for view in materialized_view_status(conn, now):
+        if view["mode"] != "refresh" or not view["stale_since"]:
+            continue
+        if view["refresh_interval"] is None:
+            continue  # refreshed on demand only
+        if _age(view["refreshed_at"], now) < view["refresh_interval"]:
+            continue
+        refresh_materialized_view(conn, view["name"])
+        refreshed.append(view["name"])
+    return refreshed
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Schema migrations for SQLite Database Manager
+Applies numbered migration files (0001_add_prices.sql, 0002_rebuild_orders.py,
+...) in order, one transaction per file, and records the schema version in
+_database_metadata; the same migrations can be run across every database in
+data/ in parallel
+"""
+
+import argparse
+import importlib.util
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from everything_db import record_write, split_sql_statements
+
+MIGRATIONS_DIR = "migrations"
+VERSION_KEY = "schema_version"
+
+
+def load_migrations(migrations_dir=MIGRATIONS_DIR):
+    """Migration files sorted by their numeric prefix.
+
+    ``.sql`` files are run statement by statement; ``.py`` files must define
+    ``upgrade(conn)`` and are given the migration's open connection.
+    """
+    if not os.path.isdir(migrations_dir):
+        raise ValueError(f"Migrations directory '{migrations_dir}' not found")
+
+    migrations = {}
+    for name in os.listdir(migrations_dir):
+        prefix = name.split("_", 1)[0]
+        if not prefix.isdigit() or not name.endswith((".sql", ".py")):
+            continue
+        version = int(prefix)
+        if version in migrations:
+            raise ValueError(
+                f"Duplicate migration version {version}: "
+                f"{migrations[version]['name']} and {name}"
+            )
+        migrations[version] = {
+            "version": version,
+            "name": name,
+            "path": os.path.join(migrations_dir, name),
+        }
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def get_schema_version(conn):
+    """Schema version recorded in _database_metadata (0 if never migrated)"""
+    try:
+        row = conn.execute(
+            "SELECT value FROM _database_metadata WHERE key = ?", (VERSION_KEY,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return int(row[0]) if row else 0
+
+
+def _set_schema_version(conn, migration):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS _database_metadata (key TEXT PRIMARY KEY, value TEXT)"
+    )
+    now = datetime.now().isoformat()
+    for key, value in (
+        (VERSION_KEY, migration["version"]),
+        ("last_migration", migration["name"]),
+        ("last_modified", now),
+    ):
+        conn.execute(
+            "INSERT OR REPLACE INTO _database_metadata (key, value) VALUES (?, ?)",
+            (key, str(value)),
+        )
+
+
+# The event a CREATE TRIGGER statement fires on
+_TRIGGER_EVENT = re.compile(
+    r"CREATE\s+(?:TEMP(?:ORARY)?\s+)?TRIGGER\s+(?:IF\s+NOT\s+EXISTS\s+)?\S+\s+"
+    r"(?:BEFORE\s+|AFTER\s+|INSTEAD\s+OF\s+)?(INSERT|UPDATE|DELETE)\b",
+    re.IGNORECASE,
+)
+
+
+def _check_trigger(cursor, name, table_name, sql):
+    """Compile a statement that fires the trigger; raises if its body is broken.
+
+    CREATE TRIGGER doesn't resolve NEW./OLD. columns, but preparing a
+    statement codes every trigger it fires, and EXPLAIN prepares without
+    running anything. The trigger's name goes in a comment so each check is
+    prepared afresh: a cached EXPLAIN isn't re-prepared after schema changes.
+    """
+    match = _TRIGGER_EVENT.match(sql.strip())
+    event = match.group(1).upper() if match else "INSERT"
+    if event == "INSERT":
+        statement = f"INSERT INTO {table_name} DEFAULT VALUES"
+    elif event == "DELETE":
+        statement = f"DELETE FROM {table_name}"
+    else:
+        names = [row[1] for row in cursor.execute(f"PRAGMA table_info({table_name})")]
+        sets = ", ".join(f"{column} = {column}" for column in names)
+        statement = f"UPDATE {table_name} SET {sets}"
+    cursor.execute(f"EXPLAIN {statement} /* {name} */")
+
+
+def rebuild_table(conn, table_name, columns, column_map=None):
+    """Rebuild a table for changes ALTER TABLE can't make.
+
+    Follows SQLite's create/copy/swap procedure: create the new definition
+    under a temporary name, copy every row across with a single
+    ``INSERT ... SELECT``, drop the old table, rename the new one into place
+    and recreate its indexes and triggers. Views and other tables' triggers
+    are dropped for the swap and recreated with them, since ALTER TABLE
+    RENAME refuses to run while any of them refer to a missing table.
+    Columns keep their values when the name exists in both definitions;
+    ``column_map`` maps new column names to SQL expressions over the old
+    table (renames, casts, defaults).
+
+    Change-data-capture triggers (see everything_cdc) are regenerated for
+    the new columns. Other indexes, triggers and views that refer to
+    columns the new definition no longer has can't be recreated; they are
+    dropped and listed in the result so the migration can define
+    replacements.
+
+    Must run inside a transaction with foreign key enforcement off (the
+    SQLite default, and what migrate_database does). Returns
+    ``{"rows": rows copied, "dropped": [index/trigger/view names]}``.
+    """
+    column_map = column_map or {}
+    cursor = conn.cursor()
+    old_columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table_name})")]
+    if not old_columns:
+        raise ValueError(f"Table '{table_name}' does not exist")
+
+    # Indexes and triggers go away with DROP TABLE; auto-indexes have no SQL.
+    # Views and other tables' triggers stay, but the RENAME below re-checks
+    # the whole schema and fails on any that refer to the dropped table, so
+    # they are dropped too and everything is recreated in its original order
+    dependents = list(
+        cursor.execute(
+            "SELECT type, name, tbl_name, sql FROM sqlite_master "
+            "WHERE sql IS NOT NULL AND ("
+            "(tbl_name = ? AND type IN ('index', 'trigger')) "
+            "OR type = 'view' OR (type = 'trigger' AND tbl_name != ?)"
+            ") ORDER BY rowid",
+            (table_name, table_name),
+        )
+    )
+
+    temp_name = f"_rebuild_{table_name}"
+    cursor.execute(f"DROP TABLE IF EXISTS {temp_name}")
+    cursor.execute(f"CREATE TABLE {temp_name} ({columns})")
+    new_columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({temp_name})")]
+
+    unknown = [name for name in column_map if name not in new_columns]
+    if unknown:
+        raise ValueError(f"column_map names unknown columns: {', '.join(unknown)}")
+
+    targets = []
+    sources = []
+    for name in new_columns:
+        if name in column_map:
+            targets.append(name)
+            sources.append(column_map[name])
+        elif name in old_columns:
+            targets.append(name)
+            sources.append(name)
+        # Anything else is new and takes its DEFAULT
+
+    copied = 0
+    if targets:
+        cursor.execute(
+            f"INSERT INTO {temp_name} ({', '.join(targets)}) "
+            f"SELECT {', '.join(sources)} FROM {table_name}"
+        )
+        copied = cursor.rowcount
+    for kind, name, _, _ in reversed(dependents):
+        if kind in ("view", "trigger"):
+            cursor.execute(f"DROP {kind.upper()} IF EXISTS {name}")
+    cursor.execute(f"DROP TABLE {table_name}")
+    cursor.execute(f"ALTER TABLE {temp_name} RENAME TO {table_name}")
+    from everything_cdc import _trigger_names as cdc_trigger_names
+    from everything_cdc import _trigger_sql as cdc_trigger_sql
+
+    cdc_triggers = set(cdc_trigger_names(table_name))
+    dropped = []
+    for kind, name, owner, sql in dependents:
+        if name in cdc_triggers:
+            continue  # regenerated below
+        try:
+            cursor.execute(sql)
+            # Neither CREATE VIEW nor CREATE TRIGGER resolves columns;
+            # compiling a statement that uses them does. Earlier dependents
+            # already passed, so a failure is this one's.
+            if kind == "view":
+                cursor.execute(f"SELECT * FROM {name} LIMIT 0")
+            elif kind == "trigger":
+                _check_trigger(cursor, name, owner, sql)
+        except sqlite3.OperationalError:
+            if kind in ("view", "trigger"):
+                cursor.execute(f"DROP {kind.upper()} IF EXISTS {name}")
+            dropped.append(name)
+    if any(name in cdc_triggers for _, name, _, _ in dependents):
+        info = cursor.execute(f"PRAGMA table_info({table_name})").fetchall()
+        for sql in cdc_trigger_sql(table_name, info):
+            cursor.execute(sql)
+    return {"rows": copied, "dropped": dropped}
+
+
+def _run_python_migration(conn, migration):
+    spec = importlib.util.spec_from_file_location(
+        f"migration_{migration['version']}", migration["path"]
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not hasattr(module, "upgrade"):
+        raise ValueError(f"{migration['name']} does not define upgrade(conn)")
+    module.upgrade(conn)
+
+
+def _run_sql_migration(conn, migration):
+    with open(migration["path"]) as f:
+        script = f.read()
+    for sql in split_sql_statements(script):
+        conn.execute(sql)
+
+
+def _apply(conn, migration):
+    """Apply one migration in its own IMMEDIATE transaction"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if migration["name"].endswith(".py"):
+            _run_python_migration(conn, migration)
+        else:
+            _run_sql_migration(conn, migration)
+        # Rebuilds run with enforcement off, so verify references before committing
+        violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+        if violations:
+            raise sqlite3.IntegrityError(
+                f"{len(violations)} foreign key violation(s), first in table "
+                f"'{violations[0][0]}'"
+            )
+        _set_schema_version(conn, migration)
+        conn.execute("COMMIT")
+    except BaseException as e:
+        conn.execute("ROLLBACK")
+        if isinstance(e, sqlite3.Error):
+            raise type(e)(f"Migration {migration['name']} failed: {e}") from e
+        raise
+
+
+def migrate_database(db_path, migrations_dir=MIGRATIONS_DIR, target=None, migrations=None):
+    """Apply pending migrations to one database file, oldest first.
+
+    Each migration commits on its own together with its version bump, so a
+    failure leaves the database at the last successful version.
+    """
+    if migrations is None:
+        migrations = load_migrations(migrations_dir)
+    started = time.perf_counter()
+
+    # Autocommit mode: BEGIN/COMMIT are issued per migration by _apply
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    # Can't be changed inside a transaction, and table rebuilds need it off
+    conn.execute("PRAGMA foreign_keys = OFF")
+    report = {"path": db_path, "applied": []}
+    try:
+        current = report["from_version"] = get_schema_version(conn)
+        for migration in migrations:
+            if migration["version"] <= current:
+                continue
+            if target is not None and migration["version"] > target:
+                break
+            migration_started = time.perf_counter()
+            _apply(conn, migration)
+            current = migration["version"]
+            report["applied"].append(
+                {
+                    "version": migration["version"],
+                    "name": migration["name"],
+                    "seconds": time.perf_counter() - migration_started,
+                }
+            )
+    finally:
+        report["to_version"] = get_schema_version(conn)
+        conn.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
+        conn.close()
+
+    if report["applied"]:
+        record_write(db_path, len(report["applied"]))
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+def migration_status(db_path, migrations_dir=MIGRATIONS_DIR):
+    """Current schema version and the migrations not yet applied"""
+    conn = sqlite3.connect(db_path)
+    current = get_schema_version(conn)
+    conn.close()
+    return {
+        "path": db_path,
+        "version": current,
+        "pending": [
+            m["name"] for m in load_migrations(migrations_dir) if m["version"] > current
+        ],
+    }
+
+
+def migrate_all_databases(
+    data_dir="data", migrations_dir=MIGRATIONS_DIR, target=None, max_workers=4
+):
+    """Apply the same migrations to every database in data_dir in parallel.
+
+    A failure in one database is reported in its entry and doesn't stop the
+    others.
+    """
+    migrations = load_migrations(migrations_dir)
+    paths = [
+        os.path.join(data_dir, name)
+        for name in sorted(os.listdir(data_dir))
+        if name.endswith(".db")
+    ]
+
+    def _migrate(path):
+        try:
+            report = migrate_database(path, target=target, migrations=migrations)
+            report["error"] = None
+        except Exception as e:
+            report = {"path": path, "applied": [], "error": str(e)}
+            try:
+                report.update(migration_status(path, migrations_dir))
+            except sqlite3.Error:
+                pass
+        return report
+
+    # Each file has its own lock and sqlite3 releases the GIL, so threads overlap
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(_migrate, paths))
+
+
+def _print_report(report):
+    if report.get("error"):
+        print(f"✗ {report['path']}: {report['error']}")
+        return
+    if not report["applied"]:
+        print(f"= {report['path']}: up to date at version {report['to_version']}")
+        return
+    print(
+        f"✓ {report['path']}: version {report['from_version']} -> "
+        f"{report['to_version']} in {report['seconds']:.2f}s"
+    )
+    for migration in report["applied"]:
+        print(f"    {migration['name']} ({migration['seconds'] * 1000:.1f} ms)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply schema migrations to databases in data/")
+    parser.add_argument("--dir", default=MIGRATIONS_DIR, help="Migrations directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    apply_parser = subparsers.add_parser("apply", help="Apply pending migrations")
+    apply_parser.add_argument("names", nargs="*", help="Database names (default: all)")
+    apply_parser.add_argument("--target", type=int, help="Stop at this version")
+    apply_parser.add_argument("--workers", type=int, default=4)
+
+    status_parser = subparsers.add_parser("status", help="Show versions and pending migrations")
+    status_parser.add_argument("names", nargs="*", help="Database names (default: all)")
+
+    args = parser.parse_args(argv)
+    from everything_db import SQLiteDatabase
+
+    if args.command == "apply":
+        if args.names:
+            reports = []
+            for name in args.names:
+                try:
+                    reports.append(SQLiteDatabase(name).migrate(args.dir, args.target))
+                except (ValueError, sqlite3.Error) as e:
+                    reports.append({"path": name, "error": str(e)})
+        else:
+            reports = migrate_all_databases(
+                migrations_dir=args.dir, target=args.target, max_workers=args.workers
+            )
+        for report in reports:
+            _print_report(report)
+        return 1 if any(report.get("error") for report in reports) else 0
+
+    names = args.names or [
+        info["name"] for info in SQLiteDatabase("temp").list_all_databases()
+    ]
+    for name in names:
+        status = SQLiteDatabase(name).migration_status(args.dir)
+        pending = ", ".join(status["pending"]) or "none"
+        print(f"{name}: version {status['version']}, pending: {pending}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
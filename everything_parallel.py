@@ -0,0 +1,235 @@
+"""
+Parallel scans and aggregates for SQLite Database Manager
+SQLite runs each statement on a single core, so a full-table aggregate leaves
+the rest of the machine idle. Here a table is split into rowid ranges, each
+range is scanned/filtered/aggregated by its own read-only connection in a
+process pool, and the partial results are merged: sum, count, total, min and
+max combine directly, avg is rebuilt from per-range sums and counts, and
+group-by results are merged per group
+"""
+
+import os
+import sqlite3
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+
+from everything_db import AGGREGATE_FUNCTIONS, READ_ONLY_MMAP_SIZE
+
+# Below this many rowids a pool costs more to start than it saves
+MIN_PARALLEL_ROWS = 100_000
+
+# Ranges per worker: more, smaller ranges even out rowid gaps and skewed filters
+RANGES_PER_WORKER = 4
+
+# Names the range bounds are bound to when ``params`` are named
+RANGE_PARAMS = ("_range_lo", "_range_hi")
+
+# Aggregates whose partial results combine exactly; avg is rebuilt from sum/count
+_MERGE = {
+    "count": lambda values: sum(v for v in values if v is not None),
+    "sum": lambda values: sum(v for v in values if v is not None)
+    if any(v is not None for v in values)
+    else None,
+    "total": lambda values: float(sum(values)),
+    "min": lambda values: min((v for v in values if v is not None), default=None),
+    "max": lambda values: max((v for v in values if v is not None), default=None),
+}
+
+
+def plan_partial_aggregates(aggregates, distinct_column=None):
+    """Rewrite aggregates as partial aggregates that merge exactly.
+
+    Returns ``(plan, partials)``: ``partials`` are aggregate specs to run on
+    each part, ``plan`` lists ``(alias, function, [partial aliases])`` for
+    merge_partial_aggregates. count_distinct only merges on
+    ``distinct_column``, a column whose values never span parts (a shard
+    key); otherwise it is rejected.
+    """
+    plan = []
+    partials = []
+    for spec in aggregates:
+        if len(spec) not in (2, 3):
+            raise ValueError(f"Invalid aggregate specification: {spec!r}")
+        func, column = spec[0].lower(), spec[1]
+        alias = spec[2] if len(spec) == 3 else None
+        if func not in AGGREGATE_FUNCTIONS:
+            raise ValueError(
+                f"Unsupported aggregate '{func}'. "
+                f"Choose from: {', '.join(AGGREGATE_FUNCTIONS)}"
+            )
+        if alias is None:
+            safe = "".join(ch if ch.isalnum() else "_" for ch in column).strip("_")
+            alias = func if column == "*" else f"{func}_{safe}"
+        if func == "avg":
+            plan.append((alias, func, [f"{alias}__sum", f"{alias}__count"]))
+            partials.append(("sum", column, f"{alias}__sum"))
+            partials.append(("count", column, f"{alias}__count"))
+        elif func == "count_distinct":
+            if distinct_column is None or column != distinct_column:
+                raise ValueError(
+                    f"count_distinct of '{column}' can't be merged from partial results"
+                )
+            plan.append((alias, "count", [alias]))
+            partials.append((func, column, alias))
+        else:
+            plan.append((alias, func, [alias]))
+            partials.append((func, column, alias))
+    return plan, partials
+
+
+def merge_partial_aggregates(results, group_by, plan):
+    """Merge lists of partial aggregate dicts into one row per group, sorted by group"""
+    groups = {}
+    for part_rows in results:
+        for row in part_rows:
+            group = tuple(row[column] for column in group_by)
+            groups.setdefault(group, []).append(row)
+
+    merged = []
+    ordered = sorted(groups.items(), key=lambda item: [(v is not None, v) for v in item[0]])
+    for group, rows in ordered:
+        result = dict(zip(group_by, group))
+        for alias, func, parts in plan:
+            if func == "avg":
+                total = _MERGE["sum"]([row[parts[0]] for row in rows])
+                count = _MERGE["count"]([row[parts[1]] for row in rows])
+                result[alias] = total / count if count else None
+            else:
+                result[alias] = _MERGE[func]([row[parts[0]] for row in rows])
+        merged.append(result)
+    if not merged and not group_by:
+        # Nothing matched: same shape as a plain aggregate over no rows
+        merged.append({alias: 0 if func == "count" else None for alias, func, _ in plan})
+    return merged
+
+
+def _open(db_path):
+    """A worker's read-only connection, with compressed-column functions"""
+    from everything_compress import register_functions
+
+    uri = "file:" + os.path.abspath(db_path).replace("?", "%3f") + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True)
+    conn.execute(f"PRAGMA mmap_size = {READ_ONLY_MMAP_SIZE}")
+    register_functions(conn)
+    return conn
+
+
+def _range_predicate(params):
+    """``rowid >= lo AND rowid < hi``, with placeholders of the same style as params"""
+    if isinstance(params, Mapping):
+        clash = [name for name in RANGE_PARAMS if name in params]
+        if clash:
+            raise ValueError(f"Parameter name(s) reserved for the rowid range: {clash}")
+        return f"rowid >= :{RANGE_PARAMS[0]} AND rowid < :{RANGE_PARAMS[1]}"
+    return "rowid >= ? AND rowid < ?"
+
+
+def _bind(params, lo, hi):
+    if isinstance(params, Mapping):
+        return {**params, RANGE_PARAMS[0]: lo, RANGE_PARAMS[1]: hi}
+    return [*params, lo, hi]
+
+
+def _run_range(job):
+    """Pool entry point: run one query over rowids lo <= rowid < hi"""
+    db_path, sql, params, lo, hi = job
+    conn = _open(db_path)
+    try:
+        return conn.execute(sql, _bind(params, lo, hi)).fetchall()
+    finally:
+        conn.close()
+
+
+def rowid_ranges(db, table_name, ranges):
+    """Split the table's rowids into at most ``ranges`` half-open (lo, hi) ranges.
+
+    Ranges are equal in rowid span, not row count, which is the same thing
+    for tables that are mostly appended to.
+    """
+    conn = db._connect()
+    try:
+        # Separate subqueries: SQLite only optimises a lone MIN or MAX to one seek
+        lo, hi = conn.execute(
+            f"SELECT (SELECT MIN(rowid) FROM {table_name}), "
+            f"(SELECT MAX(rowid) FROM {table_name})"
+        ).fetchone()
+    except sqlite3.OperationalError as e:
+        if "rowid" in str(e):
+            raise ValueError(
+                f"'{table_name}' has no rowid (a view or WITHOUT ROWID table)"
+            ) from e
+        raise
+    finally:
+        db._release(conn)
+    if lo is None:
+        return []
+    hi += 1
+    ranges = max(1, min(ranges, hi - lo))
+    step = -(-(hi - lo) // ranges)  # ceiling division
+    return [(start, min(start + step, hi)) for start in range(lo, hi, step)]
+
+
+def _map_ranges(db, table_name, sql, params, workers, ranges):
+    """Run ``sql`` (ending in the rowid range predicate) over every range, in order"""
+    workers = workers or os.cpu_count() or 1
+    bounds = rowid_ranges(db, table_name, ranges or workers * RANGES_PER_WORKER)
+    if not bounds:
+        return
+    params = dict(params) if isinstance(params, Mapping) else list(params)
+    lo, hi = bounds[0][0], bounds[-1][1]
+    if workers == 1 or len(bounds) == 1 or hi - lo < MIN_PARALLEL_ROWS:
+        # Without a pool one statement over the whole range is cheapest
+        yield _run_range((db.db_name, sql, params, lo, hi))
+        return
+    jobs = [(db.db_name, sql, params, lo, hi) for lo, hi in bounds]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        yield from pool.map(_run_range, jobs)
+
+
+def parallel_aggregate(
+    db,
+    table_name,
+    aggregates,
+    group_by=None,
+    condition="1=1",
+    params=(),
+    workers=None,
+    ranges=None,
+):
+    """SQLiteDatabase.aggregate computed over rowid ranges in a process pool.
+
+    ``workers`` defaults to the CPU count and ``ranges`` to four per worker.
+    Ranges are read by separate connections, so rows written during the
+    call may be counted in some ranges and not others. count_distinct is
+    not supported, since distinct values can repeat across ranges.
+    ``params`` bind ``condition``'s placeholders, positional or named.
+    """
+    if isinstance(group_by, str):
+        group_by = [group_by]
+    group_by = list(group_by or [])
+    plan, partials = plan_partial_aggregates(aggregates)
+    sql, aliases = db.build_aggregate_query(
+        table_name, partials, group_by, f"({condition}) AND {_range_predicate(params)}"
+    )
+    results = (
+        [dict(zip(aliases, row)) for row in rows]
+        for rows in _map_ranges(db, table_name, sql, params, workers, ranges)
+    )
+    return merge_partial_aggregates(results, group_by, plan)
+
+
+def parallel_scan(
+    db, table_name, columns="*", condition="1=1", params=(), workers=None, ranges=None
+):
+    """Yield the rows matching ``condition`` in rowid order, filtered in parallel.
+
+    Worth it when the filter is expensive or selective: every range is
+    scanned and filtered on its own core and only matching rows are sent
+    back. Compressed columns are returned as stored; select decompress(col).
+    """
+    sql = (
+        f"SELECT {columns} FROM {table_name} "
+        f"WHERE ({condition}) AND {_range_predicate(params)} ORDER BY rowid"
+    )
+    for rows in _map_ranges(db, table_name, sql, params, workers, ranges):
+        yield from rows
@@ -0,0 +1,378 @@
+"""
+Time-partitioned tables for SQLite Database Manager
+Event and log tables are split into one child table per day, week or month
+(events_p20240501, ...). Writes are routed to the child for their timestamp,
+creating it on first use; a UNION ALL view named after the logical table
+presents all children as one; range queries only read the children whose
+period overlaps the range; and retention drops (or archives) whole children,
+which costs the same however many rows they hold
+"""
+
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+
+PARTITIONED_TABLES = "_partitioned_tables"
+PARTITIONS = "_partitions"
+INTERVALS = ("day", "week", "month")
+
+
+def _ensure_tables(conn):
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {PARTITIONED_TABLES} (
+            name TEXT PRIMARY KEY,
+            time_column TEXT NOT NULL,
+            interval TEXT NOT NULL,
+            columns TEXT NOT NULL,
+            retention INTEGER
+        )
+    """
+    )
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {PARTITIONS} (
+            tbl TEXT NOT NULL,
+            partition TEXT NOT NULL UNIQUE,
+            start TEXT NOT NULL,
+            end TEXT NOT NULL,
+            PRIMARY KEY (tbl, start)
+        )
+    """
+    )
+
+
+def _to_date(value):
+    """Date of a timestamp: datetime/date objects or ISO-8601 text"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.strip()).date()
+        except ValueError:
+            pass
+    raise ValueError(
+        f"Partition timestamps must be ISO-8601 dates/datetimes, got {value!r}"
+    )
+
+
+def _to_text(value):
+    """How a timestamp is stored: ISO text, as CURRENT_TIMESTAMP writes it"""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def period_bounds(value, interval):
+    """(start, end) dates of the period containing ``value``"""
+    day = _to_date(value)
+    if interval == "day":
+        return day, day + timedelta(days=1)
+    if interval == "week":
+        start = day - timedelta(days=day.weekday())  # weeks start on Monday
+        return start, start + timedelta(days=7)
+    start = day.replace(day=1)
+    if start.month == 12:
+        return start, start.replace(year=start.year + 1, month=1)
+    return start, start.replace(month=start.month + 1)
+
+
+def partition_name(table_name, start, interval):
+    suffix = start.strftime("%Y%m" if interval == "month" else "%Y%m%d")
+    return f"{table_name}_p{suffix}"
+
+
+def _config(conn, table_name):
+    try:
+        row = conn.execute(
+            f"SELECT time_column, interval, columns, retention "
+            f"FROM {PARTITIONED_TABLES} WHERE name = ?",
+            (table_name,),
+        ).fetchone()
+    except sqlite3.OperationalError:
+        row = None  # no partitioned table has been created yet
+    if row is None:
+        raise ValueError(f"'{table_name}' is not a partitioned table")
+    return dict(zip(("time_column", "interval", "columns", "retention"), row))
+
+
+def _partitions(conn, table_name):
+    """[(partition, start, end)] oldest first"""
+    return conn.execute(
+        f"SELECT partition, start, end FROM {PARTITIONS} WHERE tbl = ? ORDER BY start",
+        (table_name,),
+    ).fetchall()
+
+
+def _template(table_name):
+    # Holds the schema so the view has columns before any partition exists
+    return f"_{table_name}_template"
+
+
+def _rebuild_view(conn, table_name):
+    parts = [name for name, _, _ in _partitions(conn, table_name)]
+    sources = parts or [_template(table_name)]
+    union = " UNION ALL ".join(f"SELECT * FROM {name}" for name in sources)
+    conn.execute(f"DROP VIEW IF EXISTS {table_name}")
+    conn.execute(f"CREATE VIEW {table_name} AS {union}")
+
+
+def create_partitioned_table(
+    db, table_name, columns, time_column, interval="day", retention=None
+):
+    """Set up a partitioned table; ``columns`` is a definition string.
+
+    ``retention`` is the number of most recent partitions apply_retention()
+    keeps by default (None keeps everything).
+    """
+    if interval not in INTERVALS:
+        raise ValueError(
+            f"Invalid interval '{interval}'. Choose from: {', '.join(INTERVALS)}"
+        )
+    is_valid, message = db.validate_table_name(table_name)
+    if not is_valid:
+        raise ValueError(f"Invalid table name: {message}")
+
+    with db.transaction("IMMEDIATE"):
+        conn = db._connect()
+        _ensure_tables(conn)
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (table_name,)
+        ).fetchone()
+        if exists:
+            raise ValueError(f"Table '{table_name}' already exists")
+        conn.execute(f"CREATE TABLE {_template(table_name)} ({columns})")
+        info = conn.execute(f"PRAGMA table_info({_template(table_name)})").fetchall()
+        if time_column not in [row[1] for row in info]:
+            raise ValueError(
+                f"Time column '{time_column}' is not in the table definition"
+            )
+        conn.execute(
+            f"INSERT INTO {PARTITIONED_TABLES} "
+            "(name, time_column, interval, columns, retention) VALUES (?, ?, ?, ?, ?)",
+            (table_name, time_column, interval, columns, retention),
+        )
+        _rebuild_view(conn, table_name)
+
+
+def _ensure_partition(conn, table_name, config, start, end):
+    name = partition_name(table_name, start, config["interval"])
+    created = conn.execute(
+        f"INSERT OR IGNORE INTO {PARTITIONS} (tbl, partition, start, end) "
+        "VALUES (?, ?, ?, ?)",
+        (table_name, name, start.isoformat(), end.isoformat()),
+    ).rowcount
+    if created:
+        conn.execute(f"CREATE TABLE {name} ({config['columns']})")
+        conn.execute(
+            f"CREATE INDEX idx_{name}_{config['time_column']} "
+            f"ON {name} ({config['time_column']})"
+        )
+    return name, bool(created)
+
+
+def insert_partitioned(db, table_name, rows):
+    """Insert row dicts into the partitions for their timestamps.
+
+    Missing partitions are created (and the view extended) in the same
+    transaction as the rows; when that rolls over into a new period and the
+    table has a retention, partitions beyond it are dropped too. Rows for
+    periods already outside the retention (backfill older than the newest
+    ``retention`` partitions, counting this call's) are skipped, not
+    written. Returns ``{"rows": rows written, "expired": rows skipped}``.
+    """
+    with db.transaction("IMMEDIATE"):
+        conn = db._connect()
+        config = _config(conn, table_name)
+        time_column = config["time_column"]
+        by_period = {}
+        for row in rows:
+            if row.get(time_column) is None:
+                raise ValueError(f"Rows must include a '{time_column}' timestamp")
+            bounds = period_bounds(row[time_column], config["interval"])
+            row = dict(row, **{time_column: _to_text(row[time_column])})
+            by_period.setdefault(bounds, []).append(row)
+
+        skipped = 0
+        if config["retention"] is not None:
+            starts = {start for _, start, _ in _partitions(conn, table_name)}
+            starts.update(start.isoformat() for start, _ in by_period)
+            starts = sorted(starts)
+            kept = set(starts[max(len(starts) - config["retention"], 0) :])
+            for bounds in list(by_period):
+                if bounds[0].isoformat() not in kept:
+                    skipped += len(by_period.pop(bounds))
+
+        new_partition = False
+        written = 0
+        for (start, end), period_rows in sorted(by_period.items()):
+            name, created = _ensure_partition(conn, table_name, config, start, end)
+            new_partition = new_partition or created
+            written += db.insert_many(name, period_rows)
+        if new_partition:
+            expired = _expired(_partitions(conn, table_name), config["retention"])
+            _drop(conn, table_name, [name for name, _, _ in expired])
+    return {"rows": written, "expired": skipped}
+
+
+def build_partition_query(
+    db,
+    table_name,
+    start=None,
+    end=None,
+    condition="1=1",
+    params=(),
+    columns="*",
+    order_by=None,
+    limit=None,
+):
+    """(sql, params, partitions read) for rows with start <= time < end.
+
+    Partitions that don't overlap the range are left out of the UNION ALL
+    entirely; those entirely inside it skip the time predicate, and those at
+    the edges filter on their indexed time column. ``params`` bind the
+    placeholders in ``condition``.
+    """
+    conn = db._connect()
+    try:
+        config = _config(conn, table_name)
+        partitions = _partitions(conn, table_name)
+    finally:
+        db._release(conn)
+
+    time_column = config["time_column"]
+    low = _to_text(start) if start is not None else None
+    high = _to_text(end) if end is not None else None
+    selects, all_params, touched = [], [], []
+    for name, part_start, part_end in partitions:
+        if (high is not None and part_start >= high) or (
+            low is not None and part_end <= low
+        ):
+            continue
+        where = [f"({condition})"]
+        all_params.extend(params)
+        if low is not None and low > part_start:
+            where.append(f"{time_column} >= ?")
+            all_params.append(low)
+        if high is not None and high < part_end:
+            where.append(f"{time_column} < ?")
+            all_params.append(high)
+        selects.append(f"SELECT {columns} FROM {name} WHERE {' AND '.join(where)}")
+        touched.append(name)
+    if not selects:
+        selects.append(f"SELECT {columns} FROM {_template(table_name)} WHERE 0")
+
+    sql = " UNION ALL ".join(selects)
+    if order_by or limit is not None:
+        sql = f"SELECT * FROM ({sql})"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+    return sql, all_params, touched
+
+
+def query_partitioned(
+    db,
+    table_name,
+    start=None,
+    end=None,
+    condition="1=1",
+    params=(),
+    columns="*",
+    order_by=None,
+    limit=None,
+):
+    """Rows with start <= time < end (either bound optional) matching ``condition``"""
+    sql, all_params, _ = build_partition_query(
+        db, table_name, start, end, condition, params, columns, order_by, limit
+    )
+    return db.execute_query(sql, all_params)
+
+
+def list_partitions(db, table_name, counts=False):
+    """Partitions oldest first, as dicts; ``counts`` adds each one's row count"""
+    conn = db._connect()
+    try:
+        _config(conn, table_name)
+        result = []
+        for name, start, end in _partitions(conn, table_name):
+            entry = {"partition": name, "start": start, "end": end}
+            if counts:
+                entry["rows"] = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+            result.append(entry)
+        return result
+    finally:
+        db._release(conn)
+
+
+def _expired(partitions, keep=None, before=None):
+    if before is not None:
+        cutoff = _to_date(before).isoformat()
+        return [part for part in partitions if part[2] <= cutoff]
+    if keep is None:
+        return []
+    return partitions[: max(len(partitions) - keep, 0)]
+
+
+def _drop(conn, table_name, names):
+    for name in names:
+        conn.execute(f"DROP TABLE {name}")
+        conn.execute(f"DELETE FROM {PARTITIONS} WHERE partition = ?", (name,))
+    _rebuild_view(conn, table_name)
+
+
+def _archive(db, name, archive_dir):
+    """Copy one partition into its own database file in archive_dir"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.db")
+    if os.path.exists(path):
+        raise ValueError(f"Archive '{path}' already exists")
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS source", (db.db_name,))
+        create_sql = conn.execute(
+            "SELECT sql FROM source.sqlite_master WHERE type='table' AND name=?", (name,)
+        ).fetchone()[0]
+        conn.execute(create_sql)
+        conn.execute(f"INSERT INTO main.{name} SELECT * FROM source.{name}")
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+def apply_retention(db, table_name, keep=None, before=None, archive_dir=None):
+    """Drop old partitions: all but the newest ``keep``, or those ending by ``before``.
+
+    ``keep`` defaults to the table's configured retention. Each partition is
+    removed with DROP TABLE, so no rows are deleted one by one and no index
+    is updated. With ``archive_dir`` each partition is first copied to
+    <archive_dir>/<partition>.db. Returns the partitions removed.
+    """
+    conn = db._connect()
+    try:
+        config = _config(conn, table_name)
+        partitions = _partitions(conn, table_name)
+    finally:
+        db._release(conn)
+    if keep is None and before is None:
+        keep = config["retention"]
+    expired = [name for name, _, _ in _expired(partitions, keep, before)]
+    if not expired:
+        return []
+
+    archived = {}
+    if archive_dir:
+        # ATTACH isn't allowed inside a transaction, so copy before dropping
+        for name in expired:
+            archived[name] = _archive(db, name, archive_dir)
+
+    with db.transaction("IMMEDIATE"):
+        conn = db._connect()
+        _drop(conn, table_name, expired)
+    return [{"partition": name, "archive": archived.get(name)} for name in expired]
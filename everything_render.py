@@ -0,0 +1,250 @@
+"""
+Table rendering for SQLite Database Manager
+Formats query results as aligned columns sized from a sample of the rows and
+fitted to the terminal width, writing output in large buffered chunks instead
+of one print() per row. Rows are consumed from an iterator (a stream_query
+cursor), so nothing has to fit in memory; long results go through $PAGER (or
+less), and the pipe's backpressure means rows are only fetched and formatted
+as the user scrolls down to them
+"""
+
+import itertools
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+
+# Rows read ahead to size the columns
+SAMPLE_ROWS = 200
+
+# Cells wider than this are cut with an ellipsis
+MAX_CELL_WIDTH = 40
+MIN_CELL_WIDTH = 4
+
+# Rows formatted per write() when not paging
+WRITE_CHUNK_ROWS = 2000
+
+SEPARATOR = " | "
+
+# less: quit if one screen, pass colours, chop long lines (scroll sideways)
+# and don't clear the screen on exit
+DEFAULT_LESS = "FRSX"
+
+
+def format_value(value):
+    """One-line text for a cell"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    text = str(value)
+    if "\n" in text or "\t" in text or "\r" in text:
+        text = text.replace("\r", "\\r").replace("\n", "\\n").replace("\t", "\\t")
+    return text
+
+
+def fit_widths(widths, total_width, separator=SEPARATOR):
+    """Cap column widths so a line fits in ``total_width``, narrowing the widest first"""
+    if total_width is None:
+        return list(widths)
+    available = total_width - len(separator) * (len(widths) - 1)
+    if sum(widths) <= available:
+        return list(widths)
+    # The largest cap that fits; columns already narrower keep their width
+    low, high = MIN_CELL_WIDTH, max(widths)
+    while low < high:
+        cap = (low + high + 1) // 2
+        if sum(min(width, cap) for width in widths) <= available:
+            low = cap
+        else:
+            high = cap - 1
+    return [min(width, low) for width in widths]
+
+
+class TableRenderer:
+    """Column layout computed once from a sample, then applied to every row"""
+
+    def __init__(self, columns, sample, width=None, max_cell=MAX_CELL_WIDTH):
+        self.columns = list(columns)
+        # Rows wider than the header get unnamed columns rather than failing
+        extra = max(map(len, sample), default=0) - len(self.columns)
+        self.columns += [""] * extra
+        widths = [min(len(name), max_cell) for name in self.columns]
+        numeric = [True] * len(self.columns)
+        for row in sample:
+            for i, value in enumerate(row):
+                widths[i] = max(widths[i], min(len(format_value(value)), max_cell))
+                if value is not None and not isinstance(value, (int, float)):
+                    numeric[i] = False
+        self.widths = fit_widths(widths, width)
+        # Numbers line up on the right, everything else on the left
+        self.template = SEPARATOR.join(
+            f"{{:{'>' if is_numeric else '<'}{width}}}"
+            for width, is_numeric in zip(self.widths, numeric)
+        )
+
+    def _cells(self, values):
+        cells = []
+        # Short rows are padded; cells past the last column are dropped
+        values = itertools.chain(values, itertools.repeat(""))
+        for value, width in zip(values, self.widths):
+            text = format_value(value)
+            cells.append(text if len(text) <= width else text[: width - 1] + "…")
+        return cells
+
+    def header(self):
+        """Column names and the rule under them"""
+        names = SEPARATOR.join(
+            f"{cell:<{width}}" for cell, width in zip(self._cells(self.columns), self.widths)
+        )
+        rule = "-+-".join("-" * width for width in self.widths)
+        return names.rstrip() + "\n" + rule + "\n"
+
+    def format_row(self, row):
+        return self.template.format(*self._cells(row)).rstrip() + "\n"
+
+
+def _terminal_size(out):
+    if out.isatty():
+        return shutil.get_terminal_size()
+    return None
+
+
+def _prepare(columns, rows, width, sample_size):
+    """(renderer, rows including the sampled ones), or (None, None) for no rows"""
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, sample_size))
+    if not sample:
+        return None, None
+    renderer = TableRenderer(columns, sample, width)
+    return renderer, itertools.chain(sample, rows)
+
+
+def render(columns, rows, out=None, width=None, sample_size=SAMPLE_ROWS, title=None):
+    """Write ``rows`` as a table to ``out`` (stdout) in buffered chunks; returns the count.
+
+    ``width`` defaults to the terminal's when ``out`` is one, and is
+    unlimited otherwise, so redirected output keeps whole cells up to
+    MAX_CELL_WIDTH. Nothing, not even ``title``, is written for no rows.
+    """
+    out = out or sys.stdout
+    if width is None:
+        size = _terminal_size(out)
+        width = size.columns if size else None
+    renderer, rows = _prepare(columns, rows, width, sample_size)
+    if renderer is None:
+        return 0
+    out.write((title + "\n" if title else "") + renderer.header())
+    count = 0
+    format_row = renderer.format_row
+    while True:
+        chunk = [format_row(row) for row in itertools.islice(rows, WRITE_CHUNK_ROWS)]
+        if not chunk:
+            break
+        out.write("".join(chunk))
+        count += len(chunk)
+    out.flush()
+    return count
+
+
+def pager_command():
+    """$PAGER, else less if installed; None means page without one"""
+    pager = os.environ.get("PAGER")
+    if pager is not None:
+        return pager if pager.strip() and pager.strip() != "cat" else None
+    return "less" if shutil.which("less") else None
+
+
+def _page_external(command, renderer, rows, page_rows, title):
+    env = dict(os.environ)
+    env.setdefault("LESS", DEFAULT_LESS)
+    process = subprocess.Popen(
+        shlex.split(command),
+        stdin=subprocess.PIPE,
+        env=env,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    count = 0
+    try:
+        process.stdin.write((title + "\n" if title else "") + renderer.header())
+        # A screenful per write: the pager only reads (and so we only
+        # format) what it is about to show, plus what the pipe buffers
+        while True:
+            chunk = [renderer.format_row(row) for row in itertools.islice(rows, page_rows)]
+            if not chunk:
+                break
+            process.stdin.write("".join(chunk))
+            count += len(chunk)
+        process.stdin.close()
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass  # the user quit the pager before the end
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
+    return count
+
+
+def _page_builtin(renderer, rows, page_rows, out, title):
+    """Screen-at-a-time fallback when there is no pager program"""
+    count = 0
+    out.write((title + "\n" if title else "") + renderer.header())
+    while True:
+        chunk = [renderer.format_row(row) for row in itertools.islice(rows, page_rows)]
+        if not chunk:
+            break
+        out.write("".join(chunk))
+        count += len(chunk)
+        out.flush()
+        try:
+            answer = input("-- More -- (Enter: next page, q: quit) ")
+        except (EOFError, KeyboardInterrupt):
+            break
+        if answer.strip().lower().startswith("q"):
+            break
+    return count
+
+
+def show(columns, rows, out=None, pager=True, sample_size=SAMPLE_ROWS, title=None):
+    """Display rows, through a pager when they won't fit on the screen.
+
+    Only used interactively: when ``out`` isn't a terminal this is render().
+    Returns the number of rows formatted, which is less than the result's
+    size if the user quit the pager early; ``rows`` is closed either way so
+    a stream_query cursor is released.
+    """
+    out = out or sys.stdout
+    source = rows
+    try:
+        size = _terminal_size(out)
+        if not pager or size is None:
+            return render(columns, rows, out, sample_size=sample_size, title=title)
+
+        renderer, rows = _prepare(columns, rows, size.columns, sample_size)
+        if renderer is None:
+            return 0
+        page_rows = max(size.lines - 3, 1)  # header, rule and the prompt
+        first_page = list(itertools.islice(rows, page_rows + 1))
+        if len(first_page) <= page_rows:
+            out.write(title + "\n" if title else "")
+            out.write(renderer.header() + "".join(map(renderer.format_row, first_page)))
+            out.flush()
+            return len(first_page)
+
+        rows = itertools.chain(first_page, rows)
+        command = pager_command()
+        if command:
+            try:
+                return _page_external(command, renderer, rows, page_rows, title)
+            except OSError:
+                pass  # $PAGER isn't runnable; nothing has been consumed yet
+        return _page_builtin(renderer, rows, page_rows, out, title)
+    finally:
+        close = getattr(source, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,227 @@
+"""
+Index-aware search for SQLite Database Manager
+Creates expression indexes (e.g. lower(name)) and virtual generated columns,
+and builds search queries that target them: a case-insensitive or prefix
+search on a column is rewritten to compare against an indexed lower(column)
+expression with an equality or range predicate, so SQLite can seek the index
+instead of scanning the table
+"""
+
+SEARCH_MODES = ("contains", "prefix", "exact")
+
+# SQLite's built-in lower() only folds ASCII, so match it exactly
+_ASCII_LOWER = str.maketrans(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz"
+)
+
+
+def sqlite_lower(value):
+    """Python equivalent of SQLite's lower() (ASCII-only case folding)"""
+    return value.translate(_ASCII_LOWER)
+
+
+def normalize_expression(expression):
+    """Canonical form for comparing SQL expressions: no spaces/quotes, lowercase"""
+    return "".join(
+        ch for ch in expression if not ch.isspace() and ch not in '"`[]'
+    ).lower()
+
+
+def index_name_for(table_name, expression):
+    """Default index name, e.g. idx_products_lower_name for lower(name)"""
+    slug = "".join(ch if ch.isalnum() else "_" for ch in expression.lower())
+    slug = "_".join(part for part in slug.split("_") if part)
+    return f"idx_{table_name}_{slug}"
+
+
+def _matching_paren(text, start):
+    """Index of the ')' closing the '(' at ``start``, skipping quoted text"""
+    depth = 0
+    quote = None
+    for i in range(start, len(text)):
+        ch = text[i]
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"`":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError(f"Unbalanced parentheses in: {text}")
+
+
+def _split_top_level(text):
+    """Split on commas that are not inside parentheses or quotes"""
+    parts = []
+    depth = 0
+    quote = None
+    current = []
+    for ch in text:
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"`":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(ch)
+    parts.append("".join(current).strip())
+    return parts
+
+
+def _strip_order(term):
+    """Drop a trailing COLLATE/ASC/DESC from an index key"""
+    upper = term.upper()
+    for suffix in (" ASC", " DESC"):
+        if upper.endswith(suffix):
+            term, upper = term[: -len(suffix)], upper[: -len(suffix)]
+    if " COLLATE " in upper:
+        term = term[: upper.index(" COLLATE ")]
+    return term.strip()
+
+
+def _generated_columns(conn, table_name):
+    """{column name: expression} for the table's generated columns"""
+    hidden = {
+        row[1]
+        for row in conn.execute(f"PRAGMA table_xinfo({table_name})")
+        if row[6] in (2, 3)  # 2 = VIRTUAL, 3 = STORED
+    }
+    if not hidden:
+        return {}
+    sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table_name,)
+    ).fetchone()[0]
+    start = sql.index("(")
+    columns = {}
+    for definition in _split_top_level(sql[start + 1 : _matching_paren(sql, start)]):
+        name = definition.split(None, 1)[0].strip('"`[]')
+        if name not in hidden:
+            continue
+        upper = definition.upper()
+        position = upper.find(" AS ")
+        while position != -1:
+            paren = definition.find("(", position)
+            if paren != -1 and not definition[position + 4 : paren].strip():
+                columns[name] = definition[paren + 1 : _matching_paren(definition, paren)]
+                break
+            position = upper.find(" AS ", position + 1)
+    return columns
+
+
+def indexed_expressions(conn, table_name):
+    """Map normalized expression -> SQL term an index can seek on.
+
+    Covers the leading key of every non-partial index on the table, plus
+    generated columns whose own name is such a key (so ``lower(name)`` maps
+    to an indexed ``name_lower`` column).
+    """
+    terms = {}
+    for (sql,) in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL",
+        (table_name,),
+    ):
+        upper = sql.upper()
+        start = sql.index("(", upper.index(" ON "))
+        end = _matching_paren(sql, start)
+        if " WHERE " in upper[end:]:
+            continue  # partial indexes only cover some rows
+        key = _strip_order(_split_top_level(sql[start + 1 : end])[0])
+        terms.setdefault(normalize_expression(key), key)
+
+    for column, expression in _generated_columns(conn, table_name).items():
+        if normalize_expression(column) in terms:
+            terms.setdefault(normalize_expression(expression), column)
+    return terms
+
+
+def _like_pattern(value, mode):
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if mode == "prefix" else f"%{escaped}%"
+
+
+def _prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with ``prefix``"""
+    while prefix and ord(prefix[-1]) == 0x10FFFF:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def build_search_query(
+    conn,
+    table_name,
+    column,
+    value,
+    mode="contains",
+    case_sensitive=False,
+    limit=None,
+    columns="*",
+):
+    """Build ``(sql, params)`` for a search, rewritten to use an index if one fits.
+
+    Case-insensitive searches look for an index on ``lower(column)`` (an
+    expression index or an indexed generated column) and compare the
+    lowered search value against it: ``exact`` becomes an equality and
+    ``prefix`` a half-open range, both index seeks. ``contains`` can never
+    seek and stays a scan.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(
+            f"Invalid search mode '{mode}'. Choose from: {', '.join(SEARCH_MODES)}"
+        )
+    value = str(value)
+
+    if case_sensitive:
+        term = column
+        needle = value
+    else:
+        needle = sqlite_lower(value)
+        term = indexed_expressions(conn, table_name).get(
+            normalize_expression(f"lower({column})")
+        )
+
+    if term is None:
+        # No usable index: LIKE already ignores ASCII case
+        if mode == "exact":
+            where, params = f"lower({column}) = ?", [needle]
+        else:
+            where, params = f"{column} LIKE ? ESCAPE '\\'", [_like_pattern(value, mode)]
+    elif mode == "exact":
+        where, params = f"{term} = ?", [needle]
+    elif mode == "prefix":
+        upper = _prefix_upper_bound(needle)
+        if not needle:
+            where, params = "1=1", []
+        elif upper is None:
+            where, params = f"{term} >= ?", [needle]
+        else:
+            where, params = f"{term} >= ? AND {term} < ?", [needle, upper]
+    elif case_sensitive:
+        where, params = f"instr({term}, ?) > 0", [needle]
+    else:
+        where, params = f"{term} LIKE ? ESCAPE '\\'", [_like_pattern(needle, mode)]
+
+    sql = f"SELECT {columns} FROM {table_name} WHERE {where}"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return sql, params
+
+
+def uses_index(conn, sql, params=()):
+    """True if SQLite's plan for the query seeks an index rather than scanning"""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return any(
+        row[3].startswith("SEARCH") and "INDEX" in row[3] for row in plan
+    )
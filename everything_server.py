@@ -0,0 +1,777 @@
+#!/usr/bin/env python3
+"""
+Local database server for SQLite Database Manager
+One long-lived process owns the connections to every database in data/ and
+serves the SQLiteDatabase API over a Unix domain socket (newline-delimited
+JSON) and localhost HTTP, so short-lived scripts and other languages skip
+the connect/open cost on every call. Reads run concurrently on pooled
+per-thread connections; writes to each database are serialised by a lock
+instead of contending for SQLite's file lock. DatabaseClient is a thin
+client with the same method names as SQLiteDatabase.
+"""
+
+import argparse
+import hmac
+import inspect
+import json
+import os
+import re
+import secrets
+import socket
+import socketserver
+import sqlite3
+import sys
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from everything_db import ReadOnlyDatabaseError, SQLiteDatabase
+
+DEFAULT_SOCKET_PATH = os.path.join("data", "everything.sock")
+DEFAULT_HTTP_PORT = 8765
+
+# Items per streamed message: big enough to amortise the JSON framing
+STREAM_BATCH = 500
+
+# The query and CRUD part of the API. Anything that reads or writes files
+# by path (backup, snapshots, migrations, BLOB files, sync_to) is left out,
+# as are in-process helpers such as transaction() and ingest_queue()
+ALLOWED_METHODS = frozenset(
+    {
+        "ack_changes",
+        "add_generated_column",
+        "aggregate",
+        "apply_retention",
+        "build_aggregate_query",
+        "build_search_query",
+        "cdc_tables",
+        "check_health",
+        "coerce_rows",
+        "compression_report",
+        "create_expression_index",
+        "create_materialized_view",
+        "create_partitioned_table",
+        "create_sqlite_db",
+        "create_sqlite_table",
+        "create_table_safe",
+        "delete_from_sqlite_table",
+        "delete_many",
+        "disable_cdc",
+        "disable_compression",
+        "drop_materialized_view",
+        "enable_cdc",
+        "enable_compression",
+        "execute_query",
+        "execute_script",
+        "get_blob_size",
+        "get_column_info",
+        "get_column_stats",
+        "get_consumers",
+        "get_metadata",
+        "get_schema_version",
+        "get_table_data",
+        "get_table_schema",
+        "get_tables",
+        "insert_data",
+        "insert_into_sqlite_table",
+        "insert_many",
+        "insert_partitioned",
+        "iter_blob_chunks",
+        "list_all_databases",
+        "list_partitions",
+        "materialized_view_status",
+        "parallel_aggregate",
+        "parallel_scan",
+        "profile_table",
+        "query_partitioned",
+        "read_changes",
+        "rebuild_table",
+        "refresh_materialized_view",
+        "register_consumer",
+        "save_metadata",
+        "search_table",
+        "search_uses_index",
+        "select_all_from_sqlite_table",
+        "select_count_from_sqlite_table",
+        "select_distinct_from_sqlite_table",
+        "select_from_sqlite_table",
+        "select_sum_from_sqlite_table",
+        "stream_query",
+        "stream_table_data",
+        "table_exists",
+        "unregister_consumer",
+        "update_many",
+        "update_metadata",
+        "update_sqlite_table",
+        "upsert_many",
+        "validate_table_name",
+    }
+)
+
+# Allowed methods with an optional argument naming a server path, which
+# must be left unset
+PATH_ARGUMENTS = {"apply_retention": "archive_dir"}
+
+# Host headers accepted from browsers and scripts on a loopback-bound server;
+# anything else is a DNS-rebinding page talking to 127.0.0.1
+LOOPBACK_HOSTS = frozenset({"127.0.0.1", "localhost", "::1"})
+
+_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+
+_ERROR_TYPES = {
+    "ValueError": ValueError,
+    "TypeError": TypeError,
+    "AttributeError": AttributeError,
+    "KeyError": KeyError,
+    "FileNotFoundError": FileNotFoundError,
+    "ReadOnlyDatabaseError": ReadOnlyDatabaseError,
+    "IntegrityError": sqlite3.IntegrityError,
+    "OperationalError": sqlite3.OperationalError,
+    "ProgrammingError": sqlite3.ProgrammingError,
+    "DatabaseError": sqlite3.DatabaseError,
+}
+
+
+class ServerError(Exception):
+    """An error raised by the server that has no local equivalent"""
+
+
+def _encode(value):
+    """json.dumps default: BLOBs as {"$bytes": hex}, anything else as text"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"$bytes": bytes(value).hex()}
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def _decode(obj):
+    """json.loads object_hook reversing _encode for BLOBs"""
+    if len(obj) == 1 and "$bytes" in obj:
+        return bytes.fromhex(obj["$bytes"])
+    return obj
+
+
+def dumps(message):
+    return json.dumps(message, default=_encode, separators=(",", ":")) + "\n"
+
+
+def loads(line):
+    return json.loads(line, object_hook=_decode)
+
+
+def _error(exc):
+    return {"type": type(exc).__name__, "message": str(exc)}
+
+
+def _is_read_only_error(exc):
+    return isinstance(exc, ReadOnlyDatabaseError) or (
+        isinstance(exc, sqlite3.OperationalError) and "readonly" in str(exc)
+    )
+
+
+def _deny_attach(action, *_):
+    # ATTACH, and VACUUM INTO which authorizes as one, open arbitrary paths
+    if action in (sqlite3.SQLITE_ATTACH, sqlite3.SQLITE_DETACH):
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+class _ServedDatabase(SQLiteDatabase):
+    """SQLiteDatabase whose connections can't reach files outside data/"""
+
+    def _open_connection(self, isolation_level=""):
+        conn = super()._open_connection(isolation_level)
+        conn.set_authorizer(_deny_attach)
+        return conn
+
+
+class _Database:
+    """A database's reader (mode=ro replica) and writer plus its write lock"""
+
+    def __init__(self, name):
+        self.name = name
+        self.writer = _ServedDatabase(name, keep_connections=True)
+        self.reader = None
+        self.lock = threading.Lock()
+
+    def get_reader(self):
+        # Opened once the file exists; until then everything goes to the writer
+        if self.reader is None and os.path.exists(self.writer.db_name):
+            self.reader = _ServedDatabase(self.name, read_only=True)
+        return self.reader
+
+
+def is_loopback(host):
+    return host in LOOPBACK_HOSTS or host.startswith("127.")
+
+
+def _host_name(header):
+    """A Host header without its port: "[::1]:8765" -> "::1" """
+    header = (header or "").strip().lower()
+    if header.startswith("["):
+        return header[1:].split("]", 1)[0]
+    return header.rsplit(":", 1)[0] if header.count(":") == 1 else header
+
+
+class DatabaseServer:
+    """Serve every database in data/ to local clients.
+
+    All database work runs on one pool of ``max_workers`` threads, and each
+    thread keeps its connections open between requests, so a request
+    never pays for connecting. Methods marked as writes run on the writer
+    under the database's lock. Everything else (including execute_query
+    and stream_query) is tried on a read-only connection first and, if it
+    turns out to write, re-run under the lock. Results that are iterators
+    are streamed in batches rather than collected.
+
+    HTTP requests must be application/json. When ``token`` is set (always
+    the case for a non-loopback ``host``; one is generated if not given)
+    they must carry ``Authorization: Bearer <token>``; otherwise their Host
+    header must be a loopback name.
+    """
+
+    def __init__(
+        self,
+        socket_path=DEFAULT_SOCKET_PATH,
+        http_port=DEFAULT_HTTP_PORT,
+        host="127.0.0.1",
+        max_workers=8,
+        token=None,
+    ):
+        self.socket_path = socket_path
+        self.http_port = http_port
+        self.host = host
+        if token is None and http_port is not None and not is_loopback(host):
+            token = secrets.token_urlsafe(32)
+        self.token = token
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="everything-db"
+        )
+        self._databases = {}
+        self._databases_lock = threading.Lock()
+        self._servers = []
+        self._threads = []
+
+    def database(self, name):
+        """The _Database for ``name``, created on first use"""
+        if not _NAME.match(name or ""):
+            raise ValueError(f"Invalid database name: {name!r}")
+        with self._databases_lock:
+            entry = self._databases.get(name)
+            if entry is None:
+                entry = self._databases[name] = _Database(name)
+            return entry
+
+    def list_databases(self):
+        """Database names in data/"""
+        if not os.path.isdir("data"):
+            return []
+        return sorted(
+            os.path.splitext(name)[0] for name in os.listdir("data") if name.endswith(".db")
+        )
+
+    def _method(self, name, args, kwargs):
+        if name not in ALLOWED_METHODS:
+            raise AttributeError(f"Unknown or unsupported method '{name}'")
+        method = getattr(SQLiteDatabase, name)
+        path_argument = PATH_ARGUMENTS.get(name)
+        if path_argument:
+            try:
+                bound = inspect.signature(method).bind(None, *args, **kwargs)
+            except TypeError as e:
+                raise ValueError(str(e)) from e
+            if bound.arguments.get(path_argument) is not None:
+                raise ValueError(f"'{path_argument}' can't be set through the server")
+        return method
+
+    def handle(self, request, send):
+        """Run one request on the pool and pass each response message to ``send``.
+
+        Runs on a pool thread: the connection (and, for streams, its cursor)
+        must only be used from the thread that opened it.
+        """
+        request_id = request.get("id")
+        try:
+            entry = self.database(request.get("database"))
+            args = request.get("args") or []
+            kwargs = request.get("kwargs") or {}
+            method = self._method(request.get("method"), args, kwargs)
+        except (ValueError, AttributeError) as e:
+            send({"id": request_id, "error": _error(e)})
+            return
+
+        if not getattr(method, "writes", False):
+            reader = entry.get_reader()
+            if reader is not None:
+                try:
+                    result = method(reader, *args, **kwargs)
+                except Exception as e:
+                    if not _is_read_only_error(e):
+                        send({"id": request_id, "error": _error(e)})
+                        return
+                else:
+                    self._respond(request_id, result, send)
+                    return
+        with entry.lock:
+            try:
+                result = method(entry.writer, *args, **kwargs)
+            except Exception as e:
+                _rollback(entry.writer)
+                send({"id": request_id, "error": _error(e)})
+                return
+            # A RETURNING stream keeps the write lock until it is drained
+            self._respond(request_id, result, send)
+
+    def _respond(self, request_id, result, send):
+        columns = None
+        streamed = isinstance(result, Iterator)
+        if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], Iterator):
+            columns, result = result  # stream_query's (columns, rows)
+            streamed = True
+        if not streamed:
+            send({"id": request_id, "result": result})
+            return
+
+        try:
+            send({"id": request_id, "stream": True, "columns": columns})
+            batch = []
+            for item in result:
+                batch.append(item)
+                if len(batch) >= STREAM_BATCH:
+                    send({"id": request_id, "items": batch})
+                    batch = []
+            if batch:
+                send({"id": request_id, "items": batch})
+        except OSError:
+            return  # client went away; closing the generator releases its cursor
+        except Exception as e:
+            send({"id": request_id, "error": _error(e)})
+            return
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        send({"id": request_id, "done": True})
+
+    def start(self):
+        """Bind the Unix socket (where supported) and HTTP port and start serving"""
+        if self.socket_path and hasattr(socket, "AF_UNIX"):
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)  # left behind by a server that died
+            os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+            unix_server = _UnixServer(self.socket_path, _UnixHandler)
+            os.chmod(self.socket_path, 0o600)  # this user's processes only
+            unix_server.database_server = self
+            self._servers.append(unix_server)
+        if self.http_port is not None:
+            http_server = _HTTPServer((self.host, self.http_port), _HTTPHandler)
+            http_server.database_server = self
+            self.http_port = http_server.server_address[1]  # resolves port 0
+            self._servers.append(http_server)
+        for server in self._servers:
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def endpoints(self):
+        """Where start() is listening, e.g. ["unix:data/everything.sock", "http://..."]"""
+        names = []
+        for server in self._servers:
+            if isinstance(server, _UnixServer):
+                names.append(f"unix:{self.socket_path}")
+            else:
+                names.append(f"http://{self.host}:{self.http_port}")
+        return names
+
+    def serve_forever(self):
+        """Serve until interrupted"""
+        if not self._servers:
+            self.start()
+        try:
+            for thread in self._threads:
+                thread.join()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+        self._threads = []
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _rollback(db):
+    """Roll back whatever a failed write left open on this thread's connection"""
+    conn = getattr(db._local, "reader", None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+
+def _handle_error(server_class):
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            server_class.handle_error(self, request, client_address)
+        # a client that hangs up mid-stream is routine, not worth a traceback
+
+    return handle_error
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    handle_error = _handle_error(socketserver.UnixStreamServer)
+
+
+class _UnixHandler(socketserver.StreamRequestHandler):
+    """One client connection: a request per line, answered in order"""
+
+    def handle(self):
+        server = self.server.database_server
+
+        def send(message):
+            self.wfile.write(dumps(message).encode())
+            if "items" not in message:
+                self.wfile.flush()
+
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = loads(line)
+            except ValueError as e:
+                send({"id": None, "error": _error(e)})
+                continue
+            try:
+                server.pool.submit(server.handle, request, send).result()
+            except OSError:
+                return
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    handle_error = _handle_error(ThreadingHTTPServer)
+
+
+_HTTP_STATUS = {
+    "ValueError": 400,
+    "ReadOnlyDatabaseError": 400,
+    "IntegrityError": 409,
+    "AttributeError": 404,
+}
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    """POST /<database>/<method> with {"args": [...], "kwargs": {...}}.
+
+    Plain results are one JSON object; streams are chunked
+    application/x-ndjson using the same messages as the Unix socket.
+    """
+
+    protocol_version = "HTTP/1.1"  # keep-alive, and chunked streams
+    disable_nagle_algorithm = True  # otherwise small replies wait ~40ms for an ACK
+
+    def log_message(self, format, *args):
+        pass  # a request log line would cost more than the request
+
+    def _send_json(self, status, message):
+        body = dumps(message).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _refuse(self, require_json):
+        """Send an error and return True unless the request may proceed"""
+        server = self.server.database_server
+        if server.token is not None:
+            supplied = self.headers.get("Authorization", "")
+            if not hmac.compare_digest(supplied.encode(), f"Bearer {server.token}".encode()):
+                self._send_json(
+                    401, {"error": {"type": "Unauthorized", "message": "Bad or missing token"}}
+                )
+                return True
+        else:
+            if not is_loopback(_host_name(self.headers.get("Host"))):
+                self._send_json(
+                    403, {"error": {"type": "Forbidden", "message": "Host must be loopback"}}
+                )
+                return True
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip()
+        if require_json and content_type != "application/json":
+            self._send_json(
+                415,
+                {"error": {"type": "UnsupportedMediaType", "message": "Use application/json"}},
+            )
+            return True
+        return False
+
+    def do_GET(self):
+        if self._refuse(require_json=False):
+            return
+        if self.path.rstrip("/") == "/databases":
+            self._send_json(200, {"result": self.server.database_server.list_databases()})
+        else:
+            self._send_json(404, {"error": {"type": "NotFound", "message": self.path}})
+
+    def do_POST(self):
+        server = self.server.database_server
+        parts = self.path.strip("/").split("/")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+        except ValueError as e:
+            self._send_json(400, {"error": _error(e)})
+            return
+        # Checked after reading the body, so a refused request can't leave
+        # it unread on a kept-alive connection
+        if self._refuse(require_json=True):
+            return
+        try:
+            body = loads(raw) if raw else {}
+            if not isinstance(body, dict):
+                raise ValueError("Body must be a JSON object")
+        except ValueError as e:
+            self._send_json(400, {"error": _error(e)})
+            return
+        if len(parts) != 2:
+            self._send_json(
+                404, {"error": {"type": "NotFound", "message": "Use POST /<database>/<method>"}}
+            )
+            return
+        request = {
+            "database": parts[0],
+            "method": parts[1],
+            "args": body.get("args"),
+            "kwargs": body.get("kwargs"),
+        }
+        streaming = []
+
+        def send(message):
+            if streaming:
+                data = dumps(message).encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                return
+            if "stream" not in message:
+                error = message.get("error")
+                status = _HTTP_STATUS.get(error["type"], 500) if error else 200
+                self._send_json(status, message)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            streaming.append(True)
+            send(message)
+
+        try:
+            server.pool.submit(server.handle, request, send).result()
+            if streaming:
+                self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            self.close_connection = True
+
+
+def _raise(error):
+    exc_type = _ERROR_TYPES.get(error.get("type"))
+    if exc_type is None:
+        raise ServerError(f"{error.get('type')}: {error.get('message')}")
+    raise exc_type(error.get("message"))
+
+
+class DatabaseClient:
+    """SQLiteDatabase look-alike that forwards every call to a DatabaseServer.
+
+    ``client.execute_query(sql, params)``, ``client.insert_many(...)`` and so
+    on take the same arguments and return the same values (rows as tuples).
+    stream_query returns ``(columns, iterator)`` that reads batches from the
+    server as it goes; starting another call before draining it abandons
+    the rest of the stream. Connects over the Unix socket, or HTTP when
+    ``url`` (e.g. ``http://127.0.0.1:8765``) is given, sending ``token``
+    if the server requires one. Not thread-safe: use one client per thread.
+    """
+
+    def __init__(
+        self, db_name, socket_path=DEFAULT_SOCKET_PATH, url=None, timeout=None, token=None
+    ):
+        self.db_name = db_name[:-3] if db_name.endswith(".db") else db_name
+        self.socket_path = socket_path
+        self.token = token
+        self.url = url
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._http = None
+        self._response = None  # an HTTP stream being read
+        self._next_id = 0
+        self._pending = None  # token of a stream not yet read to the end
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self._call(name, args, kwargs)
+
+        call.__name__ = name
+        return call
+
+    # Unix socket transport
+
+    def _socket_lines(self, message):
+        if self._pending is not None:
+            self.close()  # abandon the undrained stream; the server stops sending
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(self.timeout)
+            self._sock.connect(self.socket_path)
+            self._file = self._sock.makefile("rb")
+        self._sock.sendall(dumps(message).encode())
+        return iter(self._file.readline, b"")
+
+    # HTTP transport
+
+    def _http_lines(self, message):
+        import http.client
+        from urllib.parse import urlsplit
+
+        if self._pending is not None:
+            self.close()
+        if self._http is None:
+            parts = urlsplit(self.url)
+            self._http = http.client.HTTPConnection(
+                parts.hostname, parts.port or 80, timeout=self.timeout
+            )
+        body = dumps({"args": message["args"], "kwargs": message["kwargs"]}).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        self._http.request(
+            "POST", f"/{self.db_name}/{message['method']}", body=body, headers=headers
+        )
+        response = self._http.getresponse()
+        if response.getheader("Content-Type") != "application/x-ndjson":
+            return iter([response.read()])
+        self._response = response
+        return iter(response.readline, b"")
+
+    def _call(self, method, args, kwargs):
+        self._next_id += 1
+        message = {
+            "id": self._next_id,
+            "database": self.db_name,
+            "method": method,
+            "args": list(args),
+            "kwargs": kwargs,
+        }
+        lines = self._http_lines(message) if self.url else self._socket_lines(message)
+        reply = self._read(lines)
+        if "error" in reply:
+            _raise(reply["error"])
+        if "stream" not in reply:
+            return _as_rows(reply["result"])
+        self._pending = token = object()
+        items = self._stream(lines, token, method == "stream_query")
+        if method == "stream_query":
+            return reply.get("columns"), items
+        return items
+
+    def _read(self, lines):
+        line = next(lines, None)
+        if line is None:
+            self.close()
+            raise ConnectionError("Database server closed the connection")
+        return loads(line)
+
+    def _stream(self, lines, token, rows):
+        try:
+            while True:
+                reply = self._read(lines)
+                if "error" in reply or reply.get("done"):
+                    if self._response is not None:
+                        self._response.read()  # the final chunk, so the connection can be reused
+                        self._response = None
+                    if "error" in reply:
+                        _raise(reply["error"])
+                    break
+                for item in reply["items"]:
+                    yield tuple(item) if rows else item
+        finally:
+            if self._pending is token:
+                self._pending = None
+
+    def list_databases(self):
+        """Database names the server can see in data/"""
+        return [info["name"] for info in self._call("list_all_databases", (), {})]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+        self._response = None
+        self._pending = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _as_rows(result):
+    """fetchall()-style results arrive as lists of lists; hand back tuples"""
+    if isinstance(result, list) and result and all(isinstance(r, list) for r in result):
+        return [tuple(row) for row in result]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve the databases in data/ over a Unix socket and local HTTP"
+    )
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Unix socket path")
+    parser.add_argument("--no-socket", action="store_true", help="Serve HTTP only")
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_HTTP_PORT, help="HTTP port (0 picks a free one)"
+    )
+    parser.add_argument("--no-http", action="store_true", help="Serve the socket only")
+    parser.add_argument("--host", default="127.0.0.1", help="HTTP bind address")
+    parser.add_argument(
+        "--token",
+        default=os.environ.get("EVERYTHING_SERVER_TOKEN"),
+        help="Require 'Authorization: Bearer TOKEN' on HTTP requests "
+        "(generated when --host isn't loopback)",
+    )
+    parser.add_argument("--workers", type=int, default=8, help="Database worker threads")
+    args = parser.parse_args(argv)
+
+    server = DatabaseServer(
+        socket_path=None if args.no_socket else args.socket,
+        http_port=None if args.no_http else args.port,
+        host=args.host,
+        max_workers=args.workers,
+        token=args.token,
+    )
+    server.start()
+    print(f"Serving {', '.join(server.endpoints())}", flush=True)
+    if server.token and not args.token:
+        print(f"HTTP token: {server.token}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,438 @@
+"""
+Horizontal sharding for SQLite Database Manager
+Spreads one logical table across several database files in data/, each with
+its own writer lock. Rows are placed by a key column, either by hash (a stable
+32-bit slot) or by value range; every shard owns a half-open range of slots or
+keys, so point reads and writes go to exactly one file, scans and aggregates
+fan out to all of them in parallel and are merged, and a hot shard can be
+split in two by moving the upper half of its range to a new file
+"""
+
+import bisect
+import heapq
+import json
+import os
+import sqlite3
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from everything_db import SQLiteDatabase, record_write
+from everything_parallel import merge_partial_aggregates, plan_partial_aggregates
+
+SHARD_STRATEGIES = ("hash", "range")
+SLOT_COUNT = 2**32
+
+
+def shard_slot(value):
+    """Stable hash slot in [0, 2**32) for a key value.
+
+    Integers and their text form hash alike, matching how an INTEGER key
+    column stores both.
+    """
+    if isinstance(value, bytes):
+        return zlib.crc32(value)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return zlib.crc32(str(value).encode("utf-8"))
+
+
+def _manifest_path(name):
+    # Next to the shard files, which SQLiteDatabase always keeps in data/
+    return os.path.join("data", "shards", f"{name}.json")
+
+
+def _write_manifest(name, manifest):
+    """Replace the shard map atomically: readers see the old file or the new one"""
+    path = _manifest_path(name)
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+class ShardedTable:
+    """A logical table stored as one table per shard database.
+
+    The shard map lives in data/shards/<name>.json; shard files are ordinary
+    databases named <name>_shard<N>. Every operation first checks whether
+    the file was replaced (by a split in another process) and reloads it.
+    """
+
+    def __init__(self, name, max_workers=8):
+        self.name = name
+        self.max_workers = max_workers
+        self._manifest_stat = None
+        self._refresh()
+
+    def _refresh(self):
+        """Reload the shard map if the file changed since it was read"""
+        path = _manifest_path(self.name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise ValueError(f"Sharded table '{self.name}' not found") from None
+        # A rename always brings a new inode, even within the mtime resolution
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version == self._manifest_stat:
+            return
+        with open(path) as f:
+            self.manifest = json.load(f)
+        self._manifest_stat = version
+        self._load()
+
+    def _load(self):
+        shards = self.manifest["shards"]
+        self.key = self.manifest["key"]
+        self.strategy = self.manifest["strategy"]
+        self.databases = [SQLiteDatabase(shard["database"]) for shard in shards]
+        # Lower bounds of every shard but the first, for bisect routing
+        self._bounds = [shard["lo"] for shard in shards[1:]]
+
+    @classmethod
+    def create(cls, name, columns, key, shards=4, strategy="hash", boundaries=None):
+        """Create the shard databases and the shard map.
+
+        ``columns`` is a column definition string as for create_table_safe
+        and must include ``key``. Hash sharding splits the slot space into
+        ``shards`` equal ranges; range sharding takes sorted ``boundaries``
+        (each shard's lower bound after the first) instead.
+        """
+        if strategy not in SHARD_STRATEGIES:
+            raise ValueError(
+                f"Invalid strategy '{strategy}'. "
+                f"Choose from: {', '.join(SHARD_STRATEGIES)}"
+            )
+        if os.path.exists(_manifest_path(name)):
+            raise ValueError(f"Sharded table '{name}' already exists")
+        if strategy == "hash":
+            if shards < 1:
+                raise ValueError("At least one shard is required")
+            lows = [i * SLOT_COUNT // shards for i in range(shards)]
+        else:
+            boundaries = list(boundaries or [])
+            if boundaries != sorted(set(boundaries)):
+                raise ValueError("Range boundaries must be sorted and distinct")
+            lows = [None] + boundaries
+
+        entries = []
+        for i, lo in enumerate(lows):
+            database = f"{name}_shard{i}"
+            db = SQLiteDatabase(database)
+            if os.path.exists(db.db_name):
+                raise ValueError(f"Database '{database}' already exists")
+            db.create_sqlite_db(
+                {"description": f"Shard {i} of sharded table '{name}'", "shard_of": name}
+            )
+            db.create_table_safe(name, columns)
+            if key not in [column[1] for column in db.get_column_info(name)]:
+                raise ValueError(f"Key column '{key}' is not in the table definition")
+            entries.append({"database": database, "lo": lo})
+
+        os.makedirs(os.path.join("data", "shards"), exist_ok=True)
+        manifest = {
+            "table": name,
+            "key": key,
+            "strategy": strategy,
+            "next_shard": len(entries),
+            "shards": entries,
+        }
+        _write_manifest(name, manifest)
+        return cls(name)
+
+    # Routing
+
+    def _position(self, key_value):
+        return shard_slot(key_value) if self.strategy == "hash" else key_value
+
+    def shard_index(self, key_value):
+        """Index of the shard that owns ``key_value``"""
+        self._refresh()
+        return self._index(key_value)
+
+    def _index(self, key_value):
+        if key_value is None:
+            raise ValueError(f"Key column '{self.key}' can't be NULL in a sharded table")
+        return bisect.bisect_right(self._bounds, self._position(key_value))
+
+    def shard_for(self, key_value):
+        """The SQLiteDatabase holding ``key_value``'s row"""
+        return self.databases[self.shard_index(key_value)]
+
+    def _route(self, rows):
+        self._refresh()
+        by_shard = {}
+        for row in rows:
+            if self.key not in row:
+                raise ValueError(f"Rows must include the key column '{self.key}'")
+            by_shard.setdefault(self._index(row[self.key]), []).append(row)
+        return by_shard
+
+    def _fan_out(self, work, indexes=None):
+        """Run work(shard index) on several shards in parallel, results in order.
+
+        Without ``indexes`` every shard is visited, as of a freshly checked
+        shard map; callers passing indexes got them from _route.
+        """
+        if indexes is None:
+            self._refresh()
+            indexes = range(len(self.databases))
+        indexes = list(indexes)
+        if len(indexes) <= 1:
+            return [work(i) for i in indexes]
+        # Each shard is its own file with its own lock, and sqlite3 releases the GIL
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(indexes))) as pool:
+            return list(pool.map(work, indexes))
+
+    # Point reads and writes
+
+    def insert_many(self, rows):
+        """Insert row dicts, one transaction per shard, shards written in parallel"""
+        by_shard = self._route(rows)
+        return sum(
+            self._fan_out(
+                lambda i: self.databases[i].insert_many(self.name, by_shard[i]),
+                sorted(by_shard),
+            )
+        )
+
+    def insert(self, row):
+        return self.shard_for(row.get(self.key)).insert_many(self.name, [row])
+
+    def upsert_many(self, rows):
+        """Insert or update row dicts by the shard key"""
+        by_shard = self._route(rows)
+        return sum(
+            self._fan_out(
+                lambda i: self.databases[i].upsert_many(
+                    self.name, by_shard[i], key=self.key
+                ),
+                sorted(by_shard),
+            )
+        )
+
+    def get(self, key_value):
+        """The row with this key (a tuple), or None; reads a single shard"""
+        db = self.shard_for(key_value)
+        conn = db._connect()
+        try:
+            cursor = conn.execute(
+                f"SELECT * FROM {self.name} WHERE {self.key} = ?", (key_value,)
+            )
+            rows = db._decompress(conn, self.name, cursor, cursor.fetchall())
+        finally:
+            db._release(conn)
+        return rows[0] if rows else None
+
+    def update(self, key_value, changes):
+        """Update one row by key; returns rows changed"""
+        return self.shard_for(key_value).update_many(
+            self.name, [(key_value, changes)], key=self.key
+        )
+
+    def delete(self, key_value):
+        """Delete one row by key; returns rows deleted"""
+        return self.shard_for(key_value).delete_many(self.name, [key_value], key=self.key)
+
+    # Fan-out reads
+
+    def select(
+        self,
+        condition="1=1",
+        params=(),
+        columns="*",
+        order_by=None,
+        descending=False,
+        limit=None,
+    ):
+        """Rows matching ``condition`` from every shard.
+
+        With ``order_by`` (a column name) each shard sorts and limits its own
+        rows and the sorted streams are merged, so only ``limit`` rows per
+        shard cross into Python.
+        """
+        sql = f"SELECT {columns} FROM {self.name} WHERE {condition}"
+        if order_by:
+            sql += f" ORDER BY {order_by}{' DESC' if descending else ''}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+
+        def run(i):
+            db = self.databases[i]
+            conn = db._connect()
+            try:
+                cursor = conn.execute(sql, params)
+                names = [column[0] for column in cursor.description]
+                return names, db._decompress(conn, self.name, cursor, cursor.fetchall())
+            finally:
+                db._release(conn)
+
+        results = self._fan_out(run)
+        names = results[0][0]
+        if not order_by:
+            rows = [row for _, shard_rows in results for row in shard_rows]
+        else:
+            if order_by not in names:
+                raise ValueError(f"order_by column '{order_by}' must be selected")
+            i = names.index(order_by)
+            rows = heapq.merge(
+                *(shard_rows for _, shard_rows in results),
+                # SQLite sorts NULLs first
+                key=lambda row: (row[i] is not None, row[i]),
+                reverse=descending,
+            )
+            rows = list(rows)
+        return rows[:limit] if limit is not None else rows
+
+    def count(self, condition="1=1", params=()):
+        sql = f"SELECT COUNT(*) FROM {self.name} WHERE {condition}"
+        return sum(
+            self._fan_out(lambda i: self.databases[i].execute_query(sql, params)[0][0])
+        )
+
+    def aggregate(self, aggregates, group_by=None, condition="1=1"):
+        """SQLiteDatabase.aggregate across all shards, merged per group.
+
+        Each shard computes partial aggregates in parallel; avg is combined
+        from per-shard sums and counts. count_distinct only merges exactly on
+        the shard key, whose values never span shards.
+        """
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        group_by = list(group_by or [])
+        plan, partials = plan_partial_aggregates(aggregates, distinct_column=self.key)
+        results = self._fan_out(
+            lambda i: self.databases[i].aggregate(
+                self.name, partials, group_by, condition
+            )
+        )
+        return merge_partial_aggregates(results, group_by, plan)
+
+    # Rebalancing
+
+    def shard_stats(self):
+        """Rows and file size per shard"""
+        sql = f"SELECT COUNT(*) FROM {self.name}"
+        counts = self._fan_out(lambda i: self.databases[i].execute_query(sql)[0][0])
+        return [
+            {
+                "database": shard["database"],
+                "lo": shard["lo"],
+                "rows": rows,
+                "bytes": os.path.getsize(db.db_name),
+            }
+            for shard, db, rows in zip(self.manifest["shards"], self.databases, counts)
+        ]
+
+    def _range_condition(self, lo, hi):
+        term = f"shard_slot({self.key})" if self.strategy == "hash" else self.key
+        clauses, params = [], []
+        if lo is not None:
+            clauses.append(f"{term} >= ?")
+            params.append(lo)
+        if hi is not None:
+            clauses.append(f"{term} < ?")
+            params.append(hi)
+        return " AND ".join(clauses) or "1=1", params
+
+    def _median_split(self, index):
+        shards = self.manifest["shards"]
+        lo = shards[index]["lo"]
+        hi = shards[index + 1]["lo"] if index + 1 < len(shards) else None
+        if self.strategy == "hash":
+            at = ((lo or 0) + (hi if hi is not None else SLOT_COUNT)) // 2
+            if at == lo:
+                raise ValueError("Shard's slot range is too small to split")
+            return at
+        db = self.databases[index]
+        count = db.execute_query(f"SELECT COUNT(*) FROM {self.name}")[0][0]
+        if count < 2:
+            raise ValueError("Shard has too few rows to split at its median key")
+        return db.execute_query(
+            f"SELECT {self.key} FROM {self.name} ORDER BY {self.key} LIMIT 1 OFFSET ?",
+            (count // 2,),
+        )[0][0]
+
+    def split_shard(self, index, at=None):
+        """Move the upper part of a shard's range, from ``at`` up, into a new shard.
+
+        ``at`` defaults to the middle of the slot range (hash) or the median
+        key (range). Rows are copied and deleted in one transaction spanning
+        both files, then the shard map is replaced atomically. Processes still
+        routing by the old map can insert into the old shard meanwhile, so
+        once the new map is in place a second pass moves any such rows too.
+        Returns rows moved.
+        """
+        self._refresh()
+        shards = self.manifest["shards"]
+        if not 0 <= index < len(shards):
+            raise ValueError(f"No shard {index}; there are {len(shards)}")
+        lo = shards[index]["lo"]
+        hi = shards[index + 1]["lo"] if index + 1 < len(shards) else None
+        if at is None:
+            at = self._median_split(index)
+        if (lo is not None and at <= lo) or (hi is not None and at >= hi):
+            raise ValueError(f"Split point {at!r} is outside shard {index}'s range")
+
+        database = f"{self.name}_shard{self.manifest['next_shard']}"
+        new_db = SQLiteDatabase(database)
+        if os.path.exists(new_db.db_name):
+            raise ValueError(f"Database '{database}' already exists")
+        new_db.create_sqlite_db(
+            {
+                "description": f"Shard of sharded table '{self.name}'",
+                "shard_of": self.name,
+            }
+        )
+        source = self.databases[index]
+        create_sql = source.execute_query(
+            "SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (self.name,)
+        )[0][0]
+        new_db.execute_query(create_sql)
+
+        columns = ", ".join(column[1] for column in source.get_column_info(self.name))
+        condition, params = self._range_condition(at, hi)
+        moved = self._move_rows(source, new_db, columns, condition, params)
+
+        # Only now, with the rows in place, do readers start routing to the new shard
+        new_shard = {"database": database, "lo": at}
+        manifest = dict(
+            self.manifest,
+            shards=shards[: index + 1] + [new_shard] + shards[index + 1 :],
+            next_shard=self.manifest["next_shard"] + 1,
+        )
+        _write_manifest(self.name, manifest)
+        self._refresh()
+        # Sweep up rows written by processes that hadn't seen the new map yet
+        moved += self._move_rows(source, new_db, columns, condition, params)
+        record_write(source.db_name, moved)
+        record_write(new_db.db_name, moved)
+        return moved
+
+    def _move_rows(self, source, target, columns, condition, params):
+        """Move rows matching ``condition`` from one shard file to another.
+
+        Copy and delete run in one transaction spanning both files. A row
+        whose key is already in the target replaces it: it was written later.
+        """
+        conn = sqlite3.connect(source.db_name, isolation_level=None, timeout=30)
+        conn.create_function("shard_slot", 1, shard_slot, deterministic=True)
+        try:
+            conn.execute("ATTACH DATABASE ? AS target", (target.db_name,))
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                moved = conn.execute(
+                    f"INSERT OR REPLACE INTO target.{self.name} ({columns}) "
+                    f"SELECT {columns} FROM main.{self.name} "
+                    f"WHERE {condition}",
+                    params,
+                ).rowcount
+                conn.execute(f"DELETE FROM main.{self.name} WHERE {condition}", params)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        return moved
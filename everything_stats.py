@@ -0,0 +1,564 @@
+"""
+Column statistics profiler for SQLite Database Manager
+Computes null fractions, approximate distinct counts, min/max, top values and
+histograms per column, sampling large tables by rowid and caching the results
+in the _column_stats table so later runs only profile newly appended rows;
+triggers flag any UPDATE or DELETE, which makes the next run start over
+"""
+
+import hashlib
+import json
+import math
+import random
+import sqlite3
+from collections import Counter
+from datetime import datetime
+
+STATS_TABLE = "_column_stats"
+
+# How many candidate values to keep per column so top-k survives incremental merges
+TOP_CANDIDATES_FACTOR = 4
+
+# Maximum number of bound parameters used per rowid probe query
+PROBE_CHUNK_SIZE = 500
+
+
+class HyperLogLog:
+    """Fixed-memory distinct count estimator (2**precision one-byte registers)"""
+
+    def __init__(self, precision=12, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers else bytearray(self.size)
+
+    def add(self, value):
+        digest = hashlib.blake2b(
+            repr((type(value).__name__, value)).encode(), digest_size=8
+        ).digest()
+        x = int.from_bytes(digest, "big")
+        index = x >> (64 - self.precision)
+        remaining = x & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        for i, rank in enumerate(other.registers):
+            if rank > self.registers[i]:
+                self.registers[i] = rank
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size**2 / sum(2.0**-r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Linear counting is far more accurate for small cardinalities
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+
+def _sort_key(value):
+    """Order values the way SQLite does: numbers < text < blobs"""
+    if isinstance(value, (int, float)):
+        return (0, value)
+    if isinstance(value, str):
+        return (1, value)
+    return (2, bytes(value))
+
+
+def _json_value(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    return value
+
+
+class _ColumnAccumulator:
+    """Running statistics for one column over the rows fed to it"""
+
+    def __init__(self, top_k):
+        self.top_k = top_k
+        self.rows = 0
+        self.nulls = 0
+        self.minimum = None
+        self.maximum = None
+        self.hll = HyperLogLog()
+        self.counts = Counter()
+        self.numbers = []
+
+    def add(self, value):
+        self.rows += 1
+        if value is None:
+            self.nulls += 1
+            return
+        self.hll.add(value)
+        key = _sort_key(value)
+        if self.minimum is None or key < _sort_key(self.minimum):
+            self.minimum = value
+        if self.maximum is None or key > _sort_key(self.maximum):
+            self.maximum = value
+        self.counts[_json_value(value)] += 1
+        if isinstance(value, (int, float)):
+            self.numbers.append(value)
+        # Keep memory bounded on high-cardinality columns
+        if len(self.counts) > 50000:
+            self.counts = Counter(
+                dict(self.counts.most_common(self.top_k * TOP_CANDIDATES_FACTOR))
+            )
+
+
+def _histogram(numbers, bins):
+    if not numbers:
+        return []
+    low, high = min(numbers), max(numbers)
+    if low == high:
+        return [[low, high, len(numbers)]]
+    width = (high - low) / bins
+    counts = [0] * bins
+    for number in numbers:
+        counts[min(int((number - low) / width), bins - 1)] += 1
+    return [[low + i * width, low + (i + 1) * width, counts[i]] for i in range(bins)]
+
+
+def _merge_histogram(histogram, numbers, bins):
+    """Add new numbers into existing bins, clamping outliers to the end bins"""
+    if not histogram:
+        return _histogram(numbers, bins)
+    for number in numbers:
+        for i, (low, high, _) in enumerate(histogram):
+            if number < high or i == len(histogram) - 1:
+                histogram[i][2] += 1
+                break
+    return histogram
+
+
+def _gee_distinct(counts, sample_rows, total_rows):
+    """Guaranteed-error estimator of distinct values from a uniform sample"""
+    if sample_rows == 0:
+        return 0
+    frequencies = Counter(counts.values())
+    singletons = frequencies.pop(1, 0)
+    if singletons >= 0.9 * sample_rows:
+        # GEE badly underestimates near-unique columns; scale linearly instead
+        return int(min(round(len(counts) * total_rows / sample_rows), total_rows))
+    estimate = math.sqrt(total_rows / sample_rows) * singletons + sum(
+        frequencies.values()
+    )
+    return int(min(round(estimate), total_rows))
+
+
+def _ensure_stats_table(cursor):
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+            table_name TEXT NOT NULL,
+            column_name TEXT NOT NULL,
+            row_count INTEGER,
+            null_count INTEGER,
+            distinct_estimate INTEGER,
+            min_value,
+            max_value,
+            top_values TEXT,
+            histogram TEXT,
+            sketch BLOB,
+            sampled INTEGER,
+            sample_rows INTEGER,
+            max_rowid INTEGER,
+            profiled_at TEXT,
+            PRIMARY KEY (table_name, column_name)
+        )
+    """
+    )
+
+
+def _trigger_names(table_name):
+    return [f"_stats_{table_name}_{kind}" for kind in ("update", "delete")]
+
+
+def _changed_key(table_name):
+    return f"stats:{table_name}:changed"
+
+
+def _track_changes(cursor, table_name):
+    """Mark the table changed in _database_metadata on any UPDATE or DELETE.
+
+    Appends show up in the rowids and row count, but an edited or replaced
+    row would otherwise leave a cached profile looking current.
+    """
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS _database_metadata (key TEXT PRIMARY KEY, value TEXT)"
+    )
+    mark = (
+        "INSERT OR IGNORE INTO _database_metadata (key, value) "
+        f"VALUES ('{_changed_key(table_name)}', '1');"
+    )
+    try:
+        for trigger, event in zip(_trigger_names(table_name), ("UPDATE", "DELETE")):
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON {table_name} "
+                f"BEGIN {mark} END"
+            )
+    except sqlite3.OperationalError:
+        return  # a view: nothing to track, so its cache is never reused
+    cursor.execute(
+        "DELETE FROM _database_metadata WHERE key = ?", (_changed_key(table_name),)
+    )
+
+
+def _unchanged(cursor, table_name):
+    """True if no row was updated or deleted since the cached profile"""
+    names = _trigger_names(table_name)
+    cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (?, ?)",
+        names,
+    )
+    if cursor.fetchone()[0] != len(names):
+        return False  # not tracked, so there's no telling
+    cursor.execute(
+        "SELECT 1 FROM _database_metadata WHERE key = ?", (_changed_key(table_name),)
+    )
+    return cursor.fetchone() is None
+
+
+def _load_cached(cursor, table_name):
+    cursor.execute(
+        f"SELECT column_name, row_count, null_count, distinct_estimate, min_value, "
+        f"max_value, top_values, histogram, sketch, sampled, sample_rows, "
+        f"max_rowid, profiled_at FROM {STATS_TABLE} WHERE table_name = ?",
+        (table_name,),
+    )
+    cached = {}
+    for row in cursor.fetchall():
+        cached[row[0]] = {
+            "row_count": row[1],
+            "null_count": row[2],
+            "distinct": row[3],
+            "min": row[4],
+            "max": row[5],
+            "top_values": json.loads(row[6]) if row[6] else [],
+            "histogram": json.loads(row[7]) if row[7] else [],
+            "sketch": row[8],
+            "sampled": bool(row[9]),
+            "sample_rows": row[10],
+            "max_rowid": row[11],
+            "profiled_at": row[12],
+        }
+    return cached
+
+
+def _sample_by_rowid(cursor, table_name, column_sql, min_rowid, max_rowid, size):
+    """Probe random rowids in [min_rowid, max_rowid]; returns (rows, hit_rate)"""
+    span = max_rowid - min_rowid + 1
+    rows = []
+    probes = 0
+    seen = set()
+    # Sparse rowid spaces (after deletes) need extra rounds to fill the sample
+    for _ in range(4):
+        wanted = min(size - len(rows), span - len(seen))
+        if wanted <= 0:
+            break
+        candidates = [
+            rowid
+            for rowid in random.sample(
+                range(min_rowid, max_rowid + 1), min(span, wanted + len(seen))
+            )
+            if rowid not in seen
+        ][:wanted]
+        seen.update(candidates)
+        probes += len(candidates)
+        for start in range(0, len(candidates), PROBE_CHUNK_SIZE):
+            chunk = candidates[start : start + PROBE_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(
+                f"SELECT {column_sql} FROM {table_name} WHERE rowid IN ({placeholders})",
+                chunk,
+            )
+            rows.extend(cursor.fetchall())
+    hit_rate = len(rows) / probes if probes else 0
+    return rows, hit_rate
+
+
+def _reservoir_sample(cursor, size):
+    """Algorithm R over a streaming cursor, for tables without a rowid"""
+    reservoir = []
+    seen = 0
+    for row in cursor:
+        seen += 1
+        if len(reservoir) < size:
+            reservoir.append(row)
+        else:
+            slot = random.randrange(seen)
+            if slot < size:
+                reservoir[slot] = row
+    return reservoir, seen
+
+
+def _finish(accumulator, top_k, bins, scale=1.0, total_rows=None, sampled=False):
+    total_rows = accumulator.rows if total_rows is None else total_rows
+    if sampled:
+        distinct = _gee_distinct(accumulator.counts, accumulator.rows, total_rows)
+    else:
+        distinct = accumulator.hll.count()
+    null_count = int(round(accumulator.nulls * scale))
+    common = accumulator.counts.most_common(top_k * TOP_CANDIDATES_FACTOR)
+    if sampled:
+        # A value seen once in a sample says nothing about its frequency
+        common = [(value, count) for value, count in common if count > 1]
+    return {
+        "row_count": total_rows,
+        "null_count": null_count,
+        "null_fraction": null_count / total_rows if total_rows else 0.0,
+        "distinct": distinct,
+        "min": accumulator.minimum,
+        "max": accumulator.maximum,
+        "top_values": [[value, int(round(count * scale))] for value, count in common],
+        "histogram": [
+            [low, high, int(round(count * scale))]
+            for low, high, count in _histogram(accumulator.numbers, bins)
+        ],
+        "sketch": None if sampled else accumulator.hll.to_bytes(),
+        "sampled": sampled,
+        "sample_rows": accumulator.rows,
+    }
+
+
+def _merge_increment(cached, accumulator, top_k, bins):
+    """Fold stats for newly appended rows into an exact cached profile"""
+    hll = HyperLogLog(registers=cached["sketch"])
+    hll.merge(accumulator.hll)
+    row_count = cached["row_count"] + accumulator.rows
+    null_count = cached["null_count"] + accumulator.nulls
+
+    candidates = [cached["min"], cached["max"], accumulator.minimum, accumulator.maximum]
+    candidates = [value for value in candidates if value is not None]
+    top = Counter({value: count for value, count in cached["top_values"]})
+    top.update(accumulator.counts)
+
+    return {
+        "row_count": row_count,
+        "null_count": null_count,
+        "null_fraction": null_count / row_count if row_count else 0.0,
+        "distinct": hll.count(),
+        "min": min(candidates, key=_sort_key) if candidates else None,
+        "max": max(candidates, key=_sort_key) if candidates else None,
+        "top_values": [
+            list(item) for item in top.most_common(top_k * TOP_CANDIDATES_FACTOR)
+        ],
+        "histogram": _merge_histogram(cached["histogram"], accumulator.numbers, bins),
+        "sketch": hll.to_bytes(),
+        "sampled": False,
+        "sample_rows": row_count,
+    }
+
+
+def profile_table(
+    db,
+    table_name,
+    sample_threshold=100000,
+    sample_size=20000,
+    top_k=5,
+    bins=10,
+    refresh=False,
+):
+    """Profile every column of a table, using and refreshing the stats cache.
+
+    Tables whose rowid span exceeds ``sample_threshold`` are profiled from
+    ``sample_size`` random rowid probes; smaller tables are scanned in full.
+    Exact profiles are refreshed incrementally when rows were only appended.
+    """
+    columns = db.get_column_info(table_name)
+    if not columns:
+        return None
+    names = [column[1] for column in columns]
+    column_sql = ", ".join(f'"{name}"' for name in names)
+
+    conn = db._connect()
+    cursor = conn.cursor()
+    # Read-only replicas can use an existing cache but never write one
+    cache_writable = not db.read_only
+    if cache_writable:
+        _ensure_stats_table(cursor)
+    try:
+        cached = {} if refresh else _load_cached(cursor, table_name)
+        if cached and not _unchanged(cursor, table_name):
+            cached = {}
+    except sqlite3.OperationalError:
+        cached = {}
+
+    try:
+        cursor.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table_name}")
+        min_rowid, max_rowid = cursor.fetchone()
+        has_rowid = True
+    except sqlite3.OperationalError:
+        # WITHOUT ROWID table
+        min_rowid = max_rowid = None
+        has_rowid = False
+
+    span = (max_rowid - min_rowid + 1) if max_rowid is not None else 0
+    use_sampling = span > sample_threshold if has_rowid else False
+
+    cached_complete = bool(cached) and all(name in cached for name in names)
+    first = cached[names[0]] if cached_complete else None
+
+    if use_sampling:
+        if first and first["sampled"] and first["max_rowid"] == max_rowid:
+            db._release(conn)
+            return _report(table_name, cached, names, top_k, from_cache=True)
+
+        rows, hit_rate = _sample_by_rowid(
+            cursor, table_name, column_sql, min_rowid, max_rowid, sample_size
+        )
+        total_rows = int(round(span * hit_rate))
+        accumulators = [_ColumnAccumulator(top_k) for _ in names]
+        for row in rows:
+            for accumulator, value in zip(accumulators, row):
+                accumulator.add(value)
+        scale = total_rows / len(rows) if rows else 0.0
+        results = {
+            name: _finish(acc, top_k, bins, scale, total_rows, sampled=True)
+            for name, acc in zip(names, accumulators)
+        }
+    else:
+        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+        total_rows = cursor.fetchone()[0]
+
+        if (
+            has_rowid
+            and first
+            and not first["sampled"]
+            and first["max_rowid"] is not None
+            and max_rowid is not None
+        ):
+            if first["max_rowid"] == max_rowid and first["row_count"] == total_rows:
+                db._release(conn)
+                return _report(table_name, cached, names, top_k, from_cache=True)
+
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {table_name} WHERE rowid > ?",
+                (first["max_rowid"],),
+            )
+            appended = cursor.fetchone()[0]
+            if first["row_count"] + appended == total_rows:
+                # Only appends since the last profile: scan just the new rows
+                cursor.execute(
+                    f"SELECT {column_sql} FROM {table_name} WHERE rowid > ?",
+                    (first["max_rowid"],),
+                )
+                accumulators = [_ColumnAccumulator(top_k) for _ in names]
+                for row in cursor:
+                    for accumulator, value in zip(accumulators, row):
+                        accumulator.add(value)
+                results = {
+                    name: _merge_increment(cached[name], acc, top_k, bins)
+                    for name, acc in zip(names, accumulators)
+                }
+                _store(cursor, table_name, results, max_rowid, cache_writable)
+                db._commit(conn)
+                db._release(conn)
+                return _report(table_name, results, names, top_k)
+
+        cursor.execute(f"SELECT {column_sql} FROM {table_name}")
+        accumulators = [_ColumnAccumulator(top_k) for _ in names]
+        sampled = False
+        scale = 1.0
+        if not has_rowid and total_rows > sample_threshold:
+            rows, total_rows = _reservoir_sample(cursor, sample_size)
+            sampled = True
+            scale = total_rows / len(rows) if rows else 0.0
+        else:
+            rows = cursor
+        for row in rows:
+            for accumulator, value in zip(accumulators, row):
+                accumulator.add(value)
+        results = {
+            name: _finish(acc, top_k, bins, scale, total_rows, sampled=sampled)
+            for name, acc in zip(names, accumulators)
+        }
+
+    _store(cursor, table_name, results, max_rowid, cache_writable)
+    db._commit(conn)
+    db._release(conn)
+    return _report(table_name, results, names, top_k)
+
+
+def _store(cursor, table_name, results, max_rowid, writable=True):
+    profiled_at = datetime.now().isoformat()
+    for stats in results.values():
+        stats["max_rowid"] = max_rowid
+        stats["profiled_at"] = profiled_at
+    if not writable:
+        return
+    _track_changes(cursor, table_name)
+    cursor.execute(f"DELETE FROM {STATS_TABLE} WHERE table_name = ?", (table_name,))
+    for name, stats in results.items():
+        cursor.execute(
+            f"INSERT INTO {STATS_TABLE} (table_name, column_name, row_count, "
+            f"null_count, distinct_estimate, min_value, max_value, top_values, "
+            f"histogram, sketch, sampled, sample_rows, max_rowid, profiled_at) "
+            f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                table_name,
+                name,
+                stats["row_count"],
+                stats["null_count"],
+                stats["distinct"],
+                stats["min"],
+                stats["max"],
+                json.dumps(stats["top_values"]),
+                json.dumps(stats["histogram"]),
+                stats["sketch"],
+                int(stats["sampled"]),
+                stats["sample_rows"],
+                max_rowid,
+                profiled_at,
+            ),
+        )
+
+
+def _report(table_name, results, names, top_k, from_cache=False):
+    first = results[names[0]]
+    report = {
+        "table": table_name,
+        "row_count": first["row_count"],
+        "sampled": first["sampled"],
+        "sample_rows": first["sample_rows"],
+        "profiled_at": first.get("profiled_at"),
+        "from_cache": from_cache,
+        "columns": {},
+    }
+    for name in names:
+        stats = results[name]
+        row_count = stats["row_count"]
+        report["columns"][name] = {
+            "null_fraction": stats["null_count"] / row_count if row_count else 0.0,
+            "distinct": stats["distinct"],
+            "min": stats["min"],
+            "max": stats["max"],
+            "top_values": [tuple(item) for item in stats["top_values"][:top_k]],
+            "histogram": [tuple(item) for item in stats["histogram"]],
+        }
+    return report
+
+
+def clear_stats(db, table_name=None):
+    """Drop cached statistics for one table, or for every table"""
+    conn = db._connect()
+    cursor = conn.cursor()
+    _ensure_stats_table(cursor)
+    if table_name:
+        cursor.execute(f"DELETE FROM {STATS_TABLE} WHERE table_name = ?", (table_name,))
+        tables = [table_name]
+    else:
+        cursor.execute(f"DELETE FROM {STATS_TABLE}")
+        cursor.execute(
+            "SELECT tbl_name FROM sqlite_master "
+            "WHERE type = 'trigger' AND name LIKE '\\_stats\\_%\\_update' ESCAPE '\\'"
+        )
+        tables = [row[0] for row in cursor.fetchall()]
+    for name in tables:
+        for trigger in _trigger_names(name):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    db._commit(conn)
+    db._release(conn)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Incremental database-to-database sync for SQLite Database Manager
+Compares two databases table by table with order-independent hashes over
+primary-key ranges, recursing Merkle-style only into ranges whose hashes
+differ, then upserts and deletes just the rows inside the differing leaf
+ranges, so a copy that is mostly in step costs a hash pass instead of a
+full file copy
+"""
+
+import argparse
+import hashlib
+import sqlite3
+import sys
+import time
+
+from everything_db import record_write
+
+
+class _RangeHash:
+    """Aggregate: XOR of per-row 64-bit hashes, independent of row order"""
+
+    def __init__(self):
+        self.value = 0
+
+    def step(self, *row):
+        digest = hashlib.blake2b(repr(row).encode(), digest_size=8).digest()
+        self.value ^= int.from_bytes(digest, "big")
+
+    def finalize(self):
+        # Returned as text: SQLite integers are signed 64-bit
+        return format(self.value, "016x")
+
+
+def _row_digest(row):
+    return hashlib.blake2b(repr(tuple(row)).encode(), digest_size=8).digest()
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, isolation_level=None, timeout=30)
+    conn.create_aggregate("range_hash", -1, _RangeHash)
+    return conn
+
+
+def _columns(conn, table_name):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+
+
+def _key_columns(conn, table_name):
+    """Primary key columns in key order, or [] for a rowid table without one"""
+    rows = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
+    return [row[1] for row in sorted(rows, key=lambda row: row[5]) if row[5]]
+
+
+class _TableSync:
+    """Range hashing and row reconciliation for one table"""
+
+    def __init__(self, src, dst, table_name, keys, columns, leaf_size, branching):
+        self.src = src
+        self.dst = dst
+        self.table = table_name
+        self.keys = keys
+        self.columns = columns
+        self.leaf_size = leaf_size
+        self.branching = branching
+        self.key_sql = ", ".join(keys)
+        self.key_tuple = f"({self.key_sql})" if len(keys) > 1 else keys[0]
+        self.stats = {"ranges_hashed": 0, "leaf_ranges": 0, "rows_examined": 0}
+
+    def _where(self, lo, hi):
+        """Half-open key range [lo, hi); None means unbounded"""
+        clauses = []
+        params = []
+        marks = f"({', '.join('?' for _ in self.keys)})" if len(self.keys) > 1 else "?"
+        if lo is not None:
+            clauses.append(f"{self.key_tuple} >= {marks}")
+            params.extend(lo)
+        if hi is not None:
+            clauses.append(f"{self.key_tuple} < {marks}")
+            params.extend(hi)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def summary(self, conn, lo, hi):
+        where, params = self._where(lo, hi)
+        self.stats["ranges_hashed"] += 1
+        return conn.execute(
+            f"SELECT COUNT(*), range_hash({', '.join(self.columns)}) "
+            f"FROM {self.table}{where}",
+            params,
+        ).fetchone()
+
+    def _boundaries(self, conn, lo, hi, count):
+        """Keys splitting [lo, hi) into roughly equal parts"""
+        where, params = self._where(lo, hi)
+        offsets = [i * count // self.branching for i in range(1, self.branching)]
+        # One ordered pass numbering the rows, rather than an OFFSET scan per key
+        rows = conn.execute(
+            f"SELECT {self.key_sql} FROM ("
+            f"SELECT {self.key_sql}, "
+            f"ROW_NUMBER() OVER (ORDER BY {self.key_sql}) - 1 AS rn "
+            f"FROM {self.table}{where}"
+            f") WHERE rn IN ({', '.join('?' for _ in offsets)}) ORDER BY rn",
+            params + offsets,
+        ).fetchall()
+        bounds = []
+        for row in rows:
+            # Rows come back in key order, so only repeats need skipping
+            # (compared with != since Python can't order mixed-type keys)
+            if tuple(row) != (bounds[-1] if bounds else lo):
+                bounds.append(tuple(row))
+        return bounds
+
+    def differing_leaves(self, lo=None, hi=None):
+        """Key ranges small enough to reconcile row by row whose contents differ"""
+        src_count, src_hash = self.summary(self.src, lo, hi)
+        dst_count, dst_hash = self.summary(self.dst, lo, hi)
+        if src_count == dst_count and src_hash == dst_hash:
+            return []
+        if max(src_count, dst_count) <= self.leaf_size:
+            return [(lo, hi)]
+
+        # Split on keys from whichever side has more rows in this range
+        if src_count >= dst_count:
+            conn, count = self.src, src_count
+        else:
+            conn, count = self.dst, dst_count
+        bounds = self._boundaries(conn, lo, hi, count)
+        if not bounds:
+            return [(lo, hi)]
+        edges = [lo] + bounds + [hi]
+        leaves = []
+        for start, end in zip(edges, edges[1:]):
+            leaves.extend(self.differing_leaves(start, end))
+        return leaves
+
+    def _rows(self, conn, lo, hi):
+        where, params = self._where(lo, hi)
+        key_positions = [self.columns.index(key) for key in self.keys]
+        rows = {}
+        for row in conn.execute(
+            f"SELECT {', '.join(self.columns)} FROM {self.table}{where}", params
+        ):
+            rows[tuple(row[i] for i in key_positions)] = row
+        return rows
+
+    def reconcile(self, lo, hi):
+        """(rows to upsert, keys to delete) for one leaf range"""
+        src_rows = self._rows(self.src, lo, hi)
+        dst_digests = {
+            key: _row_digest(row) for key, row in self._rows(self.dst, lo, hi).items()
+        }
+        self.stats["leaf_ranges"] += 1
+        self.stats["rows_examined"] += len(src_rows) + len(dst_digests)
+        upserts = [
+            row
+            for key, row in src_rows.items()
+            if dst_digests.get(key) != _row_digest(row)
+        ]
+        deletes = [key for key in dst_digests if key not in src_rows]
+        return upserts, deletes
+
+
+def _apply(dst, table_name, keys, columns, upserts, deletes, batch_size):
+    updates = [column for column in columns if column not in keys]
+    action = (
+        "DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in updates)
+        if updates
+        else "DO NOTHING"
+    )
+    upsert_sql = (
+        f"INSERT INTO {table_name} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)}) "
+        f"ON CONFLICT({', '.join(keys)}) {action}"
+    )
+    delete_sql = (
+        f"DELETE FROM {table_name} WHERE "
+        + " AND ".join(f"{key} = ?" for key in keys)
+    )
+    for start in range(0, len(deletes), batch_size):
+        dst.executemany(delete_sql, deletes[start : start + batch_size])
+    for start in range(0, len(upserts), batch_size):
+        dst.executemany(upsert_sql, upserts[start : start + batch_size])
+
+
+def _replace_table(src, dst, table_name, columns, batch_size):
+    """Tables without a primary key have no row identity: copy them whole"""
+    dst.execute(f"DELETE FROM {table_name}")
+    cursor = src.execute(f"SELECT {', '.join(columns)} FROM {table_name}")
+    copied = 0
+    insert_sql = (
+        f"INSERT INTO {table_name} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)})"
+    )
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return copied
+        dst.executemany(insert_sql, rows)
+        copied += len(rows)
+
+
+def sync_table(
+    src, dst, table_name, leaf_size=1000, branching=16, batch_size=1000, dry_run=False
+):
+    """Bring one table in dst in line with src; both connections from _connect()"""
+    started = time.perf_counter()
+    columns = _columns(src, table_name)
+    if not columns:
+        raise ValueError(f"Table '{table_name}' not found in the source")
+    report = {"table": table_name, "upserted": 0, "deleted": 0}
+    keys = _key_columns(src, table_name)
+
+    target_columns = _columns(dst, table_name)
+    if not target_columns:
+        sql = src.execute(
+            "SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table_name,)
+        ).fetchone()[0]
+        if dry_run:
+            report["mode"] = "create"
+            count_sql = f"SELECT COUNT(*) FROM {table_name}"
+            report["upserted"] = src.execute(count_sql).fetchone()[0]
+            report["seconds"] = time.perf_counter() - started
+            return report
+        dst.execute(sql)
+    elif target_columns != columns:
+        raise ValueError(
+            f"Table '{table_name}' has different columns in the target; "
+            "migrate its schema before syncing"
+        )
+
+    if not keys:
+        report["mode"] = "replace"
+        same = _TableSync(src, dst, table_name, columns, columns, 0, 2)
+        if same.summary(src, None, None) != same.summary(dst, None, None) and not dry_run:
+            report["upserted"] = _replace_table(src, dst, table_name, columns, batch_size)
+    else:
+        report["mode"] = "ranges"
+        table_sync = _TableSync(src, dst, table_name, keys, columns, leaf_size, branching)
+        for lo, hi in table_sync.differing_leaves():
+            upserts, deletes = table_sync.reconcile(lo, hi)
+            report["upserted"] += len(upserts)
+            report["deleted"] += len(deletes)
+            if not dry_run:
+                _apply(dst, table_name, keys, columns, upserts, deletes, batch_size)
+        report.update(table_sync.stats)
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+def sync_databases(
+    src_path,
+    dst_path,
+    tables=None,
+    leaf_size=1000,
+    branching=16,
+    batch_size=1000,
+    dry_run=False,
+):
+    """Sync every user table (or ``tables``) from src_path into dst_path.
+
+    The source is read inside one transaction, so the target ends up matching
+    a single consistent snapshot; all target writes commit together.
+    """
+    started = time.perf_counter()
+    src = _connect(src_path)
+    dst = _connect(dst_path)
+    try:
+        src.execute("BEGIN")
+        dst.execute("BEGIN IMMEDIATE")
+        if tables is None:
+            # Underscore tables hold per-file state (metadata, caches, changelog)
+            tables = [
+                row[0]
+                for row in src.execute(
+                    "SELECT name FROM sqlite_master WHERE type='table' "
+                    "AND name NOT LIKE '\\_%' ESCAPE '\\' "
+                    "AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\'"
+                )
+            ]
+        reports = [
+            sync_table(src, dst, table, leaf_size, branching, batch_size, dry_run)
+            for table in tables
+        ]
+        dst.execute("ROLLBACK" if dry_run else "COMMIT")
+    except BaseException:
+        if dst.in_transaction:
+            dst.execute("ROLLBACK")
+        raise
+    finally:
+        if src.in_transaction:
+            src.execute("COMMIT")
+        src.close()
+        dst.close()
+
+    changed = sum(report["upserted"] + report["deleted"] for report in reports)
+    if changed and not dry_run:
+        record_write(dst_path, changed)
+    return {
+        "source": src_path,
+        "target": dst_path,
+        "tables": reports,
+        "changed_rows": changed,
+        "dry_run": dry_run,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sync one database in data/ into another by hashing key ranges"
+    )
+    parser.add_argument("source", help="Source database name")
+    parser.add_argument("target", help="Target database name (created if missing)")
+    parser.add_argument(
+        "--table", action="append", help="Only sync this table (repeatable)"
+    )
+    parser.add_argument("--leaf-size", type=int, default=1000)
+    parser.add_argument("--branching", type=int, default=16)
+    parser.add_argument("--dry-run", action="store_true", help="Report differences only")
+    args = parser.parse_args(argv)
+
+    from everything_db import SQLiteDatabase
+
+    report = SQLiteDatabase(args.source).sync_to(
+        args.target,
+        tables=args.table,
+        leaf_size=args.leaf_size,
+        branching=args.branching,
+        dry_run=args.dry_run,
+    )
+    for table in report["tables"]:
+        line = f"{table['table']}: {table['upserted']} upserted, {table['deleted']} deleted"
+        if table["mode"] == "ranges":
+            line += (
+                f" ({table['ranges_hashed']} ranges hashed, "
+                f"{table['rows_examined']} rows examined)"
+            )
+        elif table["mode"] == "replace":
+            line += " (no primary key: copied whole)"
+        else:
+            line += " (new table)"
+        print(line)
+    verb = "would change" if report["dry_run"] else "changed"
+    print(f"{verb} {report['changed_rows']} rows in {report['seconds']:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
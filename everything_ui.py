@@ -1,5 +1,7 @@
-from everything_db import SQLiteDatabase
+from everything_db import SQLiteDatabase, split_sql_statements
+import os
 import sys
+import threading
 
 
 class DatabaseTerminalUI:
@@ -7,6 +9,40 @@ class DatabaseTerminalUI:
         self.db = None
         self.current_db_path = None
         self.current_db_name = None
+        # Created in run(); importing the scheduler isn't needed to build the UI
+        self.maintenance = None
+        # Database list, filled by a background scan started in run()
+        self._databases = None
+        self._databases_stamp = None
+        self._scan_thread = None
+
+    def _data_dir_stamp(self):
+        """Changes whenever a file is added to or removed from data/"""
+        try:
+            return os.stat("data").st_mtime_ns
+        except OSError:
+            return None
+
+    def _scan_databases(self):
+        stamp = self._data_dir_stamp()
+        self._databases = SQLiteDatabase("temp").list_all_databases()
+        self._databases_stamp = stamp
+
+    def _start_database_scan(self):
+        """Populate the database list in the background while the menu renders"""
+        self._scan_thread = threading.Thread(
+            target=self._scan_databases, name="database-scan", daemon=True
+        )
+        self._scan_thread.start()
+
+    def _get_databases(self):
+        """Database list from the background scan, rescanned if data/ changed"""
+        if self._scan_thread:
+            self._scan_thread.join()
+            self._scan_thread = None
+        if self._databases is None or self._databases_stamp != self._data_dir_stamp():
+            self._scan_databases()
+        return self._databases
 
     def display_menu(self):
         print("\n" + "=" * 50)
@@ -78,8 +114,7 @@ class DatabaseTerminalUI:
 
     def _open_existing_database(self):
         # Show available databases
-        temp_db = SQLiteDatabase("temp")  # Just to access list_all_databases
-        databases = temp_db.list_all_databases()
+        databases = self._get_databases()
 
         if not databases:
             print("No databases found in data directory.")
@@ -112,8 +147,7 @@ class DatabaseTerminalUI:
 
     def list_all_databases(self):
         try:
-            temp_db = SQLiteDatabase("temp")  # Just to access list_all_databases
-            databases = temp_db.list_all_databases()
+            databases = self._get_databases()
 
             if not databases:
                 print("No databases found in data directory.")
@@ -335,16 +369,51 @@ class DatabaseTerminalUI:
             return
 
         try:
-            result = self.db.execute_query(query)
-            if result:
-                print("\nQuery Results:")
-                for row in result:
-                    print(row)
-            else:
-                print("Query executed successfully (no results returned).")
+            # A single statement runs as it is, with no wrapping transaction,
+            # and its rows stream from the cursor straight into the pager
+            if len(split_sql_statements(query)) <= 1:
+                self._show_streamed_query(query)
+                return
+
+            from everything_render import show
+
+            # Several statements run together in one transaction
+            results = self.db.execute_script(query)
+            for number, result in enumerate(results, 1):
+                timing = f"{result['seconds'] * 1000:.2f} ms"
+                if len(results) > 1:
+                    print(f"\n[{number}] {result['sql'].splitlines()[0][:60]} ({timing})")
+                if result["columns"] is not None:
+                    if result["rows"]:
+                        print("\nQuery Results:")
+                        show(result["columns"], result["rows"])
+                    else:
+                        print("Query returned no rows.")
+                elif result["rowcount"] >= 0:
+                    print(f"Query executed successfully ({result['rowcount']} rows affected).")
+                else:
+                    print("Query executed successfully (no results returned).")
+            if len(results) == 1:
+                print(f"({timing})")
         except Exception as e:
             print(f"Error executing query: {e}")
 
+    def _show_streamed_query(self, query):
+        from everything_render import show
+        import time
+
+        started = time.perf_counter()
+        columns, rows = self.db.stream_query(query)
+        if columns is None:
+            print("Query executed successfully (no results returned).")
+            return
+        count = show(columns, rows, title="\nQuery Results:")
+        timing = f"{(time.perf_counter() - started) * 1000:.2f} ms"
+        if count:
+            print(f"({count} row{'s' if count != 1 else ''} shown, {timing})")
+        else:
+            print(f"Query returned no rows. ({timing})")
+
     def show_table_schema(self):
         if not self.db:
             print("No database opened. Please open a database first.")
@@ -408,7 +477,18 @@ class DatabaseTerminalUI:
         )
         print("Example: name=John Doe, age=25, email=john@example.com")
 
+        blob_columns = {
+            col[1] for col in self.db.get_column_info(table_name)
+            if (col[2] or "").upper() == "BLOB"
+        }
+        if blob_columns:
+            print(
+                f"For file fields ({', '.join(sorted(blob_columns))}) use "
+                "column=@/path/to/file to stream the file in"
+            )
+
         data = {}
+        blob_files = {}
         while True:
             entry = input().strip()
             if not entry:
@@ -429,12 +509,44 @@ class DatabaseTerminalUI:
                 elif column_value.startswith("'") and column_value.endswith("'"):
                     column_value = column_value[1:-1]
 
+                if column_name in blob_columns and column_value.startswith("@"):
+                    file_path = os.path.expanduser(column_value[1:])
+                    if not os.path.isfile(file_path):
+                        print(f"  File not found: {file_path}")
+                        continue
+                    blob_files[column_name] = file_path
+                    data.pop(column_name, None)
+                    size_kb = os.path.getsize(file_path) / 1024
+                    print(f"  Added: {column_name} = file {file_path} ({size_kb:.1f} KB)")
+                    continue
+
+                blob_files.pop(column_name, None)
                 data[column_name] = column_value
                 print(f"  Added: {column_name} = {column_value}")
             else:
                 print("Invalid format. Use: column=value")
 
         if data:
+            # Store numbers as numbers, and catch NOT NULL/type problems up front
+            try:
+                rows, errors = self.db.coerce_rows(table_name, [data])
+            except Exception as e:
+                print(f"Error inserting data: {e}")
+                return
+            if errors:
+                print("Data not inserted:")
+                for error in errors:
+                    print(f"  - {error['error']}")
+                return
+            data = rows[0]
+
+        if blob_files:
+            try:
+                rowid = self.db.insert_with_blob_files(table_name, data, blob_files)
+                print(f"Data inserted successfully (row {rowid}, files streamed in).")
+            except Exception as e:
+                print(f"Error inserting data: {e}")
+        elif data:
             try:
                 self.db.insert_data(table_name, data)
                 print("Data inserted successfully.")
@@ -467,18 +579,58 @@ class DatabaseTerminalUI:
         limit = input("Enter number of rows to display (default: 10): ").strip()
 
         try:
+            from everything_render import show
+
             limit = int(limit) if limit else 10
-            data = self.db.get_table_data(table_name, limit)
+            columns, rows = self.db.stream_table_data(table_name, limit)
 
-            if data:
-                print(f"\nFirst {limit} rows from table '{table_name}':")
-                for row in data:
-                    print(row)
+            title = f"\nFirst {limit} rows from table '{table_name}':"
+            if show(columns, rows, title=title):
+                self._export_blob_prompt(table_name)
             else:
                 print(f"No data found in table '{table_name}'.")
         except Exception as e:
             print(f"Error viewing table data: {e}")
 
+    def _export_blob_prompt(self, table_name):
+        """Offer to stream a BLOB cell out to a file"""
+        blob_columns = [
+            col[1] for col in self.db.get_column_info(table_name)
+            if (col[2] or "").upper() == "BLOB"
+        ]
+        if not blob_columns:
+            return
+
+        rowid = input(
+            "\nExport a file field to disk? Enter row id (or Enter to skip): "
+        ).strip()
+        if not rowid:
+            return
+
+        column = blob_columns[0]
+        if len(blob_columns) > 1:
+            column = input(f"Which field ({', '.join(blob_columns)})? ").strip()
+            if column not in blob_columns:
+                print("Unknown file field.")
+                return
+
+        dest = os.path.expanduser(input("Save to file path: ").strip())
+        if not dest:
+            print("Export cancelled.")
+            return
+
+        try:
+            size = self.db.get_blob_size(table_name, column, int(rowid))
+            if size is None:
+                print(f"No row with id {rowid}.")
+                return
+            written = self.db.read_blob_to_file(table_name, column, int(rowid), dest)
+            print(f"✓ Exported {written / 1024:.1f} KB to {dest}")
+        except ValueError:
+            print("Row id must be a number.")
+        except Exception as e:
+            print(f"Error exporting file: {e}")
+
     def show_database_info(self):
         if not self.db:
             print("No database opened. Please open a database first.")
@@ -623,23 +775,17 @@ class DatabaseTerminalUI:
         
         # Show sample data
         try:
-            data = self.db.get_table_data(table_name, 5)
+            # Names from the result itself: table_info leaves out generated columns
+            names, rows = self.db.stream_table_data(table_name, 5)
+            data = list(rows)
             if data:
                 print(f"\nFirst few items stored (showing up to 5):")
                 print("-" * 50)
                 
-                # Create simple display
-                col_names = [col[1] for col in columns]
-                
-                # Header
-                header = " | ".join(f"{name[:15]:<15}" for name in col_names)
-                print(header)
-                print("-" * len(header))
-                
-                # Data rows
-                for row in data:
-                    row_str = " | ".join(f"{str(val)[:15]:<15}" for val in row)
-                    print(row_str)
+                # Columns sized to their contents and the terminal width
+                from everything_render import render
+
+                render(names, data)
                     
                 total_count = self.db.select_count_from_sqlite_table(table_name, "1=1")
                 if total_count > 5:
@@ -818,30 +964,40 @@ class DatabaseTerminalUI:
                 if search_value:
                     try:
                         if col_type == 'TEXT':
-                            # Text search with LIKE
-                            results = self.db.execute_query(
-                                f"SELECT * FROM {table_name} WHERE {col_name} LIKE '%{search_value}%'"
+                            # Case-insensitive; rewritten onto a lower() index if present
+                            match = input(
+                                "Match (1) anywhere, (2) at the start, (3) exactly? [1]: "
+                            ).strip()
+                            mode = {"2": "prefix", "3": "exact"}.get(match, "contains")
+                            if mode != "contains" and not self.db.search_uses_index(
+                                table_name, col_name, search_value, mode
+                            ):
+                                self._explorer_offer_search_index(table_name, col_name)
+                            results = self.db.search_table(
+                                table_name,
+                                col_name,
+                                search_value,
+                                mode,
+                                columns=", ".join(col[1] for col in columns),
                             )
                         else:
-                            # Exact match for numbers
+                            # Exact match for numbers: compare as a number, not
+                            # as text, so the column's index can be used
+                            coercer = self.db.get_coercer(table_name)
                             results = self.db.execute_query(
-                                f"SELECT * FROM {table_name} WHERE {col_name} = '{search_value}'"
+                                f"SELECT {', '.join(col[1] for col in columns)} "
+                                f"FROM {table_name} WHERE {col_name} = ?",
+                                (coercer.convert(col_name, search_value),),
                             )
                         
                         if results:
                             print(f"\n🎯 Found {len(results)} matching items:")
                             print("-" * 50)
                             
-                            # Show column headers
-                            col_names = [col[1] for col in columns]
-                            header = " | ".join(f"{name[:15]:<15}" for name in col_names)
-                            print(header)
-                            print("-" * len(header))
-                            
-                            # Show results
-                            for row in results[:10]:  # Limit to 10 results
-                                row_str = " | ".join(f"{str(val)[:15]:<15}" for val in row)
-                                print(row_str)
+                            # Show the first 10 results, sized to fit the terminal
+                            from everything_render import render
+
+                            render([col[1] for col in columns], results[:10])
                                 
                             if len(results) > 10:
                                 print(f"\n... and {len(results) - 10} more matches")
@@ -854,6 +1010,20 @@ class DatabaseTerminalUI:
         except ValueError:
             print("Please enter a valid number.")
 
+    def _explorer_offer_search_index(self, table_name, col_name):
+        """Offer to make case-insensitive searches on a text field use an index"""
+        print(f"\n⚡ Searches on '{col_name}' read every item. Make them faster?")
+        print("1. Add a lowercase index (recommended)")
+        print("2. Add a lowercase helper field (generated column, indexed)")
+        choice = input("Choose (or Enter to skip): ").strip()
+        if choice == "1":
+            name = self.db.create_expression_index(table_name, f"lower({col_name})")
+            print(f"✓ Created index {name}")
+        elif choice == "2":
+            column = f"{col_name}_lower"
+            self.db.add_generated_column(table_name, column, f"lower({col_name})", "TEXT")
+            print(f"✓ Added field {column}, kept up to date automatically")
+
     def _explorer_data_summary(self):
         """Show data summary in user-friendly terms"""
         print("\n📈 DATA SUMMARY")
@@ -870,22 +1040,31 @@ class DatabaseTerminalUI:
         total_items = 0
         for table in tables:
             try:
-                count = self.db.select_count_from_sqlite_table(table, "1=1")
+                # One scan per table computes every statistic below
+                stats = self.db.get_column_stats(table)
+                count = stats["row_count"] if stats else 0
                 total_items += count
-                
+
                 print(f"📁 {table}:")
                 print(f"   Items stored: {count}")
-                
-                # Get column count
-                columns = self.db.get_column_info(table)
+
+                columns = stats["columns"] if stats else {}
                 print(f"   Information fields: {len(columns)}")
-                
-                # Show field names
-                if columns:
-                    field_names = [col[1] for col in columns]
-                    print(f"   Fields: {', '.join(field_names)}")
+
+                for name, col_stats in columns.items():
+                    line = (
+                        f"   • {name}: {col_stats['distinct']} different values, "
+                        f"{col_stats['nulls']} empty"
+                    )
+                    if col_stats["min"] is not None:
+                        low = str(col_stats["min"])[:15]
+                        high = str(col_stats["max"])[:15]
+                        line += f", from {low} to {high}"
+                    if col_stats["avg"] is not None:
+                        line += f", average {col_stats['avg']:.2f}"
+                    print(line)
                 print()
-                
+
             except Exception as e:
                 print(f"📁 {table}: Could not analyze ({e})")
                 print()
@@ -894,6 +1073,56 @@ class DatabaseTerminalUI:
         print(f"   Storage spaces: {len(tables)}")
         print(f"   Total items: {total_items}")
 
+        choice = input(
+            "\nProfile a storage space in detail? (number, or Enter to skip): "
+        ).strip()
+        if not choice:
+            return
+        try:
+            table_index = int(choice) - 1
+            if 0 <= table_index < len(tables):
+                self._explorer_profile_table(tables[table_index])
+            else:
+                print("Please choose a valid number from the list.")
+        except ValueError:
+            print("Please enter a number.")
+
+    def _explorer_profile_table(self, table_name):
+        """Show a detailed column profile for one table"""
+        profile = self.db.profile_table(table_name)
+        if not profile:
+            print("This storage space can't be profiled right now.")
+            return
+
+        print(f"\n🧮 PROFILE: {table_name}")
+        print("=" * 50)
+        how = (
+            f"estimated from a sample of {profile['sample_rows']} items"
+            if profile["sampled"]
+            else "from every item"
+        )
+        print(f"About {profile['row_count']} items ({how})")
+        if profile["from_cache"]:
+            print(f"(Saved profile from {profile['profiled_at']}, data unchanged)")
+
+        for name, stats in profile["columns"].items():
+            print(f"\n• {name}")
+            print(f"   Empty: {stats['null_fraction']:.1%}")
+            print(f"   Different values: ~{stats['distinct']}")
+            if stats["min"] is not None:
+                print(f"   Range: {str(stats['min'])[:20]} to {str(stats['max'])[:20]}")
+            if stats["top_values"]:
+                common = ", ".join(
+                    f"{str(value)[:15]} ({count})"
+                    for value, count in stats["top_values"]
+                )
+                print(f"   Most common: {common}")
+            if len(stats["histogram"]) > 1:
+                largest = max(count for _, _, count in stats["histogram"]) or 1
+                for low, high, count in stats["histogram"]:
+                    bar = "█" * int(20 * count / largest)
+                    print(f"   {low:>10.2f} - {high:<10.2f} {bar} {count}")
+
     def _explorer_help(self):
         """Show help for the explorer"""
         print("\n❓ UI EXPLORER HELP")
@@ -937,6 +1166,13 @@ class DatabaseTerminalUI:
 
     def run(self):
         print("Welcome to SQLite Database Manager!")
+        self._start_database_scan()
+
+        # ANALYZE/vacuum/checkpoint written databases while the menu sits idle
+        from everything_maintenance import MaintenanceScheduler
+
+        self.maintenance = MaintenanceScheduler()
+        self.maintenance.start()
 
         while True:
             self.display_menu()
@@ -969,6 +1205,14 @@ class DatabaseTerminalUI:
                 self.close_database()
             elif choice == 12:
                 self.close_database()
+                self.maintenance.stop()
+                summary = self.maintenance.summary()
+                if summary["runs"]:
+                    print(
+                        f"Background maintenance: {summary['runs']} run(s), "
+                        f"{summary['reclaimed_bytes'] / 1024:.1f} KB reclaimed "
+                        f"in {summary['seconds']:.2f}s"
+                    )
                 print("Thank you for using SQLite Database Manager!")
                 sys.exit(0)
             elif choice is not None:
@@ -62,8 +62,10 @@ def main():
         {"name": "Clothing", "description": "Apparel and accessories"},
     ]
 
-    for category in categories_data:
-        db.insert_data("categories", category)
+    # One transaction: a single commit for all rows, and all-or-nothing
+    with db.transaction():
+        for category in categories_data:
+            db.insert_data("categories", category)
 
     print("✓ Inserted category data")
 
@@ -92,8 +94,9 @@ def main():
         },
     ]
 
-    for product in products_data:
-        db.insert_data("products", product)
+    with db.transaction("IMMEDIATE"):
+        for product in products_data:
+            db.insert_data("products", product)
 
     print("✓ Inserted product data")
 
@@ -127,6 +130,20 @@ def main():
     print(f"Total products: {total_products}")
     print(f"Total inventory value: ${total_value:.2f}")
 
+    # Several aggregates per category, computed in a single query
+    category_stats = db.aggregate(
+        "products",
+        [("count", "*", "items"), ("avg", "price"), ("max", "price")],
+        group_by="category",
+        order_by="category",
+    )
+    print("Per-category pricing:")
+    for row in category_stats:
+        print(
+            f"  - {row['category']}: {row['items']} items, "
+            f"avg ${row['avg_price']:.2f}, max ${row['max_price']:.2f}"
+        )
+
     # Example 6: Show metadata
     print("\n6. Database metadata...")
 
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Parallel scan benchmark for SQLite Database Manager
+Times a grouped aggregate and a filtered scan over a generated table, first as
+one SQLite statement and then split into rowid ranges on 1, 2, 4, ... worker
+processes, and reports the speed-up at each core count
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_DIR)
+
+AGGREGATES = [("count", "*"), ("sum", "amount"), ("avg", "amount"), ("max", "amount")]
+SCAN_CONDITION = "amount % 97 = 0 AND note LIKE '%7%'"
+
+
+def _populate(db, rows):
+    db.create_sqlite_db()
+    db.create_sqlite_table(
+        "events", "id INTEGER PRIMARY KEY, category TEXT, amount INTEGER, note TEXT"
+    )
+    batch = 100_000
+    for start in range(0, rows, batch):
+        db.insert_many(
+            "events",
+            [
+                {"category": f"c{i % 16}", "amount": i * 7919 % 100_003, "note": f"event {i}"}
+                for i in range(start, min(start + batch, rows))
+            ],
+        )
+
+
+def _best(function, runs):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+def _worker_counts(limit):
+    counts = [1]
+    while counts[-1] * 2 <= limit:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != limit:
+        counts.append(limit)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure parallel rowid-range aggregate and scan scaling"
+    )
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Rows to generate")
+    parser.add_argument(
+        "--max-workers", type=int, default=os.cpu_count() or 1, help="Largest pool size"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Best of this many runs")
+    args = parser.parse_args(argv)
+
+    from everything_db import SQLiteDatabase
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            db = SQLiteDatabase("bench")
+            print(f"Generating {args.rows:,} rows...", flush=True)
+            _populate(db, args.rows)
+
+            serial_agg, expected = _best(
+                lambda: db.aggregate("events", AGGREGATES, group_by="category"), args.runs
+            )
+            serial_scan, matches = _best(
+                lambda: db.execute_query(f"SELECT * FROM events WHERE {SCAN_CONDITION}"),
+                args.runs,
+            )
+            print(f"{'':18}{'aggregate':>12}{'speed-up':>10}{'scan':>12}{'speed-up':>10}")
+            print(f"{'single statement':18}{serial_agg:>11.3f}s{'1.00x':>10}"
+                  f"{serial_scan:>11.3f}s{'1.00x':>10}")
+
+            for workers in _worker_counts(args.max_workers):
+                agg, result = _best(
+                    lambda: db.parallel_aggregate(
+                        "events", AGGREGATES, group_by="category", workers=workers
+                    ),
+                    args.runs,
+                )
+                scan, rows = _best(
+                    lambda: list(
+                        db.parallel_scan("events", condition=SCAN_CONDITION, workers=workers)
+                    ),
+                    args.runs,
+                )
+                if len(rows) != len(matches) or [r["count"] for r in result] != [
+                    r["count"] for r in expected
+                ]:
+                    raise SystemExit(f"Parallel results differ with {workers} workers")
+                label = f"{workers} worker{'s' if workers > 1 else ''}"
+                print(f"{label:18}{agg:>11.3f}s{serial_agg / agg:>9.2f}x"
+                      f"{scan:>11.3f}s{serial_scan / scan:>9.2f}x")
+        finally:
+            os.chdir(PROJECT_DIR)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Server benchmark for SQLite Database Manager
+Compares in-process SQLiteDatabase calls with the same calls made through
+everything_server over its Unix socket and over HTTP: point reads, single-row
+inserts and a streamed full-table scan, in a scratch data/ directory
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_DIR)
+
+
+def _start_server(workdir):
+    """Run everything_server in a subprocess; returns (process, http url)"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = PROJECT_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "everything_server", "--port", "0"],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    # "Serving unix:data/everything.sock, http://127.0.0.1:PORT"
+    line = process.stdout.readline()
+    if not line.startswith("Serving"):
+        process.kill()
+        raise RuntimeError("everything_server did not start")
+    url = next(part for part in line.split() if part.startswith("http://")).rstrip(",")
+    return process, url
+
+
+def _rate(operation, count):
+    started = time.perf_counter()
+    for i in range(count):
+        operation(i)
+    return count / (time.perf_counter() - started)
+
+
+def measure(db, rows, operations):
+    """Operations per second (rows per second for the scan) for one client"""
+    results = {}
+    results["point read"] = _rate(
+        lambda i: db.execute_query("SELECT * FROM items WHERE id = ?", (i % rows + 1,)),
+        operations,
+    )
+    results["insert"] = _rate(
+        lambda i: db.insert_data("items", {"name": f"new {i}", "price": i}), operations
+    )
+    started = time.perf_counter()
+    _, cursor = db.stream_query("SELECT * FROM items")
+    scanned = sum(1 for _ in cursor)
+    results["stream scan"] = scanned / (time.perf_counter() - started)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare in-process and server (Unix socket, HTTP) throughput"
+    )
+    parser.add_argument("--rows", type=int, default=50000, help="Rows in the test table")
+    parser.add_argument("--operations", type=int, default=2000, help="Calls per test")
+    args = parser.parse_args(argv)
+
+    from everything_db import SQLiteDatabase
+    from everything_server import DatabaseClient
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        db = SQLiteDatabase("bench")
+        db.create_sqlite_db()
+        db.create_sqlite_table("items", "id INTEGER PRIMARY KEY, name TEXT, price REAL")
+        db.insert_many("items", [{"name": f"item {i}", "price": i} for i in range(args.rows)])
+
+        process, url = _start_server(workdir)
+        try:
+            clients = {
+                "in-process": SQLiteDatabase("bench"),
+                "in-process (kept connection)": SQLiteDatabase("bench", keep_connections=True),
+                "unix socket": DatabaseClient("bench"),
+                "http": DatabaseClient("bench", url=url),
+            }
+            results = {name: measure(c, args.rows, args.operations) for name, c in clients.items()}
+            for client in clients.values():
+                client.close()
+        finally:
+            process.terminate()
+            process.wait()
+            os.chdir(PROJECT_DIR)
+
+    tests = list(next(iter(results.values())))
+    print(f"{'':30}" + "".join(f"{test:>16}" for test in tests))
+    for name, rates in results.items():
+        print(f"{name:30}" + "".join(f"{rates[test]:>14,.0f}/s" for test in tests))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
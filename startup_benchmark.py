@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for SQLite Database Manager
+Measures import cost with `python -X importtime` and wall-clock time to the
+first menu render, and fails when either exceeds its target
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Generous defaults so slow CI machines pass; tighten with the CLI flags
+DEFAULT_IMPORT_TARGET_MS = 100.0
+DEFAULT_MENU_TARGET_MS = 250.0
+
+FIRST_MENU_SCRIPT = (
+    "import everything_ui; everything_ui.DatabaseTerminalUI().display_menu()"
+)
+
+
+def _env():
+    env = dict(os.environ)
+    # Measure what users see: bytecode cached after the first run
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env["PYTHONPATH"] = PROJECT_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def measure_import(module="everything_ui", runs=5):
+    """Median cumulative import time (ms) and the slowest modules by self time"""
+    totals = []
+    modules = {}
+    for _ in range(runs + 1):  # first run warms the bytecode cache
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            cwd=PROJECT_DIR,
+            env=_env(),
+        )
+        run_modules = {}
+        total = None
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            try:
+                self_us, cumulative_us, name = line[len("import time:") :].split("|")
+                self_us, cumulative_us = int(self_us), int(cumulative_us)
+            except ValueError:
+                continue  # header line
+            name = name.strip()
+            run_modules[name] = self_us
+            if name == module:
+                total = cumulative_us
+        if total is None:
+            raise RuntimeError(f"Could not import {module}:\n{result.stderr}")
+        totals.append(total / 1000)
+        modules = run_modules
+
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:5]
+    return statistics.median(totals[1:]), [(n, us / 1000) for n, us in slowest]
+
+
+def measure_first_menu(runs=5):
+    """Median wall-clock ms from interpreter launch to the first menu render"""
+    timings = []
+    for _ in range(runs + 1):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", FIRST_MENU_SCRIPT],
+            capture_output=True,
+            cwd=PROJECT_DIR,
+            env=_env(),
+            check=True,
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings[1:])
+
+
+def run_benchmark(
+    import_target_ms=DEFAULT_IMPORT_TARGET_MS,
+    menu_target_ms=DEFAULT_MENU_TARGET_MS,
+    runs=5,
+    verbose=True,
+):
+    """Run both measurements; returns True when both are within target"""
+    import_ms, slowest = measure_import(runs=runs)
+    menu_ms = measure_first_menu(runs=runs)
+
+    import_ok = import_ms <= import_target_ms
+    menu_ok = menu_ms <= menu_target_ms
+    if verbose:
+        mark = "✓" if import_ok else "✗"
+        print(f"{mark} import everything_ui: {import_ms:.1f} ms (target {import_target_ms:.0f} ms)")
+        for name, ms in slowest:
+            print(f"    {name:<30} {ms:6.2f} ms self")
+        mark = "✓" if menu_ok else "✗"
+        print(f"{mark} first menu render: {menu_ms:.1f} ms (target {menu_target_ms:.0f} ms)")
+    return import_ok and menu_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--import-target-ms", type=float, default=DEFAULT_IMPORT_TARGET_MS)
+    parser.add_argument("--menu-target-ms", type=float, default=DEFAULT_MENU_TARGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    ok = run_benchmark(args.import_target_ms, args.menu_target_ms, args.runs)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()